@@ -1,17 +1,43 @@
 import os
-import glob
+import time
 import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from google import genai
 from google.genai import types
 import anthropic
 
-from nifty_config import GEMINI_API_KEY, AI_LOGS_DIR, GEMINI_LOGS_DIR
-from nifty_telegram import send_telegram_message
+from nifty_config import (
+    GEMINI_API_KEY, AI_LOGS_DIR, GEMINI_LOGS_DIR, ENABLE_PROMPT_CACHE,
+    ENABLE_AI_HEDGING, AI_HEDGE_DELAY, AI_CYCLE_DEADLINE, AI_REQUEST_TIMEOUT, ENABLE_AI_RESPONSE_CACHE,
+    ENABLE_AI_STREAMING
+)
+from nifty_telegram import TelegramStream
+from nifty_manifest import latest_snapshot_file
+from nifty_prompt_cache import (
+    GeminiPromptCache, split_prompt, claude_system_blocks,
+    gemini_usage, claude_usage, format_usage, record_usage
+)
+from nifty_response_cache import ResponseCache, template_version, response_key
+from nifty_flash_context import FlashContext
 
 # Safely import ANTHROPIC_API_KEY if it exists, otherwise set to None
 import nifty_config
 ANTHROPIC_API_KEY = getattr(nifty_config, 'ANTHROPIC_API_KEY', None)
 
+# Per-request SDK timeout, so a hedged request that lost the race doesn't hang around
+_HTTP_OPTIONS = types.HttpOptions(timeout=int(AI_REQUEST_TIMEOUT * 1000))
+
+# Section of the answer that goes to Telegram
+TELEGRAM_MARKERS = ("ANALYSIS NARRATIVE", "TRADING IMPLICATION")
+
+class _StreamedResponse:
+    """What generate_content would have returned, rebuilt from a generate_content_stream."""
+    __slots__ = ('text', 'usage_metadata')
+
+    def __init__(self, text: str, usage_metadata):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
 
 class NiftyAIAnalyzer:
     def __init__(self):
@@ -21,6 +47,7 @@ class NiftyAIAnalyzer:
             self.gemini_client = None
         else:
             self.gemini_client = genai.Client(api_key=GEMINI_API_KEY)
+        self.prompt_cache = GeminiPromptCache(self.gemini_client) if self.gemini_client and ENABLE_PROMPT_CACHE else None
             
         # Initialize Anthropic (Claude) Client
         if not ANTHROPIC_API_KEY or "YOUR_" in ANTHROPIC_API_KEY:
@@ -32,169 +59,247 @@ class NiftyAIAnalyzer:
         # ---------------------------------------------------------
         # AI SESSION MEMORY (Rolling Context Window)
         # ---------------------------------------------------------
-        self.rolling_history = []
-        self.max_snapshots = 6  # UPDATED: Now remembers the last 6 market snapshots
+        self.flash_context = FlashContext()  # Earlier snapshots as deltas, bounded by a token budget
+
+        # Stored analyses for byte-identical inputs (reruns, quiet markets)
+        self.response_cache = ResponseCache() if ENABLE_AI_RESPONSE_CACHE else None
+
+    def close(self):
+        """Deletes the Gemini prompt caches so they stop accruing storage time."""
+        if self.prompt_cache:
+            self.prompt_cache.close()
+        if self.response_cache:
+            print(f"🗄️ AI response cache: {self.response_cache.stats()}")
+            self.response_cache.close()
+
+    def _gemini_call(self, model: str, contents: list, config, on_text=None):
+        """generate_content, or generate_content_stream reporting the accumulated text to on_text."""
+        if on_text is None:
+            return self.gemini_client.models.generate_content(model=model, contents=contents, config=config)
+        parts, usage = [], None
+        for chunk in self.gemini_client.models.generate_content_stream(model=model, contents=contents, config=config):
+            if chunk.text:
+                parts.append(chunk.text)
+                on_text("".join(parts))
+            usage = getattr(chunk, 'usage_metadata', None) or usage
+        return _StreamedResponse("".join(parts), usage)
+
+    def _gemini_generate(self, model: str, system_instruction: str, static: str, contents: list,
+                         temperature: float = None, on_text=None):
+        """
+        generate_content with the static prompt served from cachedContent when possible.
+        `contents` holds only per-cycle data; without a cache the static prompt goes in the system instruction.
+        """
+        cache_name = self.prompt_cache.get(model, system_instruction, static) if self.prompt_cache else None
+        if cache_name:
+            try:
+                return self._gemini_call(model, contents, types.GenerateContentConfig(
+                    cached_content=cache_name, temperature=temperature, http_options=_HTTP_OPTIONS), on_text)
+            except Exception as e:
+                print(f"⚠️ Cached request failed ({e}), retrying without the prompt cache...")
+
+        instruction = f"{system_instruction}\n\n{static}" if static else system_instruction
+        response = self._gemini_call(model, contents, types.GenerateContentConfig(
+            system_instruction=instruction, temperature=temperature, http_options=_HTTP_OPTIONS), on_text)
+        if cache_name:
+            # Uncached worked where the cached call didn't, so the cache itself is bad
+            self.prompt_cache.invalidate(model)
+        return response
+
+    # ---------------------------------------------------------
+    # PROVIDERS (Each returns (text, usage, flash_turn) or raises)
+    # ---------------------------------------------------------
+    def _ask_gemini_pro(self, system_instruction: str, static: str, cycle_data: str, on_text=None):
+        """Stateless snapshot analysis."""
+        print("🧠 Requesting analysis from Google Gemini Pro...")
+        response = self._gemini_generate("gemini-3.1-pro-preview", system_instruction, static, [cycle_data],
+                                         on_text=on_text)
+        return response.text, gemini_usage(response), None
+
+    def _ask_claude(self, system_instruction: str, static: str, cycle_data: str, on_text=None):
+        print("🧠 Requesting analysis from Anthropic Claude...")
+        request = dict(
+            model="claude-3-opus-20240229",
+            max_tokens=1500,
+            system=claude_system_blocks(system_instruction, static, cache=ENABLE_PROMPT_CACHE),
+            messages=[
+                {"role": "user", "content": cycle_data}
+            ],
+            timeout=AI_REQUEST_TIMEOUT
+        )
+        if on_text is None:
+            message = self.claude_client.messages.create(**request)
+            return message.content[0].text, claude_usage(message), None
+
+        parts = []
+        with self.claude_client.messages.stream(**request) as stream:
+            for text in stream.text_stream:
+                parts.append(text)
+                on_text("".join(parts))
+            message = stream.get_final_message()
+        return "".join(parts), claude_usage(message), None
+
+    def _ask_gemini_flash(self, system_instruction: str, static: str, cycle_data: str, on_text=None):
+        """
+        Rolling context: earlier snapshots as deltas against this one (static prompt lives in the cache).
+        The caller records the returned turn only if this answer wins, so a losing hedge leaves no trace.
+        """
+        print(f"🧠 Requesting analysis from Google Gemini Flash (Rolling Context Mode, {len(self.flash_context)} earlier)...")
+        response = self._gemini_generate(
+            "gemini-3.1-flash-lite-preview", system_instruction, static,
+            self.flash_context.build(cycle_data), temperature=0.2, on_text=on_text
+        )
+        return response.text, gemini_usage(response), (cycle_data, response.text)
+
+    def _hedged_request(self, providers: list, hedge_delay: float = None, deadline: float = None):
+        """
+        Runs providers in priority order and returns (name, result) of the first non-empty answer,
+        or (None, None). The next provider starts as soon as the running ones have all failed, or
+        once `hedge_delay` seconds pass without an answer (hedging). Nothing is awaited past `deadline`;
+        requests still in flight are abandoned (their SDK timeout ends them).
+        """
+        if hedge_delay is None:
+            hedge_delay = AI_HEDGE_DELAY if ENABLE_AI_HEDGING else None
+        deadline = AI_CYCLE_DEADLINE if deadline is None else deadline
+        if not providers:
+            return None, None
+
+        stop_at = time.monotonic() + deadline
+        executor = ThreadPoolExecutor(max_workers=len(providers), thread_name_prefix="llm")
+        pending, queue = {}, list(providers)
+        next_launch = 0.0  # The first provider starts at once
+        try:
+            while queue or pending:
+                if queue and (not pending or hedge_delay is not None and time.monotonic() >= next_launch):
+                    name, ask = queue.pop(0)
+                    if pending:
+                        print(f"⏱️ No answer after {hedge_delay:.0f}s, hedging with {name}...")
+                    pending[executor.submit(ask)] = name
+                    next_launch = time.monotonic() + (hedge_delay or 0)
+
+                remaining = stop_at - time.monotonic()
+                if remaining <= 0:
+                    print(f"⏰ AI deadline of {deadline:.0f}s reached; abandoning {', '.join(pending.values())}")
+                    return None, None
+                timeout = remaining
+                if queue and hedge_delay is not None:
+                    timeout = min(timeout, max(0.0, next_launch - time.monotonic()))
+
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"⚠️ {name} failed: {e}")
+                        continue
+                    if result[0]:
+                        print(f"✅ {name} succeeded.")
+                        return name, result
+                    print(f"⚠️ {name} returned an empty answer")
+            return None, None
+        finally:
+            # Queued providers never start; running ones finish in the background and are ignored
+            executor.shutdown(wait=False, cancel_futures=True)
 
     def get_latest_log_file(self) -> str:
-        """Finds the most recently created text file in the input directory."""
-        if not os.path.exists(AI_LOGS_DIR):
-            print(f"⚠️ Input directory not found: {AI_LOGS_DIR}")
-            return None
-        
-        list_of_files = glob.glob(os.path.join(AI_LOGS_DIR, '*.txt'))
-        if not list_of_files:
-            return None
-            
-        return max(list_of_files, key=os.path.getctime)
+        """Finds the latest ai_query file via the manifest (directory scan only as recovery)."""
+        return latest_snapshot_file(AI_LOGS_DIR)
 
-    def get_ai_analysis(self, **kwargs) -> str:
-        """Waterfalls through Gemini Pro -> Claude -> Gemini Flash."""
-        latest_file = self.get_latest_log_file()
-        
-        if not latest_file:
-            return "❌ AI Analysis skipped: No data files available."
+    def get_ai_analysis(self, snapshot=None, **kwargs) -> str:
+        """
+        Asks Gemini Pro -> Claude -> Gemini Flash in priority order, hedged and bounded by AI_CYCLE_DEADLINE.
+        Uses the in-memory snapshot from save_ai_query_data when given, else the latest file on disk.
+        """
+        if snapshot is not None:
+            source_name = snapshot.name
+            file_content = snapshot.content
+            print(f"🔄 Using in-memory snapshot: {source_name}")
+        else:
+            latest_file = self.get_latest_log_file()
             
-        print(f"🔄 Reading latest data from: {os.path.basename(latest_file)}")
-        
-        try:
-            with open(latest_file, 'r', encoding='utf-8') as f:
-                file_content = f.read()
-        except Exception as e:
-            return f"❌ Error reading file: {e}"
+            if not latest_file:
+                return "❌ AI Analysis skipped: No data files available."
+                
+            source_name = os.path.basename(latest_file)
+            print(f"🔄 Reading latest data from: {source_name}")
+            
+            try:
+                with open(latest_file, 'r', encoding='utf-8') as f:
+                    file_content = f.read()
+            except Exception as e:
+                return f"❌ Error reading file: {e}"
 
         system_instruction = "You are an expert Nifty options trading analyst. Review the data and provide a clear, actionable trading analysis. ALWAYS include a section titled exactly 'ANALYSIS NARRATIVE' or 'TRADING IMPLICATION'."
+        # Static v15.1 prompt is cached provider-side; only the per-cycle data is sent fresh
+        static_prompt, cycle_data = split_prompt(file_content)
         
-        ai_response = None
-        used_model = "None"
+        # Streaming answers push their narrative to Telegram while the rest is still being written
+        live = TelegramStream(TELEGRAM_MARKERS)
 
-        # -------------------------------------------------------------
-        # 1st TRY: GEMINI PRO (Stateless Snapshot)
-        # -------------------------------------------------------------
+        def provider(name, ask):
+            on_text = (lambda text: live.feed(name, text)) if ENABLE_AI_STREAMING else None
+            return name, lambda: ask(system_instruction, static_prompt, cycle_data, on_text=on_text)
+
+        # Pro -> Claude -> Flash, each launched on the previous one's failure or after the hedge delay
+        providers = []
         if self.gemini_client:
-            print("🧠 Requesting analysis from Google Gemini Pro...")
-            try:
-                response = self.gemini_client.models.generate_content(
-                    model="gemini-3.1-pro-preview", 
-                    contents=[system_instruction, file_content]
-                )
-                ai_response = response.text
-                used_model = "Gemini Pro"
-                print("✅ Gemini Pro succeeded.")
-            except Exception as e:
-                print(f"⚠️ Gemini Pro failed: {e}")
-        
-        # -------------------------------------------------------------
-        # 2nd TRY: CLAUDE OPUS (Fallback 1)
-        # -------------------------------------------------------------
-        if not ai_response:
-            if self.claude_client:
-                print("🧠 Switching to Anthropic Claude...")
-                try:
-                    message = self.claude_client.messages.create(
-                        model="claude-3-opus-20240229",
-                        max_tokens=1500,
-                        system=system_instruction,
-                        messages=[
-                            {"role": "user", "content": file_content}
-                        ]
-                    )
-                    ai_response = message.content[0].text
-                    used_model = "Claude Opus"
-                    print("✅ Claude succeeded.")
-                except Exception as e:
-                    print(f"⚠️ Claude failed: {e}")
-            else:
-                print("⏭️ Skipping Claude fallback: ANTHROPIC_API_KEY is not configured.")
+            providers.append(provider("Gemini Pro", self._ask_gemini_pro))
+        if self.claude_client:
+            providers.append(provider("Claude Opus", self._ask_claude))
+        else:
+            print("⏭️ Skipping Claude fallback: ANTHROPIC_API_KEY is not configured.")
+        if self.gemini_client:
+            providers.append(provider("Gemini Flash", self._ask_gemini_flash))
 
-        # -------------------------------------------------------------
-        # 3rd TRY: GEMINI FLASH (Rolling Context Window)
-        # -------------------------------------------------------------
-        if not ai_response and self.gemini_client:
-            print("🧠 Switching to Google Gemini Flash (Rolling Context Mode)...")
-            try:
-                # 1. Append the new market data as a "user" message
-                self.rolling_history.append({
-                    "role": "user", 
-                    "parts": [{"text": file_content}]
-                })
-
-                # 2. Enforce the Rolling Window limit
-                max_messages = self.max_snapshots * 2
-                
-                if len(self.rolling_history) > max_messages:
-                    print(f"   [!] Trimming oldest context. Keeping last {self.max_snapshots} snapshots.")
-                    self.rolling_history = self.rolling_history[-max_messages:]
-
-                # 3. Configure the model settings
-                config = types.GenerateContentConfig(
-                    system_instruction=system_instruction,
-                    temperature=0.2  
-                )
-
-                # 4. Send the explicitly managed history array
-                response = self.gemini_client.models.generate_content(
-                    model="gemini-3.1-flash-lite-preview", 
-                    contents=self.rolling_history,
-                    config=config
-                )
-                
-                ai_response = response.text
-                used_model = "Gemini Flash"
-                
-                # 5. Save the AI's response to the history for the NEXT cycle
-                self.rolling_history.append({
-                    "role": "model", 
-                    "parts": [{"text": ai_response}]
-                })
-                
-                print("✅ Gemini Flash succeeded.")
-                
-            except Exception as e:
-                print(f"⚠️ Gemini Flash failed: {e}")
-                # Failsafe: If the API call fails, remove the last user message we just 
-                # added so the history state doesn't get corrupted
-                if self.rolling_history and self.rolling_history[-1]["role"] == "user":
-                    self.rolling_history.pop()
+        # Same prompt version + model + data as an earlier run -> reuse that analysis
+        version = template_version(system_instruction, static_prompt)
+        keys = {name: response_key(version, name, cycle_data,
+                                   self.flash_context.fingerprint() if name == "Gemini Flash" else "")
+                for name, _ in providers}
+        cached = self.response_cache.lookup(list(keys.values())) if self.response_cache else None
+
+        if cached:
+            used_model, ai_response, _, age = cached
+            print(f"🗄️ AI response cache hit: {used_model} analysis from {age / 60:.0f} min ago (no API call)")
+            result, usage = (ai_response, None, None), None
+        else:
+            if self.response_cache:
+                print("🗄️ AI response cache miss")
+            used_model, result = self._hedged_request(providers)
 
         # -------------------------------------------------------------
         # FINAL CHECK & LOGGING
         # -------------------------------------------------------------
-        if not ai_response:
+        if result is None:
+            live.close()  # A stream that got as far as Telegram must not keep editing
             return "❌ AI analysis failed on all available engines (Pro, Claude, Flash)."
+        ai_response, usage, flash_turn = result
+
+        # --- TELEGRAM (Finalise the live message, or send now if nothing streamed) ---
+        print("🔍 Parsing response for Telegram keywords...")
+        live.finish(used_model, ai_response)
+
+        if flash_turn is not None:
+            self.flash_context.add(*flash_turn)  # Only the Flash answer that was actually used extends its context
+        if usage is not None:
+            record_usage(used_model, usage)
+            if self.response_cache:
+                self.response_cache.put(keys[used_model], used_model, ai_response, usage)
 
         # --- FILE SAVING LOGIC ---
         timestamp = datetime.datetime.now().strftime("%d_%m_%Y_%H_%M_%S")
         output_filepath = os.path.join(GEMINI_LOGS_DIR, f"ai_analysis_{timestamp}.txt")
         
         with open(output_filepath, 'w', encoding='utf-8') as f:
-            f.write(f"Source Data File: {os.path.basename(latest_file)}\n")
+            f.write(f"Source Data File: {source_name}\n")
             f.write(f"Model Used: {used_model}\n")
+            f.write(f"Tokens: {format_usage(usage) if usage else 'none (served from AI response cache)'}\n")
             f.write("=" * 80 + "\n")
             f.write(f"AI ANALYSIS - Generated at {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
             f.write("=" * 80 + "\n\n")
             f.write(ai_response)
             
         print(f"✅ Analysis saved successfully to:\n   {output_filepath}")
-        
-        # --- TELEGRAM PARSING LOGIC ---
-        print("🔍 Parsing response for Telegram keywords...")
-        lines = ai_response.split('\n')
-        start_idx = -1
-        
-        for i, line in enumerate(lines):
-            upper_line = line.upper()
-            if "ANALYSIS NARRATIVE" in upper_line or "TRADING IMPLICATION" in upper_line:
-                start_idx = i
-                break
-        
-        if start_idx != -1:
-            snippet_lines = lines[start_idx:start_idx + 50]
-            telegram_msg = f"🤖 {used_model} Strategy Update:\n\n" + "\n".join(snippet_lines)
-            send_telegram_message(telegram_msg)
-        else:
-            print("⚠️ Keywords 'ANALYSIS NARRATIVE' or 'TRADING IMPLICATION' not found. Sending fallback response...")
-            snippet_lines = lines[:50]
-            telegram_msg = f"🤖 {used_model} Strategy Update:\n\n" + "\n".join(snippet_lines)
-            send_telegram_message(telegram_msg)
             
         return f"\n🤖 {used_model.upper()} ANALYSIS:\n\n{ai_response}"
@@ -0,0 +1,175 @@
+import asyncio
+import time
+
+from nifty_config import (
+    SYMBOL, TOP_NIFTY_STOCKS, FETCH_CONCURRENCY, ENABLE_HTTP_FAST_PATH, MULTI_EXPIRY_COUNT,
+    BROWSER_POOL_SIZE
+)
+from nifty_expiry_cache import expiry_cache
+from nifty_replay import record_payload
+from nifty_rate_limit import throttle_async
+from nifty_retry import (
+    RetryPolicy, SessionRejected, EmptyPayload, HTTPStatusError, async_call_with_retry
+)
+from nifty_fetcher import (
+    _CHROME_ARGS, _NSE_HEADERS,
+    _parse_payload, _contract_info_url, _chain_url, _legacy_equity_url,
+    _build_banknifty_result, _build_stock_result, _http_get, _ensure_http_session, build_term_structure
+)
+from nifty_browser_pool import AsyncContextPool
+
+# ---------------------------------------------------------
+# ASYNC REQUESTS (Browser context pool or HTTP fast path)
+# ---------------------------------------------------------
+async def _async_get(pool, semaphore: asyncio.Semaphore, url: str, policy: RetryPolicy = None) -> dict:
+    """
+    Async twin of nifty_fetcher._playwright_get, bounded by the shared semaphore.
+    Each attempt leases a context from the pool, so a failing context is recycled before the retry.
+    With pool=None the request goes through the HTTP fast path on a worker thread.
+    """
+    if pool is None:
+        async with semaphore:
+            return await asyncio.to_thread(_http_get, url, policy)
+
+    async def attempt():
+        async with semaphore, pool.lease() as context:
+            await throttle_async(url)
+            resp = await context.request.get(url, headers=_NSE_HEADERS, timeout=20_000)
+            if resp.status in (401, 403):
+                raise SessionRejected(f"HTTP {resp.status}")
+            if not resp.ok:
+                raise HTTPStatusError(resp.status)
+            text = await resp.text()
+        record_payload(url, text)
+        data = _parse_payload(text)
+        if data is None:
+            raise EmptyPayload("empty payload")
+        return data
+
+    return await async_call_with_retry(url, attempt, policy)
+
+async def _async_expiry_dates(pool, semaphore, symbol: str) -> list:
+    cached = expiry_cache.get(symbol)
+    if cached:
+        return cached
+
+    try:
+        data = await _async_get(pool, semaphore, _contract_info_url(symbol))
+        expiry_dates = data.get("expiryDates", [])
+        expiry_cache.put(symbol, expiry_dates)
+        return expiry_dates
+    except Exception as e:
+        print(f"⚠️ contract-info failed for {symbol}: {e}")
+        return []
+
+# ---------------------------------------------------------
+# PER-UNDERLYING TASKS
+# ---------------------------------------------------------
+async def _fetch_nifty(pool, semaphore, count: int = MULTI_EXPIRY_COUNT):
+    """Nearest `count` NIFTY expiries in parallel. Returns (nearest_payload, TermStructure)."""
+    expiry_dates = await _async_expiry_dates(pool, semaphore, SYMBOL)
+    if not expiry_dates:
+        raise Exception("fetch_option_chain: could not retrieve expiry dates")
+
+    expiries = expiry_dates[:max(1, count)]
+    payloads = await asyncio.gather(
+        *(_async_get(pool, semaphore, _chain_url("Indices", SYMBOL, expiry)) for expiry in expiries),
+        return_exceptions=True
+    )
+    data = payloads[0]
+    if isinstance(data, BaseException) or not data or "records" not in data:
+        raise Exception(f"fetch_option_chain: no valid data fetched ({data})")
+
+    payloads = [None if isinstance(p, BaseException) else p for p in payloads]
+    print(f"   ✅ Fetched {SYMBOL}: spot={data['records'].get('underlyingValue')}, strikes={len(data['records'].get('data', []))}, "
+          f"expiries={sum(p is not None for p in payloads)}/{len(expiries)}")
+    return data, build_term_structure(SYMBOL, expiries, payloads)
+
+async def _fetch_banknifty(pool, semaphore):
+    try:
+        expiry_dates = await _async_expiry_dates(pool, semaphore, "BANKNIFTY")
+        if not expiry_dates: return None
+
+        nearest_expiry = expiry_dates[0]
+        data = await _async_get(pool, semaphore, _chain_url("Indices", "BANKNIFTY", nearest_expiry))
+        print("   ✅ Fetched BANKNIFTY")
+        return _build_banknifty_result(data, nearest_expiry)
+    except Exception as e:
+        print(f"Error fetching BANKNIFTY data: {e}")
+        return None
+
+async def _fetch_stock(pool, semaphore, symbol: str):
+    try:
+        expiry_dates = await _async_expiry_dates(pool, semaphore, symbol)
+        if not expiry_dates: return None
+
+        nearest_expiry = expiry_dates[0]
+        try:
+            data = await _async_get(pool, semaphore, _chain_url("Equities", symbol, nearest_expiry))
+        except Exception:
+            # Fallback to legacy endpoint
+            data = await _async_get(pool, semaphore, _legacy_equity_url(symbol))
+        print(f"   ✅ Fetched {symbol}")
+        return _build_stock_result(symbol, data, nearest_expiry)
+    except Exception as e:
+        print(f"Error processing {symbol}: {e}")
+        return None
+
+async def _fetch_all(include_stocks: bool, concurrency: int):
+    from playwright.async_api import async_playwright
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    stock_symbols = list(TOP_NIFTY_STOCKS.keys()) if include_stocks else []
+
+    async def gather_all(pool):
+        return await asyncio.gather(
+            _fetch_nifty(pool, semaphore),
+            _fetch_banknifty(pool, semaphore),
+            *(_fetch_stock(pool, semaphore, symbol) for symbol in stock_symbols),
+            return_exceptions=True
+        )
+
+    if ENABLE_HTTP_FAST_PATH:
+        # Cookie harvest uses the sync browser, so keep it off the event loop thread
+        await asyncio.to_thread(_ensure_http_session)
+        results = await gather_all(None)
+    else:
+        async with async_playwright() as pw:
+            browser = await pw.chromium.launch(headless=True, args=_CHROME_ARGS)
+            pool = AsyncContextPool(browser, size=min(BROWSER_POOL_SIZE, concurrency))
+            try:
+                await pool.start()
+                results = await gather_all(pool)
+                print(f"🧰 Context pool: {pool.stats}")
+            finally:
+                await pool.close()
+                await browser.close()
+
+    nifty_result, banknifty_data, *stock_results = results
+    if isinstance(nifty_result, BaseException):
+        raise nifty_result
+    raw_nifty, nifty_term = nifty_result
+    if isinstance(banknifty_data, BaseException):
+        banknifty_data = None
+
+    stock_data = {
+        symbol: result for symbol, result in zip(stock_symbols, stock_results)
+        if result and not isinstance(result, BaseException)
+    } if include_stocks else None
+    return raw_nifty, banknifty_data, stock_data, nifty_term
+
+# ---------------------------------------------------------
+# PUBLIC ENTRY POINT
+# ---------------------------------------------------------
+def fetch_all_concurrent(include_stocks: bool = False, concurrency: int = FETCH_CONCURRENCY):
+    """
+    Fetches NIFTY (nearest MULTI_EXPIRY_COUNT expiries), BANKNIFTY and (optionally) the top stocks concurrently.
+    Returns (raw_nifty_payload, banknifty_data, stock_data, nifty_term_structure) in the same shapes as the
+    sequential fetch_option_chains / fetch_banknifty_data / fetch_all_stock_data calls.
+    """
+    symbols = 2 + (len(TOP_NIFTY_STOCKS) if include_stocks else 0)
+    print(f"⚡ Concurrent fetch: {symbols} underlyings, concurrency={concurrency}")
+    start = time.perf_counter()
+    result = asyncio.run(_fetch_all(include_stocks, concurrency))
+    print(f"⚡ Concurrent fetch finished in {time.perf_counter() - start:.1f}s")
+    return result
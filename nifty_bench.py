@@ -0,0 +1,173 @@
+import re
+import json
+import time
+import random
+import datetime
+import argparse
+
+from nifty_config import parse_numeric_value, parse_float_value
+from nifty_chain import OptionChain, FIELDS as CHAIN_FIELDS
+from nifty_decoder import ORJSON_AVAILABLE, loads, decode_payload
+from nifty_payload import ENCODERS
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+# ---------------------------------------------------------
+# SYNTHETIC NSE PAYLOAD
+# ---------------------------------------------------------
+def synthetic_payload(spot: float = 24512.3, strikes: int = 200, step: int = 50,
+                      expiry: str = "23-Oct-2026", seed: int = 1) -> str:
+    """A v3 option-chain body shaped like NSE's, including the fields the decoder ignores."""
+    rng = random.Random(seed)
+    atm = round(spot / step) * step
+
+    def side(strike):
+        return {
+            "strikePrice": strike, "expiryDate": expiry, "underlying": "NIFTY",
+            "identifier": f"OPTIDXNIFTY{expiry}{strike}", "openInterest": rng.randint(0, 200000),
+            "changeinOpenInterest": rng.randint(-50000, 80000), "pchangeinOpenInterest": rng.uniform(-50, 50),
+            "totalTradedVolume": rng.randint(0, 900000), "impliedVolatility": round(rng.uniform(8, 25), 2),
+            "lastPrice": round(rng.uniform(0.5, 400), 2), "change": rng.uniform(-50, 50),
+            "pChange": rng.uniform(-20, 20), "totalBuyQuantity": rng.randint(0, 10**6),
+            "totalSellQuantity": rng.randint(0, 10**6), "bidQty": 75, "bidprice": 1.0,
+            "askQty": 150, "askPrice": 1.1, "underlyingValue": spot,
+        }
+
+    data = []
+    for i in range(-strikes // 2, strikes - strikes // 2):
+        strike = atm + i * step
+        data.append({"strikePrice": strike, "expiryDate": expiry, "CE": side(strike), "PE": side(strike)})
+    return json.dumps({
+        "records": {"underlyingValue": spot, "expiryDates": [expiry], "data": data,
+                    "timestamp": "16-Oct-2026 10:00:00", "strikePrices": [r["strikePrice"] for r in data]},
+        "filtered": {"data": data},
+    })
+
+# ---------------------------------------------------------
+# PREVIOUS DECODER (json + per-field try/except + unmemoized strptime)
+# ---------------------------------------------------------
+def _legacy_normalise_expiry(raw: str) -> str:
+    if not raw: return raw
+    for fmt in ('%d-%b-%Y', '%d-%m-%Y', '%d/%m/%Y'):
+        try:
+            return datetime.datetime.strptime(raw, fmt).strftime('%d-%b-%Y')
+        except ValueError:
+            continue
+    return raw
+
+def _legacy_decode(text: str, symbol: str) -> OptionChain:
+    data = json.loads(text)
+    expiry_filter = data['records']['expiryDates'][0]
+    columns = {name: [] for name in ('strike_price',) + CHAIN_FIELDS}
+    for record in data['records']['data']:
+        ce_data = record.get('CE', {})
+        pe_data = record.get('PE', {})
+        raw_expiry = record.get('expiryDate') or ce_data.get('expiryDate', '') or pe_data.get('expiryDate', '')
+        if _legacy_normalise_expiry(raw_expiry or expiry_filter) != expiry_filter:
+            continue
+
+        columns['strike_price'].append(record.get('strikePrice') or ce_data.get('strikePrice') or pe_data.get('strikePrice') or 0)
+        columns['ce_change_oi'].append(parse_numeric_value(ce_data.get('changeinOpenInterest', 0)))
+        columns['ce_volume'].append(parse_numeric_value(ce_data.get('totalTradedVolume', 0)))
+        columns['ce_ltp'].append(parse_float_value(ce_data.get('lastPrice', 0)))
+        columns['ce_oi'].append(parse_numeric_value(ce_data.get('openInterest', 0)))
+        columns['ce_iv'].append(parse_float_value(ce_data.get('impliedVolatility', 0)))
+        columns['pe_change_oi'].append(parse_numeric_value(pe_data.get('changeinOpenInterest', 0)))
+        columns['pe_volume'].append(parse_numeric_value(pe_data.get('totalTradedVolume', 0)))
+        columns['pe_ltp'].append(parse_float_value(pe_data.get('lastPrice', 0)))
+        columns['pe_oi'].append(parse_numeric_value(pe_data.get('openInterest', 0)))
+        columns['pe_iv'].append(parse_float_value(pe_data.get('impliedVolatility', 0)))
+
+    return OptionChain.from_columns(symbol, data['records']['underlyingValue'], expiry_filter, columns)
+
+def _current_decode(text: str, symbol: str) -> OptionChain:
+    return decode_payload(loads(text), symbol, nearest_only=True)
+
+# ---------------------------------------------------------
+# DECODER MICRO-BENCHMARK
+# ---------------------------------------------------------
+def _time_decoder(decode, text: str, rounds: int):
+    decode(text, "NIFTY")  # Warm caches / imports
+    best = float('inf')
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            chain = decode(text, "NIFTY")
+        best = min(best, (time.perf_counter() - start) / rounds)
+    return best, chain
+
+def bench_decoder(text: str, rounds: int):
+    """Rows/sec for the previous vs the current decoder on the same body (best of 5 runs)."""
+    before, old_chain = _time_decoder(_legacy_decode, text, rounds)
+    after, new_chain = _time_decoder(_current_decode, text, rounds)
+    if old_chain.to_csv() != new_chain.to_csv():
+        raise SystemExit("❌ Decoders disagree on the decoded chain")
+
+    rows = len(new_chain)
+    print(f"🧪 Decoder benchmark: {rows} strikes, {len(text) / 1024:.0f} KB body, "
+          f"JSON backend={'orjson' if ORJSON_AVAILABLE else 'json'}")
+    print(f"   Before: {before * 1000:7.2f} ms/payload | {rows / before:>10,.0f} rows/sec")
+    print(f"   After:  {after * 1000:7.2f} ms/payload | {rows / after:>10,.0f} rows/sec")
+    print(f"   Speedup: {before / after:.1f}x")
+
+# ---------------------------------------------------------
+# PAYLOAD ENCODERS (Input tokens per option-chain table format)
+# ---------------------------------------------------------
+# Offline stand-in for a BPE tokenizer: digit runs split into chunks of up to 3, words, punctuation
+_APPROX_TOKEN = re.compile(r"\d{1,3}|[A-Za-z]+|[^\sA-Za-z\d]")
+
+def count_tokens(text: str) -> int:
+    """cl100k_base token count when tiktoken is installed, else a regex approximation."""
+    if TIKTOKEN_AVAILABLE:
+        return len(tiktoken.get_encoding("cl100k_base").encode(text))
+    return len(_APPROX_TOKEN.findall(text))
+
+def bench_payload(text: str, window: int = 600):
+    """Tokens of the ATM +/- window table (as written into the AI query) for every encoder."""
+    chain = decode_payload(loads(text), "NIFTY", nearest_only=True)
+    atm = round(chain.underlying_value / 50) * 50
+    table = chain.window(atm, window)
+
+    print(f"🧪 Payload encoder benchmark: {len(table)} strikes (ATM {atm} +/- {window}), "
+          f"tokenizer={'tiktoken cl100k_base' if TIKTOKEN_AVAILABLE else 'regex approximation'}")
+    baseline = None
+    for name, encoder in ENCODERS.items():
+        encoded = encoder.encode(table, atm)
+        tokens = count_tokens(encoded)
+        baseline = baseline or tokens
+        print(f"   {name:<9} {tokens:>6,} tokens | {len(encoded):>6,} chars | {tokens / len(table):5.1f} tokens/strike "
+              f"| {100 * (tokens - baseline) / baseline:+6.1f}% vs csv")
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the NSE data path.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    decoder = sub.add_parser("decoder", help="Rows/sec of the option-chain decoder, before vs after")
+    decoder.add_argument("--payload", help="Recorded NSE body to decode (default: synthetic chain)")
+    decoder.add_argument("--strikes", type=int, default=200)
+    decoder.add_argument("--rounds", type=int, default=50)
+    payload = sub.add_parser("payload", help="Input tokens of the option-chain table per payload encoder")
+    payload.add_argument("--payload", help="Recorded NSE body to encode (default: synthetic chain)")
+    payload.add_argument("--window", type=int, default=600, help="Strikes within ATM +/- this many points")
+    args = parser.parse_args()
+
+    if args.command == "decoder":
+        if args.payload:
+            with open(args.payload, 'r', encoding='utf-8') as f:
+                text = f.read()
+        else:
+            text = synthetic_payload(strikes=args.strikes)
+        bench_decoder(text, args.rounds)
+    elif args.command == "payload":
+        if args.payload:
+            with open(args.payload, 'r', encoding='utf-8') as f:
+                text = f.read()
+        else:
+            text = synthetic_payload()
+        bench_payload(text, args.window)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import time
+import asyncio
+from contextlib import asynccontextmanager
+
+from nifty_config import BROWSER_POOL_SIZE, BROWSER_CONTEXT_MAX_REQUESTS, BROWSER_HEALTH_CHECK_IDLE
+from nifty_retry import classify
+from nifty_rate_limit import throttle_async
+from nifty_fetcher import (
+    _CONTEXT_OPTIONS, _INIT_SCRIPT, _NSE_HEADERS, _WARM_URLS, _WARM_HEADERS,
+    _load_session_state, _save_session_state, _probe_url, _accept_probe
+)
+
+# ---------------------------------------------------------
+# CONTEXT WARM-UP (Each pooled context gets its own cookies)
+# ---------------------------------------------------------
+async def _async_warm(context, state_restored: bool = False, label: str = ""):
+    """Warm NSE session cookies on an async browser context (skipped if the restored state still works)."""
+    tag = f" [{label}]" if label else ""
+    if state_restored:
+        try:
+            await throttle_async(_probe_url())
+            resp = await context.request.get(_probe_url(), headers=_NSE_HEADERS, timeout=10_000)
+            if _accept_probe(resp.status, await resp.text()):
+                print(f"✅ Restored NSE session is valid (warm-up skipped){tag}")
+                return
+        except Exception:
+            pass
+        print(f"⚠️ Restored NSE session rejected, warming up...{tag}")
+
+    print(f"🍪 Warming NSE session cookies (async){tag}...")
+    for url in _WARM_URLS:
+        try:
+            await throttle_async(url)
+            await context.request.get(url, headers=_WARM_HEADERS, timeout=20_000)
+        except Exception:
+            pass # Non-fatal
+    _save_session_state(await context.storage_state())
+    print(f"✅ Session warm-up complete{tag}")
+
+# ---------------------------------------------------------
+# BROWSER CONTEXT POOL (Checkout / return, recycle after N requests or on error)
+# ---------------------------------------------------------
+class PooledContext:
+    """One warmed browser context plus the bookkeeping the pool recycles on."""
+
+    __slots__ = ('context', 'number', 'requests', 'last_used')
+
+    def __init__(self, context, number: int):
+        self.context = context
+        self.number = number
+        self.requests = 0
+        self.last_used = time.monotonic()
+
+class AsyncContextPool:
+    """
+    Fixed-size pool of independently warmed contexts in one browser.
+    A context is replaced when it errors (anything but a permanent 4xx), after `max_requests`,
+    or when it fails the probe it gets after sitting idle for `health_check_idle` seconds.
+    """
+
+    def __init__(self, browser, size: int = BROWSER_POOL_SIZE, max_requests: int = BROWSER_CONTEXT_MAX_REQUESTS,
+                 health_check_idle: float = BROWSER_HEALTH_CHECK_IDLE):
+        self.browser = browser
+        self.size = max(1, size)
+        self.max_requests = max_requests
+        self.health_check_idle = health_check_idle
+        self._idle = asyncio.Queue()
+        self._created = 0
+        self.stats = {"created": 0, "recycled": 0, "health_failures": 0}
+
+    async def _create(self) -> PooledContext:
+        self._created += 1
+        number = self._created
+        state = _load_session_state()
+        context = await self.browser.new_context(storage_state=state, **_CONTEXT_OPTIONS)
+        await context.add_init_script(_INIT_SCRIPT)
+        await _async_warm(context, state_restored=state is not None, label=f"ctx#{number}")
+        self.stats["created"] += 1
+        return PooledContext(context, number)
+
+    async def start(self):
+        """Creates and warms every context concurrently."""
+        for pooled in await asyncio.gather(*(self._create() for _ in range(self.size))):
+            self._idle.put_nowait(pooled)
+        print(f"🧰 Browser context pool ready ({self.size} contexts)")
+
+    async def _healthy(self, pooled: PooledContext) -> bool:
+        try:
+            await throttle_async(_probe_url())
+            resp = await pooled.context.request.get(_probe_url(), headers=_NSE_HEADERS, timeout=10_000)
+            return _accept_probe(resp.status, await resp.text())
+        except Exception:
+            return False
+
+    async def _replace(self, pooled: PooledContext, reason: str) -> PooledContext:
+        """New warmed context first, then close the old one (keeps the old one if the new one fails)."""
+        print(f"♻️ Recycling context #{pooled.number} ({reason})")
+        try:
+            fresh = await self._create()
+        except Exception as e:
+            print(f"⚠️ Could not create replacement context: {e}")
+            return pooled
+        try:
+            await pooled.context.close()
+        except Exception:
+            pass
+        self.stats["recycled"] += 1
+        return fresh
+
+    async def checkout(self) -> PooledContext:
+        pooled = await self._idle.get()
+        if time.monotonic() - pooled.last_used > self.health_check_idle and not await self._healthy(pooled):
+            self.stats["health_failures"] += 1
+            pooled = await self._replace(pooled, "failed health check")
+        return pooled
+
+    async def checkin(self, pooled: PooledContext, error: Exception = None):
+        pooled.requests += 1
+        pooled.last_used = time.monotonic()
+        if error is not None and classify(error) != "permanent":
+            pooled = await self._replace(pooled, f"error: {error}")
+        elif pooled.requests >= self.max_requests:
+            pooled = await self._replace(pooled, f"{pooled.requests} requests served")
+        self._idle.put_nowait(pooled)
+
+    @asynccontextmanager
+    async def lease(self):
+        """`async with pool.lease() as context:` - returned (and recycled if needed) on exit."""
+        pooled = await self.checkout()
+        error = None
+        try:
+            yield pooled.context
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            await self.checkin(pooled, error)
+
+    async def close(self):
+        while not self._idle.empty():
+            pooled = self._idle.get_nowait()
+            try:
+                await pooled.context.close()
+            except Exception:
+                pass
@@ -0,0 +1,143 @@
+import hashlib
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+# ---------------------------------------------------------
+# COLUMN LAYOUT
+# ---------------------------------------------------------
+INT_FIELDS = ('ce_change_oi', 'ce_volume', 'ce_oi', 'pe_change_oi', 'pe_volume', 'pe_oi')
+FLOAT_FIELDS = ('ce_ltp', 'ce_iv', 'pe_ltp', 'pe_iv')
+FIELDS = ('ce_change_oi', 'ce_volume', 'ce_ltp', 'ce_oi', 'ce_iv',
+          'pe_change_oi', 'pe_volume', 'pe_ltp', 'pe_oi', 'pe_iv')
+
+CSV_HEADER = "CE_ChgOI,CE_Vol,CE_LTP,CE_OI,CE_IV,STRIKE,PE_ChgOI,PE_Vol,PE_LTP,PE_OI,PE_IV,CE-PE_DIFF"
+
+
+class OptionChain:
+    """
+    Column-oriented option chain for one underlying and expiry.
+    Every field is a NumPy array aligned with `strike_price`; spot/expiry are stored once.
+    """
+
+    __slots__ = ('symbol', 'underlying_value', 'expiry_date', 'strike_price', '_index') + FIELDS
+
+    def __init__(self, symbol: str, underlying_value: float, expiry_date: str,
+                 strike_price, **columns):
+        self.symbol = symbol
+        self.underlying_value = underlying_value
+        self.expiry_date = expiry_date
+        self.strike_price = np.asarray(strike_price, dtype=np.float64)
+        for name in FIELDS:
+            dtype = np.int64 if name in INT_FIELDS else np.float64
+            values = columns.get(name)
+            setattr(self, name, np.zeros(len(self.strike_price), dtype=dtype) if values is None
+                    else np.asarray(values, dtype=dtype))
+        self._index = None
+
+    @classmethod
+    def from_columns(cls, symbol: str, underlying_value: float, expiry_date: str,
+                     columns: Dict[str, list]) -> "OptionChain":
+        """Builds a chain from plain per-field lists (the decoder's output), sorted by strike."""
+        chain = cls(symbol, underlying_value, expiry_date, columns['strike_price'],
+                    **{name: columns[name] for name in FIELDS})
+        order = np.argsort(chain.strike_price, kind='stable')
+        if len(order) and np.any(order != np.arange(len(order))):
+            chain = chain.take(order)
+        return chain
+
+    # ---------------------------------------------------------
+    # ACCESS
+    # ---------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self.strike_price)
+
+    @property
+    def strike_index(self) -> Dict[float, int]:
+        """strike -> row position (built once, O(1) lookups afterwards)."""
+        if self._index is None:
+            self._index = {strike: i for i, strike in enumerate(self.strike_price.tolist())}
+        return self._index
+
+    def index_of(self, strike: float) -> Optional[int]:
+        return self.strike_index.get(float(strike))
+
+    def value(self, strike: float, field: str):
+        i = self.index_of(strike)
+        return None if i is None else getattr(self, field)[i].item()
+
+    def row(self, i: int) -> Dict[str, Any]:
+        """One strike as a plain dict (for display/debugging; hot paths use the columns)."""
+        out = {'strike_price': _plain_strike(self.strike_price[i].item())}
+        out.update({name: getattr(self, name)[i].item() for name in FIELDS})
+        return out
+
+    def rows(self) -> List[Dict[str, Any]]:
+        return [self.row(i) for i in range(len(self))]
+
+    # ---------------------------------------------------------
+    # VECTORIZED OPERATIONS
+    # ---------------------------------------------------------
+    def take(self, selector) -> "OptionChain":
+        """New chain restricted to a boolean mask or index array."""
+        return OptionChain(self.symbol, self.underlying_value, self.expiry_date,
+                           self.strike_price[selector],
+                           **{name: getattr(self, name)[selector] for name in FIELDS})
+
+    def pcr(self) -> Tuple[float, float]:
+        """(OI PCR, Volume PCR) over all strikes, 1.0 when the call side is empty."""
+        total_ce_oi = int(self.ce_oi.sum())
+        total_ce_volume = int(self.ce_volume.sum())
+        oi_pcr = int(self.pe_oi.sum()) / total_ce_oi if total_ce_oi > 0 else 1.0
+        volume_pcr = int(self.pe_volume.sum()) / total_ce_volume if total_ce_volume > 0 else 1.0
+        return oi_pcr, volume_pcr
+
+    def strike_step(self) -> float:
+        """Most common gap between listed strikes (50 for NIFTY, 100 for BANKNIFTY, varies for stocks)."""
+        if len(self) < 2:
+            return 1.0
+        gaps = np.diff(self.strike_price)
+        gaps = gaps[gaps > 0]
+        if not len(gaps):
+            return 1.0
+        values, counts = np.unique(gaps, return_counts=True)
+        return float(values[np.argmax(counts)])
+
+    def atm_strike(self, step: float = None) -> float:
+        step = step or self.strike_step()
+        return round(self.underlying_value / step) * step
+
+    def window(self, center: float, width: float) -> "OptionChain":
+        """Strikes with |strike - center| <= width."""
+        return self.take(np.abs(self.strike_price - center) <= width)
+
+    def to_csv(self) -> str:
+        """All rows in the CSV_HEADER column order, one line per strike (no header)."""
+        if not len(self):
+            return ""
+        ce_ltp = np.char.mod('%.1f', self.ce_ltp)
+        pe_ltp = np.char.mod('%.1f', self.pe_ltp)
+        ce_iv = np.where(self.ce_iv == 0, '0', np.char.mod('%.1f', self.ce_iv))
+        pe_iv = np.where(self.pe_iv == 0, '0', np.char.mod('%.1f', self.pe_iv))
+        whole = self.strike_price == np.floor(self.strike_price)
+        strikes = np.where(whole, np.char.mod('%d', self.strike_price.astype(np.int64)),
+                           np.char.mod('%s', self.strike_price))
+        diff = self.ce_change_oi - self.pe_change_oi
+
+        columns = [self.ce_change_oi.astype(str), self.ce_volume.astype(str), ce_ltp,
+                   self.ce_oi.astype(str), ce_iv, strikes,
+                   self.pe_change_oi.astype(str), self.pe_volume.astype(str), pe_ltp,
+                   self.pe_oi.astype(str), pe_iv, diff.astype(str)]
+        return "\n".join(map(",".join, zip(*(c.tolist() for c in columns)))) + "\n"
+
+    def fingerprint(self) -> str:
+        """Content hash of spot, expiry and per-strike OI / volume / LTP (equal when NSE re-serves the same chain)."""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{self.symbol}|{self.underlying_value!r}|{self.expiry_date}".encode())
+        for column in (self.strike_price, self.ce_oi, self.pe_oi, self.ce_volume, self.pe_volume,
+                       self.ce_ltp, self.pe_ltp):
+            digest.update(np.ascontiguousarray(column).tobytes())
+        return digest.hexdigest()
+
+def _plain_strike(strike: float):
+    return int(strike) if strike == int(strike) else strike
@@ -12,6 +12,33 @@ FETCH_INTERVAL = 1800  # Seconds between fetches in loop mode
 ENABLE_AI_ANALYSIS = True
 ENABLE_LOOP_FETCHING = False
 ENABLE_STOCK_DISPLAY = False
+ENABLE_LOCAL_ENGINE = True   # Compute v15.1 values locally instead of asking the LLM to do the math
+ENABLE_CONCURRENT_FETCH = True  # Fetch NIFTY, BANKNIFTY and stocks in parallel (Playwright async API)
+FETCH_CONCURRENCY = 4           # Max NSE requests in flight during a concurrent fetch
+ENABLE_HTTP_FAST_PATH = True    # Browser only harvests cookies; API calls go through a pooled HTTP client
+HTTP_POOL_SIZE = 10             # Keep-alive connections in the fast-path pool
+BROWSER_POOL_SIZE = 3           # Warmed browser contexts when the concurrent fetch runs through Playwright
+BROWSER_CONTEXT_MAX_REQUESTS = 40   # Recycle a pooled context after this many requests
+BROWSER_HEALTH_CHECK_IDLE = 300     # Probe a pooled context before reuse if idle this long (seconds)
+
+# Loop-mode browser watchdog (see nifty_watchdog.py). Watches the long-lived sync browser only; the
+# concurrent fetch's context pool launches and closes its own Chromium every cycle and recycles
+# contexts itself (BROWSER_CONTEXT_MAX_REQUESTS / BROWSER_HEALTH_CHECK_IDLE above)
+BROWSER_MAX_RSS_MB = 700        # Recycle Chromium above this resident memory
+BROWSER_MAX_REQUESTS = 500      # ...or after this many requests on one browser
+BROWSER_LATENCY_FACTOR = 2.5    # ...or when a fetch takes this many times the recent median
+BROWSER_LATENCY_WINDOW = 10     # Cycles in the latency median
+BROWSER_IDLE_CLOSE_AFTER = 120  # Close the browser during waits at least this long (seconds)
+ENABLE_CHANGE_DETECTION = True  # Skip log/email/AI when NSE re-serves an identical chain
+ENABLE_SNAPSHOT_STORE = True    # Append every parsed chain (all strikes) to the SQLite history
+ENABLE_ADAPTIVE_WINDOW = True   # Pick the strike window from OI/volume coverage + IV range (False = ATM +/- STRIKE_WINDOW_POINTS)
+STRIKE_WINDOW_POINTS = 600      # Fixed half-width when the adaptive window is off
+STRIKE_WINDOW_COVERAGE = 0.8    # Share of OI/volume/Chg OI activity the window must hold
+STRIKE_WINDOW_SIGMA = 1.0       # ...and at least this many IV standard deviations either side of ATM
+STRIKE_WINDOW_MIN_STRIKES = 5   # Strikes always kept on each side of ATM
+STRIKE_WINDOW_MAX_STRIKES = 16  # Strikes at most on each side of ATM
+PAYLOAD_FORMAT = "compact"      # Option chain table in the AI query: csv | compact | offset | offset_k (see nifty_payload.py)
+MULTI_EXPIRY_COUNT = 3          # NIFTY expiries fetched per cycle for the term structure (1 = nearest only)
 
 # ---------------------------------------------------------
 # 2. API KEYS & CREDENTIALS
@@ -31,10 +58,78 @@ ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 AI_LOGS_DIR = os.path.join(BASE_DIR, "ai-query-logs")
 GEMINI_LOGS_DIR = os.path.join(BASE_DIR, "gemini-logs")
+CACHE_DIR = os.path.join(BASE_DIR, "cache")
+DATA_DIR = os.path.join(BASE_DIR, "data")
+ARCHIVE_DIR = os.path.join(BASE_DIR, "log-archive")
+SNAPSHOT_DB_FILE = os.path.join(DATA_DIR, "chain_snapshots.sqlite3")
+HEARTBEAT_FILE = os.path.join(AI_LOGS_DIR, "heartbeat.log")  # One line per skipped (unchanged) cycle
+LATEST_SNAPSHOT_MANIFEST = os.path.join(AI_LOGS_DIR, "latest.json")  # Pointer to the newest ai_query file
+AI_TOKEN_USAGE_LOG = os.path.join(GEMINI_LOGS_DIR, "token_usage.jsonl")  # Cached vs uncached tokens per LLM call
+
+# Expiry calendar cache (contract-info lists change weekly; roll over after the nearest expiry)
+EXPIRY_CACHE_FILE = os.path.join(CACHE_DIR, "expiry_calendar.json")
+EXPIRY_CACHE_TTL = 24 * 3600  # Seconds
+
+# Persisted browser storage state (cookies) so a fresh process can skip the warm-up
+SESSION_STATE_FILE = os.path.join(CACHE_DIR, "nse_session_state.json")
+SESSION_STATE_MAX_AGE = 6 * 3600  # Seconds
+
+# Stored LLM analyses keyed by prompt version + model + data (see nifty_response_cache.py)
+AI_RESPONSE_CACHE_FILE = os.path.join(CACHE_DIR, "ai_responses.sqlite3")
 
 # Ensure directories exist upon startup
 os.makedirs(AI_LOGS_DIR, exist_ok=True)
 os.makedirs(GEMINI_LOGS_DIR, exist_ok=True)
+os.makedirs(CACHE_DIR, exist_ok=True)
+os.makedirs(DATA_DIR, exist_ok=True)
+
+# Log retention (see nifty_retention.py): daily gzip archives, prompt template stored once
+ENABLE_LOG_RETENTION = True
+LOG_ARCHIVE_AFTER_DAYS = 1      # Archive ai_query / ai_analysis files older than this
+LOG_RETENTION_DAYS = 90         # Delete daily archives older than this
+LOG_ARCHIVE_MAX_MB = 500        # ...and oldest-first while archives exceed this size
+SNAPSHOT_RETENTION_DAYS = 30    # Drop stored chain snapshots older than this (then VACUUM the store)
+
+# NSE endpoint override (point at `python nifty_replay.py serve` for offline runs)
+NSE_BASE_URL = os.getenv("NSE_BASE_URL", "https://www.nseindia.com").rstrip("/")
+NSE_RECORD_DIR = os.getenv("NSE_RECORD_DIR")  # When set, every raw NSE payload is recorded here
+
+# Retry policy & circuit breaker for NSE requests (see nifty_retry.py)
+RETRY_MAX_ATTEMPTS = 4          # Attempts per request, including the first
+RETRY_BASE_DELAY = 0.5          # Seconds; doubled per attempt with full jitter
+RETRY_MAX_DELAY = 8.0           # Cap on a single backoff sleep
+CIRCUIT_FAILURE_THRESHOLD = 3   # Consecutive failed requests (after their retries) before an endpoint's circuit opens
+CIRCUIT_RESET_TIMEOUT = 60      # Seconds an open circuit fails fast before allowing a half-open probe
+CYCLE_RETRY_BASE_DELAY = 15     # Seconds before re-running a failed cycle in loop mode (doubles per failure)
+
+# Provider-side prompt caching of the static v15.1 prompt (see nifty_prompt_cache.py)
+ENABLE_PROMPT_CACHE = True
+GEMINI_PROMPT_CACHE_TTL = 2 * FETCH_INTERVAL  # Seconds; extended on every use so it outlives the loop wait
+CLAUDE_PROMPT_CACHE_TTL = "1h"  # Anthropic ephemeral cache lifetime ("5m" or "1h"); 5m is shorter than FETCH_INTERVAL
+
+# Persistent LLM response cache (identical data + prompt + model -> stored analysis, no API call)
+ENABLE_AI_RESPONSE_CACHE = True
+AI_RESPONSE_CACHE_TTL = 6 * 3600        # Seconds a stored analysis stays valid
+AI_RESPONSE_CACHE_MAX_ENTRIES = 200     # Least recently used entries beyond this are evicted
+
+# Gemini Flash rolling context (older snapshots sent as per-strike deltas, see nifty_flash_context.py)
+FLASH_CONTEXT_TOKEN_BUDGET = 12000  # Estimated tokens of earlier snapshots + replies per request
+FLASH_CONTEXT_MAX_TURNS = 12        # Earlier turns kept in memory (the budget decides how many are sent)
+FLASH_REPLY_SUMMARY_CHARS = 800     # Earlier Flash answers are cut to their narrative section, max this long
+
+# Streaming AI output (narrative pushed to Telegram while the model is still writing)
+ENABLE_AI_STREAMING = True
+TELEGRAM_EDIT_INTERVAL = 2.0    # Seconds between in-place edits of the live message (Bot API rate limits)
+
+# Hedged LLM requests (Pro -> Claude -> Flash) with a bounded worst case for the Telegram alert
+ENABLE_AI_HEDGING = True        # Start the next provider if the current one hasn't answered within AI_HEDGE_DELAY
+AI_HEDGE_DELAY = 60             # Seconds before a backup provider is launched alongside the primary
+AI_CYCLE_DEADLINE = 240         # Hard cap on waiting for any AI answer in one cycle (seconds)
+AI_REQUEST_TIMEOUT = AI_CYCLE_DEADLINE  # SDK timeout per request, so abandoned requests end on their own
+
+# Token-bucket rate limit per NSE host, shared by every request path (see nifty_rate_limit.py)
+NSE_RATE_LIMIT = 3.0            # Sustained requests per second
+NSE_RATE_BURST = 5              # Requests allowed back-to-back before the rate applies
 
 # ---------------------------------------------------------
 # 4. HTTP HEADERS (For Playwright / NSE APIs)
@@ -127,6 +222,12 @@ def print_configuration_status():
     print(f"AI Analysis:    {'ENABLED' if ENABLE_AI_ANALYSIS else 'DISABLED'}")
     print(f"Loop Mode:      {'ENABLED' if ENABLE_LOOP_FETCHING else 'DISABLED'}")
     print(f"Stock Data:     {'ENABLED' if ENABLE_STOCK_DISPLAY else 'DISABLED'}")
+    print(f"Local Engine:   {'ENABLED' if ENABLE_LOCAL_ENGINE else 'DISABLED'}")
+    print(f"Fetch Mode:     {f'CONCURRENT (x{FETCH_CONCURRENCY})' if ENABLE_CONCURRENT_FETCH else 'SEQUENTIAL'}")
+    print(f"Transport:      {'HTTP FAST PATH' if ENABLE_HTTP_FAST_PATH else 'PLAYWRIGHT'}")
+    print(f"Change Detect:  {'ENABLED' if ENABLE_CHANGE_DETECTION else 'DISABLED'}")
+    print(f"NIFTY Expiries: {MULTI_EXPIRY_COUNT}")
+    print(f"Snapshot Store: {'ENABLED' if ENABLE_SNAPSHOT_STORE else 'DISABLED'}")
     print(f"{'='*40}\n")
 
 if __name__ == "__main__":
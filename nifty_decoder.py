@@ -0,0 +1,148 @@
+import json
+import datetime
+from functools import lru_cache
+from typing import Dict
+
+from nifty_chain import OptionChain, FIELDS
+
+# Fast JSON backend with stdlib fallback
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# ---------------------------------------------------------
+# JSON & SCALAR DECODING
+# ---------------------------------------------------------
+def loads(text):
+    """Decode a JSON body (str or bytes) with orjson when installed."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(text)
+    return json.loads(text)
+
+@lru_cache(maxsize=256)
+def normalise_expiry(raw: str) -> str:
+    """Convert any NSE date format to 'DD-Mon-YYYY' (memoized: a chain carries only a handful of distinct expiries)."""
+    if not raw: return raw
+    for fmt in ('%d-%b-%Y', '%d-%m-%Y', '%d/%m/%Y'):
+        try:
+            return datetime.datetime.strptime(raw, fmt).strftime('%d-%b-%Y')
+        except ValueError:
+            continue
+    return raw
+
+def _to_int(value) -> int:
+    """NSE sends ints for OI/volume; strings like '1,234' or '-' only appear on the legacy endpoints."""
+    kind = type(value)
+    if kind is int:
+        return value
+    if kind is float:
+        return int(value)
+    if not value or value == '-':
+        return 0
+    try:
+        return int(float(str(value).replace(',', '')))
+    except (ValueError, TypeError):
+        return 0
+
+def _to_float(value) -> float:
+    kind = type(value)
+    if kind is float or kind is int:
+        return value
+    if not value or value == '-':
+        return 0.0
+    try:
+        return float(str(value).replace(',', ''))
+    except (ValueError, TypeError):
+        return 0.0
+
+# ---------------------------------------------------------
+# OPTION CHAIN DECODER (Indices & Equities)
+# ---------------------------------------------------------
+_EMPTY = {}
+
+class _ColumnBuilder:
+    """Per-field lists for one chain; add() reads only the ten fields the system uses."""
+
+    __slots__ = ('strike_price',) + FIELDS
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, [])
+
+    def add(self, record: dict, ce: dict, pe: dict):
+        self.strike_price.append(record.get('strikePrice') or ce.get('strikePrice') or pe.get('strikePrice') or 0)
+        self.ce_change_oi.append(_to_int(ce.get('changeinOpenInterest', 0)))
+        self.ce_volume.append(_to_int(ce.get('totalTradedVolume', 0)))
+        self.ce_ltp.append(_to_float(ce.get('lastPrice', 0)))
+        self.ce_oi.append(_to_int(ce.get('openInterest', 0)))
+        self.ce_iv.append(_to_float(ce.get('impliedVolatility', 0)))
+        self.pe_change_oi.append(_to_int(pe.get('changeinOpenInterest', 0)))
+        self.pe_volume.append(_to_int(pe.get('totalTradedVolume', 0)))
+        self.pe_ltp.append(_to_float(pe.get('lastPrice', 0)))
+        self.pe_oi.append(_to_int(pe.get('openInterest', 0)))
+        self.pe_iv.append(_to_float(pe.get('impliedVolatility', 0)))
+
+    def build(self, symbol: str, underlying_value: float, expiry_date: str) -> OptionChain:
+        return OptionChain.from_columns(symbol, underlying_value, expiry_date,
+                                        {name: getattr(self, name) for name in self.__slots__})
+
+def _record_expiry(record: dict, ce: dict, pe: dict):
+    raw = record.get('expiryDate') or ce.get('expiryDate') or pe.get('expiryDate')
+    return normalise_expiry(raw) if raw else None
+
+def decode_chain(records: list, symbol: str, underlying_value: float, expiry_date: str,
+                 expiry_filter: str = None) -> OptionChain:
+    """
+    Single pass over NSE `records.data` into an OptionChain.
+    Only the ten fields the system uses are read; everything else in the payload is ignored.
+    When expiry_filter is set, records of other expiries are skipped.
+    """
+    columns = _ColumnBuilder()
+    for record in records:
+        ce = record.get('CE') or _EMPTY
+        pe = record.get('PE') or _EMPTY
+        if expiry_filter is not None:
+            expiry = _record_expiry(record, ce, pe)
+            if expiry and expiry != expiry_filter:
+                continue
+        columns.add(record, ce, pe)
+    return columns.build(symbol, underlying_value, expiry_date)
+
+def decode_by_expiry(data: dict, symbol: str) -> Dict[str, OptionChain]:
+    """
+    One pass over `records.data`, decoding each strike straight into its expiry's columns.
+    Returns {expiry: OptionChain} in records.expiryDates order. Records without an expiry
+    (server-side filtered payloads) belong to the first listed expiry.
+    """
+    records = data['records']
+    listed = [normalise_expiry(e) for e in records.get('expiryDates', [])]
+    default_expiry = listed[0] if listed else ""
+
+    builders = {}
+    for record in records['data']:
+        ce = record.get('CE') or _EMPTY
+        pe = record.get('PE') or _EMPTY
+        expiry = _record_expiry(record, ce, pe) or default_expiry
+        builder = builders.get(expiry)
+        if builder is None:
+            builder = builders[expiry] = _ColumnBuilder()
+        builder.add(record, ce, pe)
+
+    order = {expiry: i for i, expiry in enumerate(listed)}
+    return {
+        expiry: builders[expiry].build(symbol, records['underlyingValue'], expiry)
+        for expiry in sorted(builders, key=lambda e: order.get(e, len(order)))
+    }
+
+def decode_payload(data: dict, symbol: str, expiry_date: str = None, nearest_only: bool = False) -> OptionChain:
+    """
+    Decode a full NSE chain payload. nearest_only keeps just records.expiryDates[0]; otherwise a given
+    expiry_date keeps just that expiry (the legacy equity endpoint returns every expiry in one payload).
+    """
+    records = data['records']
+    if nearest_only:
+        expiry_date = records['expiryDates'][0]
+    return decode_chain(records['data'], symbol, records['underlyingValue'], expiry_date,
+                        expiry_filter=normalise_expiry(expiry_date) if expiry_date else None)
@@ -0,0 +1,686 @@
+import datetime
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple
+
+from nifty_chain import OptionChain, FIELDS as CHAIN_FIELDS
+from nifty_expiry_cache import IST, MARKET_CLOSE, parse_expiry
+
+# ---------------------------------------------------------
+# v15.1 CONSTANTS (Mirrors the static prompt in nifty_logger)
+# ---------------------------------------------------------
+MARKET_OPEN = datetime.time(9, 15)
+SESSION_MINUTES = 375
+
+ATM_RANGE_POINTS = 300
+ATM_EXTENDED_POINTS = 500
+
+# (max DTE, INST_THRESHOLD, COUNTER_THRESHOLD, DTE_MODE)
+DTE_TIERS = [
+    (0, 30, 25, "EXPIRY_DAY"),
+    (1, 60, 50, "DAY_BEFORE_EXPIRY"),
+    (7, 100, 90, "NEAR_EXPIRY"),
+    (15, 150, 130, "MID_CYCLE"),
+]
+DTE_TIER_DEFAULT = (200, 175, "EARLY_CYCLE")
+
+
+@dataclass
+class DominantStrike:
+    """One entry of DOMINANT_PUT_STRIKES / DOMINANT_CALL_STRIKES."""
+    strike: float
+    side: str          # 'PUT' or 'CALL'
+    weighted: float
+    raw: int
+    vol_ok: bool
+    iv_flag: str
+    premium: float
+    volume: int
+
+    def is_institutional(self, threshold: float) -> bool:
+        return self.premium < threshold
+
+    def detail_row(self, threshold: float) -> str:
+        label = "INSTITUTIONAL" if self.is_institutional(threshold) else "RETAIL"
+        vol = "VALID" if self.vol_ok else "PASSIVE WALL"
+        return (f"{self.strike:g} | {self.side} | {self.raw:+,} | {self.weighted:,.0f} | "
+                f"{self.premium:.1f} | {vol} | {self.iv_flag} | {label}")
+
+
+@dataclass
+class V15Result:
+    """Every locked value of the v15.1 protocol for one snapshot."""
+    # 0. Context
+    spot: float
+    previous_spot: Optional[float]
+    price_vector: Optional[float]
+    time_now: str
+    time_since_open: Optional[int]
+    expiry: str
+    today: str
+    dte: int
+    dte_mode: str
+    is_expiry_day: bool
+    inst_threshold: int
+    counter_threshold: int
+    atm: float
+    data_points: int
+    # 0-B. IV baseline
+    iv_baseline: float
+    liquid_strike_count: int
+    # 2.1 - 2.6 Momentum engine
+    dominant_put_strikes: List[DominantStrike]
+    dominant_call_strikes: List[DominantStrike]
+    total_put_oi: int
+    total_call_oi: int
+    pct_top3: float
+    vol_invalid_count: int
+    iv_spike_count: int
+    inst_pct: float
+    inst_label: str
+    iv_writing_confidence: str
+    classification_warning: str
+    ratio: float
+    momentum: str
+    score: int
+    expiry_cap_applied: bool
+    strength: str
+    oi_pcr: float
+    volume_pcr: float
+    banknifty_oi_pcr: Optional[float]
+    banknifty_dominant: str
+    alignment: str
+    # 3. Reversal engine
+    unwind_possible: bool
+    unwind_signals: List[str]
+    raw_counter_count: int
+    counter_count: int
+    counter_note: str
+    counter_signals: List[str]
+    max_pain: float
+    max_pain_reliable: bool
+    max_pain_warning: str
+    spot_to_pain: float
+    pain_pressure: str
+    trapped: bool
+    approaching_pain: bool
+    pcr_source: str
+    pcr_quality: str
+    pcr_div: bool
+    bn_div: bool
+    rev_score: int
+    confidence: str
+    confidence_note: str
+    rev_dir: str
+    # 4. Levels & entry
+    support: float
+    support_2: Optional[float]
+    support_3: Optional[float]
+    resistance: float
+    resistance_2: Optional[float]
+    resistance_3: Optional[float]
+    hold_level: str
+    trigger_condition: str
+    trigger_level: str
+    entry_window: str
+    entry_allowed: bool
+    # 4-C. Probability & targets
+    eir: float
+    win_probability: float
+    trade_type: str
+    math_entry: Any
+    math_t1: Any
+    math_t2: Any
+    math_sl: Any
+    score_breakdown: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def unwind_count(self) -> int:
+        return len(self.unwind_signals)
+
+    def format_report(self) -> str:
+        """Renders the v15.1 FINAL OUTPUT block with every value already filled in."""
+        def lvl(value):
+            return "None" if value is None else f"{value:g}"
+
+        def num(value):
+            return f"{value:.1f}" if isinstance(value, (int, float)) else str(value)
+
+        tsopen = "MARKET CLOSED" if self.time_since_open is None else f"{self.time_since_open} min"
+        vector = "UNAVAILABLE" if self.price_vector is None else f"{self.price_vector:+.2f}"
+        bn_pcr = "UNAVAILABLE" if self.banknifty_oi_pcr is None else f"{self.banknifty_oi_pcr:.2f}"
+        pcr_align = ('ALIGNED' if (self.oi_pcr > 1 and self.total_put_oi > self.total_call_oi)
+                     or (self.oi_pcr < 1 and self.total_call_oi > self.total_put_oi) else 'DIVERGENT')
+        contradictory = (len(self.dominant_put_strikes) if self.momentum == 'BEARISH'
+                         else len(self.dominant_call_strikes))
+        invalid = [d for d in self.dominant_put_strikes + self.dominant_call_strikes if not d.vol_ok]
+        spikes = [d for d in self.dominant_put_strikes + self.dominant_call_strikes if d.iv_flag == "IV_SPIKE"]
+        b = self.score_breakdown
+
+        lines = [
+            "═══════════════════════════════════════════════",
+            "NIFTY INTRADAY ANALYSIS — v15.1 (LOCAL ENGINE)",
+            f"DATA TIME: {self.time_now} | DTE: {self.dte} ({self.dte_mode})",
+            "═══════════════════════════════════════════════",
+            "",
+            "CONTEXT:",
+            f"  SPOT={self.spot:.2f}, Vector={vector}, Prev={lvl(self.previous_spot)} | ATM={self.atm:g}, "
+            f"DTE={self.dte} ({self.dte_mode}), INST_THRESHOLD={self.inst_threshold}, Data points={self.data_points}",
+            f"  Time since open: {tsopen} | Expiry: {self.expiry} | Today: {self.today}",
+            "",
+            "QUANTITATIVE EVIDENCE:",
+            f"  Net Chg OI (Puts - Calls):    {self.total_put_oi - self.total_call_oi:+,}",
+            f"  Total Put Chg OI (Positive):  {self.total_put_oi:,}",
+            f"  Total Call Chg OI (Positive): {self.total_call_oi:,}",
+            f"  Ratio (Put/Call):             {self.ratio:.2f}",
+            f"  IV Baseline:                  {self.iv_baseline:.1f} ({self.liquid_strike_count} liquid strikes)",
+            f"  IV Writing Confidence:        {self.iv_writing_confidence}",
+            "",
+            "KEY FLOW EVIDENCE — TOP DOMINANT STRIKES:",
+            "  [Format: STRIKE | TYPE | Raw Chg OI | Weighted OI | Premium | Vol-Valid | IV-Flag | Classification]",
+            "  PUT WRITERS (Support):",
+        ]
+        lines += [f"  {d.detail_row(self.inst_threshold)}" for d in self.dominant_put_strikes] or ["  None"]
+        lines.append("  CALL WRITERS (Resistance):")
+        lines += [f"  {d.detail_row(self.inst_threshold)}" for d in self.dominant_call_strikes] or ["  None"]
+        lines += [
+            "",
+            "VOLUME VALIDATION SUMMARY:",
+            f"  Dominant strikes with invalid volume (Vol < 3×ChgOI): {self.vol_invalid_count}",
+        ]
+        lines += [f"  {d.strike:g} {d.side}: PASSIVE WALL — not active battlefield" for d in invalid]
+        lines += [
+            "",
+            "IV ENGINE SUMMARY:",
+            f"  IV_SPIKE strikes in dominants: {self.iv_spike_count}",
+        ]
+        lines += [f"  {d.strike:g} {d.side}: Potential LONG BUILDUP — not confirmed writing" for d in spikes]
+        lines += [
+            "",
+            "MOMENTUM DRIVERS:",
+            f"  Primary:      {self.inst_pct:.0f}% → {self.inst_label} ({self.dte_mode} threshold = {self.inst_threshold})",
+            f"  Concentration:{self.pct_top3:.0%} in top 3 strikes (threshold 60% for strong signal)",
+            f"  Ratio:        {self.ratio:.2f} → {self.momentum}",
+            f"  Contradictory:{contradictory} dominant opposite-side strikes",
+            f"  {self.classification_warning}",
+            "",
+            f"BANKNIFTY CONFIRMATION: {self.alignment}",
+            f"  BankNifty OI PCR = {bn_pcr} → {self.banknifty_dominant}",
+            f"  vs Nifty Momentum = {self.momentum}",
+            "",
+            "CRITICAL LEVELS:",
+            f"  Primary Support (strongest OI wall):     {lvl(self.support)}",
+            f"  Secondary Support:                       {lvl(self.support_2)} / {lvl(self.support_3)}",
+            f"  Primary Resistance (strongest OI wall):  {lvl(self.resistance)}",
+            f"  Secondary Resistance:                    {lvl(self.resistance_2)} / {lvl(self.resistance_3)}",
+            f"  Max Pain:                                {self.max_pain:g} (Reliable: {self.max_pain_reliable})",
+            f"  Max Pain Warning:                        {self.max_pain_warning}",
+            f"  Current Momentum holds:                  {self.hold_level}",
+            f"  Momentum Shift Trigger:                  {self.trigger_condition} {self.trigger_level}",
+            "",
+            f"CURRENT MOMENTUM: {self.momentum}",
+            f"STRENGTH:         {self.strength} ({self.score}/10) | Expiry cap: {self.expiry_cap_applied}",
+            f"CONFIDENCE:       {self.confidence} | {self.confidence_note}",
+            "",
+            "PCR DATA:",
+            f"  OI PCR    [{self.oi_pcr:.2f}]    [{pcr_align}]",
+            f"  Volume PCR [{self.volume_pcr:.2f}]  [Source: {self.pcr_source} | Quality: {self.pcr_quality}]",
+            f"  PCR Divergence: {self.pcr_div}",
+            "",
+            f"STRENGTH METER: {self.score}/10",
+            f"  +3 if INST_PCT ≥ 85%      → [+{b.get('inst', 0)}]",
+            f"  +2 if PCT_TOP3 ≥ 60%      → [+{b.get('top3', 0)}]",
+            f"  +1 if Ratio extreme        → [+{b.get('ratio', 0)}]",
+            f"  +1 if PCR aligned          → [+{b.get('pcr', 0)}]",
+            f"  +1 if premium DTE-adjusted → [+{b.get('premium', 0)}]",
+            f"  +1 if all vol-validated    → [+{b.get('volume', 0)}]",
+            f"  +1 if IV environment clean → [+{b.get('iv', 0)}]",
+            f"  Expiry cap (max 6 if DTE=0): {self.expiry_cap_applied}",
+            "",
+            "TRADE RECOMMENDATION & TARGETS:",
+            f"  Action:        {self.trade_type}",
+            f"  Entry Zone:    {num(self.math_entry)}",
+            f"  Target 1 (T1): {num(self.math_t1)} (Mathematical Intraday Swing based on IV)",
+            f"  Target 2 (T2): {num(self.math_t2)} (Dominant OI Level)",
+            f"  Stop Loss:     {num(self.math_sl)} (Requires 15-min candle close beyond this level)",
+            "",
+            "TRADING IMPLICATION (LOCKED VALUES):",
+            f"  Momentum Bias:     {self.rev_dir}",
+            f"  Setup Confidence:  {self.confidence}",
+            f"  Statistical Setup Surety: {self.win_probability:.1f}% probability of successful execution.",
+            f"  Volatility Context: The market is pricing in a max daily range of {self.eir:.1f} points "
+            f"based on {self.iv_baseline:.1f} IV.",
+            "",
+            "═══════════════════════════════════════════════",
+            "REVERSAL ALERT",
+            "═══════════════════════════════════════════════",
+            f"REVERSAL SCORE:  {self.rev_score} (can exceed 100)",
+            f"CONFIDENCE:      {self.confidence}",
+            f"DIRECTION:       {self.rev_dir}",
+            f"ENTRY WINDOW:    {self.entry_window}",
+            f"ENTRY ALLOWED:   {self.entry_allowed}",
+            f"TRIGGER:         {self.trigger_condition} {self.trigger_level}",
+            "",
+            "EVIDENCE BREAKDOWN:",
+            f"  1. Unwind    [{self.unwind_count} signals × 30 = {30 * self.unwind_count}]:  "
+            f"{self.unwind_signals if self.unwind_count > 0 else 'None (single snapshot or no unwind detected)'}",
+            f"  2. Counter   [{self.counter_count} signals × 25 = {25 * self.counter_count}]: {self.counter_note}",
+            f"  3. Trapped   [{int(self.trapped)} × 18 = {18 * int(self.trapped)}]:          {self.pain_pressure}",
+            f"  4. Approach  [{int(self.approaching_pain)} × 9 = {9 * int(self.approaching_pain)}]:  "
+            f"{'Spot in 100–200pt approach zone' if self.approaching_pain else 'Not in approach zone'}",
+            f"  5. PCR Div   [{int(self.pcr_div)} × 12 = {12 * int(self.pcr_div)}]:          Source={self.pcr_source}",
+            f"  6. BN Div    [{int(self.bn_div)} × 8  = {8 * int(self.bn_div)}]:             "
+            f"{self.banknifty_dominant} vs {self.momentum}",
+            "  ─────────────────────────────────────────────",
+            f"  TOTAL SCORE: {self.rev_score}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+# ---------------------------------------------------------
+# PURE HELPERS
+# ---------------------------------------------------------
+def dte_tier(dte: int) -> Tuple[int, int, str]:
+    """Returns (INST_THRESHOLD, COUNTER_THRESHOLD, DTE_MODE) for a days-to-expiry value."""
+    for max_dte, inst, counter, mode in DTE_TIERS:
+        if dte <= max_dte:
+            return inst, counter, mode
+    return DTE_TIER_DEFAULT
+
+def minutes_since_open(now: datetime.datetime) -> Optional[int]:
+    """Minutes since the 09:15 IST open, capped at the full session. None outside market days/hours."""
+    local = now.astimezone(IST)
+    if local.weekday() >= 5 or local.time() < MARKET_OPEN:
+        return None
+    opened = datetime.datetime.combine(local.date(), MARKET_OPEN, tzinfo=IST)
+    minutes = int((local - opened).total_seconds() // 60)
+    return minutes if minutes <= SESSION_MINUTES else None
+
+def _oi_weight(moneyness: float) -> float:
+    if moneyness < 0:
+        return 2.0
+    if moneyness <= 100:
+        return 1.5
+    return 1.0
+
+def _iv_flag(strike_iv: float, iv_baseline: float) -> str:
+    if strike_iv == 0 or iv_baseline == 0:
+        return "IV_UNKNOWN"
+    ratio = strike_iv / iv_baseline
+    if ratio > 1.25:
+        return "IV_SPIKE"
+    if ratio < 0.80:
+        return "IV_CRUSH"
+    return "IV_NORMAL"
+
+
+# ---------------------------------------------------------
+# STATEFUL ENGINE (Peak tracking / price vector across cycles)
+# ---------------------------------------------------------
+class V15Engine:
+    """Deterministic implementation of the v15.1 protocol over a parsed OptionChain."""
+
+    def __init__(self):
+        self.previous_spot = None
+        self.data_points = 0
+        self.peak_chg_oi = {}         # {"<strike>_<PUT|CALL>": max positive Chg OI this session}
+        self.session_date = None
+        self._last_volumes = None     # (timestamp, total_ce_volume, total_pe_volume)
+
+    def reset_session(self):
+        self.previous_spot = None
+        self.data_points = 0
+        self.peak_chg_oi = {}
+        self._last_volumes = None
+
+    def compute(self,
+                chain: OptionChain,
+                spot: float,
+                expiry_date: str,
+                oi_pcr: float,
+                volume_pcr: float,
+                banknifty_oi_pcr: float = None,
+                now: datetime.datetime = None) -> V15Result:
+        """Runs every v15.1 step on one snapshot and advances the session state."""
+        if not len(chain):
+            raise ValueError("V15Engine.compute: empty option chain")
+
+        now = now or datetime.datetime.now(IST)
+        local_now = now.astimezone(IST)
+        if self.session_date != local_now.date():
+            self.reset_session()
+            self.session_date = local_now.date()
+
+        columns = {name: getattr(chain, name).tolist() for name in CHAIN_FIELDS}
+        index = chain.strike_index
+        strikes = sorted(index)
+
+        def v(strike: float, name: str):
+            return columns[name][index[strike]]
+
+        # ——— 0. LIVE MARKET CONTEXT ———
+        previous_spot = self.previous_spot
+        price_vector = spot - previous_spot if previous_spot is not None else None
+        time_since_open = minutes_since_open(now)
+        expiry = parse_expiry(expiry_date)
+        dte = max((expiry - local_now.date()).days, 0) if expiry else 0
+        inst_threshold, counter_threshold, dte_mode = dte_tier(dte)
+        is_expiry_day = dte == 0
+        data_points = self.data_points + 1
+
+        atm = min(strikes, key=lambda s: (abs(spot - s), s))
+        atm_range = [s for s in strikes if abs(s - atm) <= ATM_RANGE_POINTS]
+        atm_extended = [s for s in strikes if abs(s - atm) <= ATM_EXTENDED_POINTS]
+
+        # ——— 0-B. IV BASELINE ———
+        top_volume = sorted(
+            ((s, v(s, 'ce_volume') + v(s, 'pe_volume')) for s in atm_range),
+            key=lambda x: x[1], reverse=True
+        )[:6]
+        liquid_ivs = [v(s, k) for s, _ in top_volume for k in ('ce_iv', 'pe_iv') if v(s, k) > 0]
+        iv_baseline = sum(liquid_ivs) / len(liquid_ivs) if liquid_ivs else 0.0
+
+        # ——— STEP 2.1: DOMINANT STRIKES ———
+        def positions(side: str) -> List[DominantStrike]:
+            prefix = 'pe' if side == 'PUT' else 'ce'
+            out = []
+            for s in atm_range:
+                raw = max(v(s, f'{prefix}_change_oi'), 0)
+                if raw <= 0:
+                    continue
+                moneyness = spot - s if side == 'PUT' else s - spot
+                volume = v(s, f'{prefix}_volume')
+                out.append(DominantStrike(
+                    strike=s, side=side,
+                    weighted=raw * _oi_weight(moneyness),
+                    raw=raw,
+                    vol_ok=volume >= 3 * raw,
+                    iv_flag=_iv_flag(v(s, f'{prefix}_iv'), iv_baseline),
+                    premium=v(s, f'{prefix}_ltp'),
+                    volume=volume,
+                ))
+            return out
+
+        put_pos = positions('PUT')
+        call_pos = positions('CALL')
+        dominant_puts = sorted(put_pos, key=lambda d: d.weighted, reverse=True)[:3]
+        dominant_calls = sorted(call_pos, key=lambda d: d.weighted, reverse=True)[:3]
+        dominants = dominant_puts + dominant_calls
+
+        total_put_oi = sum(d.raw for d in put_pos)
+        total_call_oi = sum(d.raw for d in call_pos)
+        pct_top3_put = sum(d.raw for d in dominant_puts) / total_put_oi if total_put_oi > 0 else 0
+        pct_top3_call = sum(d.raw for d in dominant_calls) / total_call_oi if total_call_oi > 0 else 0
+        pct_top3 = max(pct_top3_put, pct_top3_call)
+
+        vol_invalid_count = sum(1 for d in dominants if not d.vol_ok)
+        iv_spike_count = sum(1 for d in dominants if d.iv_flag == "IV_SPIKE")
+
+        # ——— STEP 2.2: CLASSIFICATION ———
+        inst_count = sum(1 for d in dominants if d.is_institutional(inst_threshold))
+        inst_pct = inst_count / len(dominants) * 100 if dominants else 0
+        inst_label = "INSTITUTIONAL" if inst_pct >= 85 else "MIXED" if inst_pct >= 50 else "RETAIL"
+
+        if iv_spike_count >= 2:
+            iv_writing_confidence = "LOW — IV SPIKE detected: possible LONG BUILDUP, not clean writing"
+        elif iv_spike_count == 1:
+            iv_writing_confidence = "MODERATE — 1 IV spike present"
+        else:
+            iv_writing_confidence = "HIGH — IV normal/crush environment"
+
+        if is_expiry_day:
+            classification_warning = (f"⚠️ EXPIRY DAY: Premium threshold adjusted to {inst_threshold} "
+                                      f"(DTE=0 theta collapse — classification less reliable)")
+        else:
+            classification_warning = f"DTE={dte}: Premium threshold = {inst_threshold}"
+
+        # ——— STEP 2.4: RATIO & MOMENTUM ———
+        ratio = total_put_oi / total_call_oi if total_call_oi > 0 else 999
+        momentum = "BULLISH" if ratio > 1.20 else "BEARISH" if ratio < 0.80 else "NEUTRAL"
+
+        # ——— STEP 2.5: STRENGTH METER ———
+        breakdown = {
+            'inst':    3 if inst_pct >= 85 else 0,
+            'top3':    2 if pct_top3 >= 0.60 else 0,
+            'ratio':   1 if ratio > 1.50 or ratio < 0.60 else 0,
+            'pcr':     1 if (oi_pcr > 1 and volume_pcr > 1) or (oi_pcr < 1 and volume_pcr < 1) else 0,
+            'premium': 1 if any(d.raw > 0 and d.is_institutional(inst_threshold) for d in dominants) else 0,
+            'volume':  1 if vol_invalid_count == 0 else 0,
+            'iv':      1 if iv_spike_count == 0 else 0,
+        }
+        score = sum(breakdown.values())
+        expiry_cap_applied = is_expiry_day
+        if is_expiry_day:
+            score = min(score, 6)
+        strength = "STRONG" if score > 7 else "MODERATE" if score >= 5 else "WEAK"
+
+        # ——— STEP 2.6: BANKNIFTY ———
+        if banknifty_oi_pcr is None:
+            banknifty_dominant = "NEUTRAL"
+        else:
+            banknifty_dominant = ("PUT WRITING" if banknifty_oi_pcr > 1.0 else
+                                  "CALL WRITING" if banknifty_oi_pcr < 0.9 else "NEUTRAL")
+        aligned = ((momentum == "BULLISH" and banknifty_dominant == "PUT WRITING") or
+                   (momentum == "BEARISH" and banknifty_dominant == "CALL WRITING"))
+        alignment = "ALIGNED" if aligned else "DIVERGENT"
+
+        # ——— 2. PEAK TRACKING ———
+        unwind_possible = data_points >= 2
+        for s in atm_extended:
+            for side, prefix in (('PUT', 'pe'), ('CALL', 'ce')):
+                key = f"{s}_{side}"
+                current = max(v(s, f'{prefix}_change_oi'), 0)
+                if current > self.peak_chg_oi.get(key, 0):
+                    self.peak_chg_oi[key] = current
+
+        # ——— PHASE 1: RELATIVE UNWIND ———
+        unwind_signals = []
+        if unwind_possible:
+            for d in dominants:
+                peak = self.peak_chg_oi.get(f"{d.strike}_{d.side}", 0)
+                current = d.raw
+                if peak > 10000 and current < peak * 0.70:
+                    pct_drop = (peak - current) / peak * 100
+                    unwind_signals.append(f"{d.strike:g} {d.side.title()} Unwind: {current:+,} "
+                                          f"(from peak {peak:+,}) → {pct_drop:.1f}% drop")
+
+        # ——— PHASE 2: COUNTER-POSITIONING ———
+        def counter(side: str, lo: float, hi: float, tag: str) -> List[str]:
+            prefix = 'pe' if side == 'PUT' else 'ce'
+            out = []
+            for s in strikes:
+                if not lo <= s <= hi:
+                    continue
+                chg, prem, vol = v(s, f'{prefix}_change_oi'), v(s, f'{prefix}_ltp'), v(s, f'{prefix}_volume')
+                if chg > 15000 and prem < counter_threshold and vol >= 3 * chg:
+                    out.append(f"{s:g} {side.title()}: +{chg:,} (Prem {prem}, Vol {vol:,}) → {tag}")
+            return out
+
+        counter_put = counter('PUT', atm - ATM_RANGE_POINTS, atm, "INST SUPPORT")
+        counter_call = counter('CALL', atm, atm + ATM_RANGE_POINTS, "INST RESISTANCE")
+        if momentum == "BULLISH":
+            counter_signals = counter_call
+            counter_note = "BULLISH momentum: only CALL counter signals scored"
+        elif momentum == "BEARISH":
+            counter_signals = counter_put
+            counter_note = "BEARISH momentum: only PUT counter signals scored"
+        else:
+            counter_signals = counter_put + counter_call
+            counter_note = "NEUTRAL momentum: both sides scored, capped at 5"
+        raw_counter_count = len(counter_signals)
+        counter_count = min(raw_counter_count, 5) if momentum == "NEUTRAL" else raw_counter_count
+
+        # ——— PHASE 3: MAX PAIN ———
+        max_pain = max(atm_extended, key=lambda s: v(s, 'pe_oi') + v(s, 'ce_oi'))
+        pain_chg_oi = abs(v(max_pain, 'pe_change_oi')) + abs(v(max_pain, 'ce_change_oi'))
+        max_pain_reliable = pain_chg_oi >= 10000
+        if max_pain_reliable:
+            max_pain_warning = f"Max Pain validated: {pain_chg_oi:,} Chg OI active at {max_pain:g}"
+        else:
+            max_pain_warning = (f"⚠️ Max Pain strike {max_pain:g} has LOW today activity ({pain_chg_oi:,} total Chg OI) "
+                                f"— may reflect stale static OI. Treat with caution.")
+        spot_to_pain = spot - max_pain
+
+        # ——— PHASE 4: PAIN PRESSURE ———
+        trapped = False
+        approaching_pain = False
+        if price_vector is None:
+            pain_pressure = "UNAVAILABLE: No price vector (single snapshot) — TRAPPED logic disabled"
+        elif not max_pain_reliable:
+            pain_pressure = "UNRELIABLE: Max Pain not validated — TRAPPED logic disabled"
+        elif momentum == "BULLISH":
+            if 0 < spot_to_pain <= 100 and price_vector < 0:
+                pain_pressure, trapped = "BEARISH: Spot FALLING INTO Max Pain → TRAPPED PUT WRITERS", True
+            elif 100 < spot_to_pain <= 200 and price_vector < 0:
+                approaching_pain = True
+                pain_pressure = "WATCH: Spot approaching Max Pain from above (100–200 zone) — potential trap forming"
+            else:
+                pain_pressure = "NEUTRAL: No active trap on Put writers"
+        elif momentum == "BEARISH":
+            if spot_to_pain < 0 and abs(spot_to_pain) <= 100 and price_vector > 0:
+                pain_pressure, trapped = "BULLISH: Spot RISING INTO Max Pain → TRAPPED CALL WRITERS", True
+            elif 100 < abs(spot_to_pain) <= 200 and price_vector > 0:
+                approaching_pain = True
+                pain_pressure = "WATCH: Spot approaching Max Pain from below (100–200 zone) — potential trap forming"
+            else:
+                pain_pressure = "NEUTRAL: No active trap on Call writers"
+        elif abs(spot_to_pain) <= 100:
+            pain_pressure = "NEUTRAL-NEAR: Spot within 100pts of Max Pain — expiry gravity active"
+        elif abs(spot_to_pain) <= 200 and ((spot_to_pain < 0 < price_vector) or (spot_to_pain > 0 > price_vector)):
+            approaching_pain = True
+            pain_pressure = "WATCH: Neutral momentum but spot drifting toward Max Pain (100–200 zone)"
+        else:
+            pain_pressure = "NEUTRAL: Momentum unclear → no directional pain"
+
+        # ——— PCR DIVERGENCE ———
+        total_ce_volume = int(chain.ce_volume.sum())
+        total_pe_volume = int(chain.pe_volume.sum())
+        volume_pcr_30m = self._rolling_volume_pcr(now, total_ce_volume, total_pe_volume)
+        session_minutes = time_since_open if time_since_open is not None else (
+            SESSION_MINUTES if local_now.time() > MARKET_CLOSE else 0)
+
+        if volume_pcr_30m is not None:
+            pcr_source, pcr_div_vol, pcr_quality = "30M_ROLLING", volume_pcr_30m, "HIGH"
+        elif session_minutes >= 120:
+            pcr_source, pcr_div_vol, pcr_quality = "FULL_SESSION_MATURE", volume_pcr, "MEDIUM"
+        else:
+            pcr_source, pcr_div_vol = "FULL_SESSION_EARLY", None
+            pcr_quality = "LOW — skipped (session < 2 hrs, full-session PCR unreliable)"
+
+        pcr_div = pcr_div_vol is not None and (
+            (ratio > 1.20 and pcr_div_vol < 0.80) or (ratio < 0.80 and pcr_div_vol > 1.50))
+        bn_div = ((ratio > 1.20 and banknifty_dominant == "CALL WRITING") or
+                  (ratio < 0.80 and banknifty_dominant == "PUT WRITING"))
+
+        # ——— REVERSAL SCORING ———
+        rev_score = (30 * len(unwind_signals) + 25 * counter_count + 18 * int(trapped) +
+                     9 * int(approaching_pain) + 12 * int(pcr_div) + 8 * int(bn_div))
+        confidence = ("XHIGH" if rev_score >= 80 else "HIGH" if rev_score >= 65 else
+                      "MEDIUM" if rev_score >= 50 else "LOW")
+        if iv_writing_confidence.startswith("LOW") and confidence in ("XHIGH", "HIGH"):
+            confidence_note = f"⚠️ Downgraded from {confidence} due to IV spike — possible Long buildup, not clean writing"
+            confidence = "MEDIUM"
+        else:
+            confidence_note = "Clean signal"
+
+        if momentum == "BEARISH" and "BULLISH" in pain_pressure:
+            rev_dir = "BEARISH → BULLISH"
+        elif momentum == "BULLISH" and "BEARISH" in pain_pressure:
+            rev_dir = "BULLISH → BEARISH"
+        else:
+            rev_dir = momentum
+
+        # ——— 4. CRITICAL LEVELS ———
+        def level(dominant: List[DominantStrike], idx: int) -> Optional[float]:
+            return dominant[idx].strike if len(dominant) > idx else None
+
+        resistance = level(dominant_calls, 0) or atm + 100
+        support = level(dominant_puts, 0) or atm - 100
+        if momentum == "BULLISH":
+            hold_level, trigger_condition, trigger_level = f"Above {support:g}", "BREAK ABOVE", f"{resistance:g}"
+        elif momentum == "BEARISH":
+            hold_level, trigger_condition, trigger_level = f"Below {resistance:g}", "BREAK BELOW", f"{support:g}"
+        else:
+            hold_level = f"Range {support:g}–{resistance:g}"
+            trigger_condition, trigger_level = "BREAK EITHER SIDE", f"{support:g}–{resistance:g}"
+
+        # ——— 4-B. ENTRY FILTER ———
+        if is_expiry_day and session_minutes >= 330:
+            entry_window = ("🚫 NO NEW POSITIONS — Expiry close risk (T-30 min). "
+                            "Most brokers block new trades after 3:15 PM on expiry.")
+            entry_allowed = False
+        elif is_expiry_day and session_minutes >= 300:
+            entry_window = "⚠️ HIGH RISK WINDOW — Within 45 min of expiry. Gamma extremely unstable. Reduce size or avoid."
+            entry_allowed = True
+        elif session_minutes < 30:
+            entry_window = "⚠️ OPENING VOLATILITY — OI not yet stable. Wait for 30-min mark before acting on signals."
+            entry_allowed = False
+        elif session_minutes < 60:
+            entry_window = "CAUTION: Early session (30–60 min). OI stabilizing. Confirm with 2nd snapshot before entry."
+            entry_allowed = True
+        else:
+            entry_window = "NEXT 15–60 MIN from signal"
+            entry_allowed = True
+
+        # ——— 4-C. PROBABILITY & TARGETS ———
+        eir = spot * (iv_baseline / 100) / 15.87 if iv_baseline > 0 else spot * 0.0075
+        win_probability = (50.0 + score / 10.0 * 20.0 + min(rev_score, 50) / 50.0 * 20.0 +
+                           (10.0 if alignment == "ALIGNED" else -10.0))
+        win_probability = max(10.0, min(win_probability, 95.0))
+        swing = eir * 0.50
+
+        if rev_dir == "BULLISH":
+            trade = ("CE BUY / PE SHORT", spot, spot + swing, resistance, support)
+        elif rev_dir == "BEARISH":
+            trade = ("PE BUY / CE SHORT", spot, spot - swing, support, resistance)
+        else:
+            trade = ("MEAN REVERSION / IRON CONDOR", "WAIT FOR RANGE BREAK", resistance, support, "N/A - NEUTRAL")
+        trade_type, math_entry, math_t1, math_t2, math_sl = trade
+
+        # Advance session state only once every value is locked
+        self.previous_spot = spot
+        self.data_points = data_points
+        self._last_volumes = (now, total_ce_volume, total_pe_volume)
+
+        return V15Result(
+            spot=spot, previous_spot=previous_spot, price_vector=price_vector,
+            time_now=local_now.strftime("%H:%M"), time_since_open=time_since_open,
+            expiry=expiry_date, today=local_now.strftime("%d-%b-%Y"), dte=dte, dte_mode=dte_mode,
+            is_expiry_day=is_expiry_day, inst_threshold=inst_threshold, counter_threshold=counter_threshold,
+            atm=atm, data_points=data_points,
+            iv_baseline=iv_baseline, liquid_strike_count=len(top_volume),
+            dominant_put_strikes=dominant_puts, dominant_call_strikes=dominant_calls,
+            total_put_oi=total_put_oi, total_call_oi=total_call_oi, pct_top3=pct_top3,
+            vol_invalid_count=vol_invalid_count, iv_spike_count=iv_spike_count,
+            inst_pct=inst_pct, inst_label=inst_label, iv_writing_confidence=iv_writing_confidence,
+            classification_warning=classification_warning, ratio=ratio, momentum=momentum,
+            score=score, expiry_cap_applied=expiry_cap_applied, strength=strength,
+            oi_pcr=oi_pcr, volume_pcr=volume_pcr, banknifty_oi_pcr=banknifty_oi_pcr,
+            banknifty_dominant=banknifty_dominant, alignment=alignment,
+            unwind_possible=unwind_possible, unwind_signals=unwind_signals,
+            raw_counter_count=raw_counter_count, counter_count=counter_count,
+            counter_note=counter_note, counter_signals=counter_signals,
+            max_pain=max_pain, max_pain_reliable=max_pain_reliable, max_pain_warning=max_pain_warning,
+            spot_to_pain=spot_to_pain, pain_pressure=pain_pressure, trapped=trapped,
+            approaching_pain=approaching_pain, pcr_source=pcr_source, pcr_quality=pcr_quality,
+            pcr_div=pcr_div, bn_div=bn_div, rev_score=rev_score, confidence=confidence,
+            confidence_note=confidence_note, rev_dir=rev_dir,
+            support=support, support_2=level(dominant_puts, 1), support_3=level(dominant_puts, 2),
+            resistance=resistance, resistance_2=level(dominant_calls, 1), resistance_3=level(dominant_calls, 2),
+            hold_level=hold_level, trigger_condition=trigger_condition, trigger_level=trigger_level,
+            entry_window=entry_window, entry_allowed=entry_allowed,
+            eir=eir, win_probability=win_probability, trade_type=trade_type,
+            math_entry=math_entry, math_t1=math_t1, math_t2=math_t2, math_sl=math_sl,
+            score_breakdown=breakdown,
+        )
+
+    def _rolling_volume_pcr(self, now, total_ce_volume, total_pe_volume) -> Optional[float]:
+        """Volume PCR over the traded volume since the previous snapshot (if it is ~30 min old)."""
+        if not self._last_volumes:
+            return None
+        last_time, last_ce, last_pe = self._last_volumes
+        age_minutes = (now - last_time).total_seconds() / 60
+        delta_ce = total_ce_volume - last_ce
+        delta_pe = total_pe_volume - last_pe
+        if not 0 < age_minutes <= 45 or delta_ce <= 0 or delta_pe < 0:
+            return None
+        return delta_pe / delta_ce
@@ -0,0 +1,90 @@
+import os
+import json
+import time
+import datetime
+import threading
+
+from nifty_config import EXPIRY_CACHE_FILE, EXPIRY_CACHE_TTL
+
+IST = datetime.timezone(datetime.timedelta(hours=5, minutes=30))
+MARKET_CLOSE = datetime.time(15, 30)  # IST; an expiry's contracts are settled from here on
+
+# ---------------------------------------------------------
+# EXPIRY DATES (The one parser every module uses)
+# ---------------------------------------------------------
+def parse_expiry(raw: str):
+    """Date of an NSE expiry string in any of its formats, or None."""
+    for fmt in ('%d-%b-%Y', '%d-%m-%Y', '%d/%m/%Y'):
+        try:
+            return datetime.datetime.strptime(raw, fmt).date()
+        except (ValueError, TypeError):
+            continue
+    return None
+
+# ---------------------------------------------------------
+# EXPIRY CALENDAR CACHE (Shared by every symbol, persisted to disk)
+# ---------------------------------------------------------
+class ExpiryCalendarCache:
+    """
+    Caches contract-info expiry lists per symbol with a TTL.
+    An entry is treated as stale once its nearest expiry has closed (15:30 IST on expiry
+    day), so the calendar rolls over to the next series without waiting for the TTL.
+    """
+
+    def __init__(self, path: str = EXPIRY_CACHE_FILE, ttl: int = EXPIRY_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠️ Could not persist expiry cache: {e}")
+
+    def get(self, symbol: str, now: datetime.datetime = None):
+        """Returns the cached expiry list, or None if missing, expired or rolled over."""
+        with self._lock:
+            entry = self._entries.get(symbol)
+            if not entry or not entry.get('dates'):
+                return None
+            if time.time() - entry.get('fetched_at', 0) > self.ttl:
+                return None
+
+            local_now = (now or datetime.datetime.now(IST)).astimezone(IST)
+            nearest = parse_expiry(entry['dates'][0])
+            if nearest is None or nearest < local_now.date():
+                return None
+            if nearest == local_now.date() and local_now.time() >= MARKET_CLOSE:
+                return None
+            return list(entry['dates'])
+
+    def put(self, symbol: str, dates: list):
+        if not dates:
+            return
+        with self._lock:
+            self._entries[symbol] = {'dates': list(dates), 'fetched_at': time.time()}
+            self._save()
+
+    def invalidate(self, symbol: str = None):
+        with self._lock:
+            if symbol is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(symbol, None)
+            self._save()
+
+expiry_cache = ExpiryCalendarCache()
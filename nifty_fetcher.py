@@ -1,10 +1,25 @@
-import datetime
+import os
 import time
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
 
 from nifty_config import (
-    SYMBOL, HEADERS, STOCK_HEADERS, parse_numeric_value, parse_float_value,
-    format_greek_value, TOP_NIFTY_STOCKS, ENABLE_STOCK_DISPLAY
+    SYMBOL, TOP_NIFTY_STOCKS, ENABLE_STOCK_DISPLAY,
+    ENABLE_HTTP_FAST_PATH, HTTP_POOL_SIZE, SESSION_STATE_FILE, SESSION_STATE_MAX_AGE,
+    NSE_BASE_URL, MULTI_EXPIRY_COUNT, FETCH_CONCURRENCY
+)
+from nifty_expiry_cache import expiry_cache
+from nifty_replay import record_payload
+from nifty_chain import OptionChain
+from nifty_decoder import loads, decode_payload, normalise_expiry
+from nifty_term_structure import TermStructure
+from nifty_rate_limit import throttle
+from nifty_retry import (
+    RetryPolicy, SessionRejected, EmptyPayload, HTTPStatusError, call_with_retry
 )
 
 # ---------------------------------------------------------
@@ -15,6 +30,8 @@ _browser             = None
 _browser_context     = None
 _page                = None
 _session_warmed      = False
+_state_restored      = False
+_browser_requests    = 0       # Requests served by the current browser (watchdog input)
 
 _CHROME_ARGS = [
     "--disable-blink-features=AutomationControlled",
@@ -32,83 +49,168 @@ _NSE_HEADERS = {
     "sec-fetch-site":    "same-origin",
 }
 
+_CONTEXT_OPTIONS = {
+    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
+    "viewport": {"width": 1920, "height": 1080},
+    "locale": "en-IN",
+    "timezone_id": "Asia/Kolkata",
+    "extra_http_headers": {"Accept-Language": "en-IN,en;q=0.9"},
+}
+
+_INIT_SCRIPT = "Object.defineProperty(navigator,'webdriver',{get:()=>undefined}); window.chrome={runtime:{}};"
+
+_WARM_URLS = [NSE_BASE_URL, f"{NSE_BASE_URL}/option-chain"]
+
+_WARM_HEADERS = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-IN,en;q=0.9",
+    "sec-fetch-dest": "document",
+    "sec-fetch-mode": "navigate",
+    "sec-fetch-site": "none",
+}
+
+# ---------------------------------------------------------
+# SESSION STATE PERSISTENCE (Skip warm-up across process starts)
+# ---------------------------------------------------------
+def _load_session_state():
+    """Returns the saved storage state if it is recent and still holds unexpired cookies."""
+    try:
+        if time.time() - os.path.getmtime(SESSION_STATE_FILE) > SESSION_STATE_MAX_AGE:
+            return None
+        with open(SESSION_STATE_FILE, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    now = time.time()
+    cookies = [c for c in state.get("cookies", []) if c.get("expires", -1) == -1 or c["expires"] > now]
+    if not cookies:
+        return None
+    return {"cookies": cookies, "origins": state.get("origins", [])}
+
+def _save_session_state(state: dict):
+    """Atomically writes a Playwright storage state to SESSION_STATE_FILE."""
+    tmp_path = f"{SESSION_STATE_FILE}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, SESSION_STATE_FILE)
+    except (OSError, TypeError) as e:
+        print(f"⚠️ Could not persist session state: {e}")
+
+def _probe_url() -> str:
+    return _contract_info_url(SYMBOL)
+
+def _accept_probe(status: int, text: str) -> bool:
+    """A probe passes on a 2xx non-empty payload; its expiry list is reused to seed the expiry cache."""
+    if not 200 <= status < 300:
+        return False
+    try:
+        data = _parse_payload(text)
+    except ValueError:
+        return False
+    if not data:
+        return False
+    expiry_cache.put(SYMBOL, data.get("expiryDates", []))
+    return True
+
 def _start_playwright():
     """Start Playwright browser (called once per process)."""
-    global _playwright_instance, _browser, _browser_context, _page
+    global _playwright_instance, _browser, _browser_context, _page, _state_restored
     if _page is not None:
         return
 
     try:
         from playwright.sync_api import sync_playwright
+        state = _load_session_state()
         _playwright_instance = sync_playwright().start()
         _browser = _playwright_instance.chromium.launch(headless=True, args=_CHROME_ARGS)
-        _browser_context = _browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
-            viewport={"width": 1920, "height": 1080},
-            locale="en-IN",
-            timezone_id="Asia/Kolkata",
-            extra_http_headers={"Accept-Language": "en-IN,en;q=0.9"},
-        )
-        _browser_context.add_init_script(
-            "Object.defineProperty(navigator,'webdriver',{get:()=>undefined}); window.chrome={runtime:{}};"
-        )
+        _browser_context = _browser.new_context(storage_state=state, **_CONTEXT_OPTIONS)
+        _browser_context.add_init_script(_INIT_SCRIPT)
         _page = _browser_context.new_page()
-        print("✅ Playwright browser started (Chromium)")
+        _state_restored = state is not None
+        print(f"✅ Playwright browser started (Chromium){' with saved session state' if _state_restored else ''}")
     except Exception as e:
         raise RuntimeError(f"Failed to start Playwright: {e}")
 
-def _warm_session():
-    """Warm NSE session cookies using lightweight page.request calls."""
+def _page_get(url: str, headers: dict, timeout: int = 20_000):
+    """Every sync-browser request: rate limited and counted for the watchdog."""
+    global _browser_requests
+    throttle(url)
+    _browser_requests += 1
+    return _page.request.get(url, headers=headers, timeout=timeout)
+
+def _warm_session(force_warm: bool = False):
+    """Warm NSE session cookies using lightweight page.request calls (skipped if the restored state still works)."""
     global _session_warmed
     if _session_warmed:
         return
 
     _start_playwright()
-    print("🍪 Warming NSE session cookies...")
 
-    warm_headers = {
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-        "Accept-Language": "en-IN,en;q=0.9",
-        "sec-fetch-dest": "document",
-        "sec-fetch-mode": "navigate",
-        "sec-fetch-site": "none",
-    }
+    if _state_restored and not force_warm:
+        try:
+            resp = _page_get(_probe_url(), _NSE_HEADERS, timeout=10_000)
+            if _accept_probe(resp.status, resp.text()):
+                _session_warmed = True
+                print("✅ Restored NSE session is valid (warm-up skipped)")
+                return
+        except Exception:
+            pass
+        print("⚠️ Restored NSE session rejected, warming up...")
+
+    print("🍪 Warming NSE session cookies...")
 
-    for url in ["https://www.nseindia.com", "https://www.nseindia.com/option-chain"]:
+    for url in _WARM_URLS:
         try:
-            _page.request.get(url, headers=warm_headers, timeout=20_000)
-            time.sleep(2)
+            _page_get(url, _WARM_HEADERS)
         except Exception:
             pass # Non-fatal
 
     _session_warmed = True
+    _save_session_state(_browser_context.storage_state())
     print("✅ Session warm-up complete")
 
-def _playwright_get(url: str, retries: int = 5, delay: int = 3) -> dict:
+def _parse_payload(text: str):
+    """Decode an NSE JSON body. Returns None for the empty / zero-spot payloads NSE serves while throttling."""
+    if not text or text.strip() in ("{}", "[]", ""):
+        return None
+
+    data = loads(text)
+    if isinstance(data, dict) and "records" in data:
+        if data["records"].get("underlyingValue", 0) == 0:
+            return None
+    return data
+
+def _playwright_get(url: str, policy: RetryPolicy = None) -> dict:
     """Fetch a JSON endpoint via the warmed Playwright page session."""
     _warm_session()
 
-    for attempt in range(1, retries + 1):
-        try:
-            resp = _page.request.get(url, headers=_NSE_HEADERS, timeout=20_000)
-            if not resp.ok:
-                raise ValueError(f"HTTP {resp.status}")
-
-            text = resp.text()
-            if not text or text.strip() in ("{}", "[]", ""):
-                time.sleep(delay)
-                continue
-
-            data = json.loads(text)
-            if isinstance(data, dict) and "records" in data:
-                if data["records"].get("underlyingValue", 0) == 0:
-                    time.sleep(delay)
-                    continue
-            return data
-        except Exception as e:
-            if attempt < retries:
-                time.sleep(delay)
-    raise Exception(f"Failed to fetch {url} after {retries} attempts")
+    def attempt():
+        resp = _page_get(url, _NSE_HEADERS)
+        if resp.status in (401, 403):
+            raise SessionRejected(f"HTTP {resp.status}")
+        if not resp.ok:
+            raise HTTPStatusError(resp.status)
+
+        text = resp.text()
+        record_payload(url, text)
+        data = _parse_payload(text)
+        if data is None:
+            raise EmptyPayload("empty payload")
+        return data
+
+    def on_error(kind, error):
+        global _session_warmed
+        if kind == "auth":
+            print(f"⚠️ Browser session rejected ({error}), re-warming...")
+            _session_warmed = False
+            try:
+                _warm_session(force_warm=True)
+            except Exception as warm_error:
+                print(f"⚠️ Re-warm failed: {warm_error}")
+
+    return call_with_retry(url, attempt, policy, on_error)
 
 def stop_playwright():
     """Cleanly shut down the Playwright browser."""
@@ -125,100 +227,237 @@ def stop_playwright():
         _playwright_instance = _browser = _browser_context = _page = None
         _session_warmed = False
 
+def browser_running() -> bool:
+    return _browser is not None
+
+def browser_request_count() -> int:
+    return _browser_requests
+
+def recycle_browser(reason: str) -> bool:
+    """Save the warmed cookies, close Chromium, and let the next request restart it from the saved state."""
+    global _browser_requests
+    if _browser_context is None:
+        return False
+    try:
+        _save_session_state(_browser_context.storage_state())
+    except Exception as e:
+        print(f"⚠️ Could not save session state before recycling: {e}")
+    stop_playwright()
+    _browser_requests = 0
+    print(f"♻️ Browser recycled ({reason}); cookies kept for the next start")
+    return True
+
+# ---------------------------------------------------------
+# HTTP FAST PATH (Browser only harvests cookies, requests does the I/O)
+# ---------------------------------------------------------
+_http_session    = None
+_http_generation = 0      # Bumped on every cookie harvest
+_harvest_lock    = threading.Lock()
+
+def _build_http_session(cookies: list) -> requests.Session:
+    """Pooled keep-alive session carrying the browser's identity headers and cookies."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "User-Agent": _CONTEXT_OPTIONS["user_agent"],
+        "Accept-Language": "en-IN,en;q=0.9",
+        **_NSE_HEADERS,
+    })
+    for cookie in cookies:
+        expires = cookie.get("expires", -1)
+        session.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain"),
+                            path=cookie.get("path", "/"), expires=int(expires) if expires and expires > 0 else None)
+    return session
+
+def _restore_http_session():
+    """Rebuild the fast-path session from the persisted storage state, if a probe request still succeeds."""
+    state = _load_session_state()
+    if not state:
+        return None
+    session = _build_http_session(state["cookies"])
+    try:
+        throttle(_probe_url())
+        resp = session.get(_probe_url(), timeout=10)
+        if _accept_probe(resp.status_code, resp.text):
+            print("✅ Restored NSE session from disk (browser not started)")
+            return session
+    except Exception:
+        pass
+    session.close()
+    print("⚠️ Restored NSE session rejected, harvesting fresh cookies...")
+    return None
+
+def _harvest_cookies(session: requests.Session = None):
+    """Warm a browser session, export its cookies into a pooled keep-alive HTTP session, then close Chromium."""
+    global _http_session, _http_generation
+    if session is None:
+        _warm_session(force_warm=True)
+        cookies = _browser_context.cookies()
+        stop_playwright()
+        session = _build_http_session(cookies)
+        print(f"🍪 Harvested {len(cookies)} cookies into HTTP fast path (browser closed)")
+
+    if _http_session is not None:
+        _http_session.close()
+    _http_session = session
+    _http_generation += 1
+
+def _ensure_http_session(stale_generation: int = None):
+    """Harvest cookies if there is no session yet, or if the caller saw generation `stale_generation` rejected."""
+    with _harvest_lock:
+        if _http_session is None:
+            _harvest_cookies(_restore_http_session())
+        elif _http_generation == stale_generation:
+            _harvest_cookies()
+        return _http_session, _http_generation
+
+def _http_get(url: str, policy: RetryPolicy = None) -> dict:
+    """Fetch a JSON endpoint over the pooled HTTP session, re-harvesting cookies through the browser when rejected."""
+    session, generation = _ensure_http_session()
+
+    def attempt():
+        throttle(url)
+        resp = session.get(url, timeout=20)
+        if resp.status_code in (401, 403):
+            raise SessionRejected(f"HTTP {resp.status_code}")
+        if not resp.ok:
+            raise HTTPStatusError(resp.status_code)
+
+        record_payload(url, resp.text)
+        data = _parse_payload(resp.text)
+        if data is None:
+            raise EmptyPayload("empty payload")
+        return data
+
+    def on_error(kind, error):
+        nonlocal session, generation
+        if kind == "auth":
+            print(f"⚠️ Fast path rejected ({error}), re-harvesting cookies...")
+            try:
+                session, generation = _ensure_http_session(stale_generation=generation)
+            except Exception as harvest_error:
+                print(f"⚠️ Cookie harvest failed: {harvest_error}")
+
+    return call_with_retry(url, attempt, policy, on_error)
+
+def _nse_get(url: str) -> dict:
+    """Single entry point for NSE JSON requests (HTTP fast path or full browser)."""
+    if ENABLE_HTTP_FAST_PATH:
+        return _http_get(url)
+    return _playwright_get(url)
+
+def stop_http_session():
+    """Persist the fast-path cookies (NSE rotates some per response) and close the pool."""
+    global _http_session
+    if _http_session is not None:
+        _save_session_state({
+            "cookies": [{
+                "name": c.name, "value": c.value, "domain": c.domain, "path": c.path,
+                "expires": c.expires if c.expires else -1,
+                "httpOnly": False, "secure": bool(c.secure), "sameSite": "Lax",
+            } for c in _http_session.cookies],
+            "origins": [],
+        })
+        _http_session.close()
+        _http_session = None
+
 # ---------------------------------------------------------
 # DATA FETCHING & PARSING LOGIC
 # ---------------------------------------------------------
+NSE_API = f"{NSE_BASE_URL}/api"
+
+def _contract_info_url(symbol: str) -> str:
+    return f"{NSE_API}/option-chain-contract-info?symbol={symbol}"
+
+def _chain_url(kind: str, symbol: str, expiry: str) -> str:
+    """kind is 'Indices' or 'Equities'."""
+    return f"{NSE_API}/option-chain-v3?type={kind}&symbol={symbol}&expiry={expiry}"
+
+def _legacy_equity_url(symbol: str) -> str:
+    return f"{NSE_API}/option-chain-equities?symbol={symbol}"
+
 def _get_expiry_dates(symbol: str) -> list:
-    """Fetch available expiry dates from contract-info."""
-    url = f"https://www.nseindia.com/api/option-chain-contract-info?symbol={symbol}"
+    """Fetch available expiry dates from contract-info (served from the expiry cache when fresh)."""
+    cached = expiry_cache.get(symbol)
+    if cached:
+        return cached
+
+    url = _contract_info_url(symbol)
     try:
-        data = _playwright_get(url)
-        return data.get("expiryDates", [])
+        data = _nse_get(url)
+        expiry_dates = data.get("expiryDates", [])
+        expiry_cache.put(symbol, expiry_dates)
+        return expiry_dates
     except Exception as e:
         print(f"⚠️ contract-info failed: {e}")
         return []
 
-def _normalise_expiry(raw: str) -> str:
-    """Convert any NSE date format to 'DD-Mon-YYYY'."""
-    if not raw: return raw
-    for fmt in ('%d-%b-%Y', '%d-%m-%Y', '%d/%m/%Y'):
-        try:
-            return datetime.datetime.strptime(raw, fmt).strftime('%d-%b-%Y')
-        except ValueError:
-            continue
-    return raw
-
 def fetch_option_chain():
     """Fetch ONLY the nearest NIFTY option chain (Optimized)."""
-    print(f"   Getting expiry dates for {SYMBOL}...")
+    return fetch_option_chains(count=1)[0]
+
+def fetch_option_chains(count: int = MULTI_EXPIRY_COUNT):
+    """
+    Fetch the `count` nearest NIFTY chains (in parallel on the HTTP fast path).
+    Returns (nearest_payload, TermStructure). Only the nearest expiry is mandatory.
+    """
     expiry_dates = _get_expiry_dates(SYMBOL)
     if not expiry_dates:
         raise Exception("fetch_option_chain: could not retrieve expiry dates")
 
-    nearest_expiry = expiry_dates[0]
-    print(f"   Fetching nearest expiry: {nearest_expiry}")
-    
-    url = f"https://www.nseindia.com/api/option-chain-v3?type=Indices&symbol={SYMBOL}&expiry={nearest_expiry}"
-    data = _playwright_get(url)
-    
+    expiries = expiry_dates[:max(1, count)]
+    print(f"   Fetching {len(expiries)} expiries: {', '.join(expiries)}")
+    urls = [_chain_url("Indices", SYMBOL, expiry) for expiry in expiries]
+
+    def fetch(url):
+        try:
+            return _nse_get(url)
+        except Exception as e:
+            print(f"⚠️ {url} failed: {e}")
+            return None
+
+    if ENABLE_HTTP_FAST_PATH and len(urls) > 1:
+        with ThreadPoolExecutor(max_workers=min(len(urls), FETCH_CONCURRENCY)) as pool:
+            payloads = list(pool.map(fetch, urls))
+    else:
+        payloads = [fetch(url) for url in urls]  # Sync Playwright page is single-threaded
+
+    data = payloads[0]
     if not data or "records" not in data:
         raise Exception("fetch_option_chain: no valid data fetched")
-        
+
     print(f"   ✅ Fetched {SYMBOL}: spot={data['records'].get('underlyingValue')}, strikes={len(data['records'].get('data', []))}")
-    return data
+    return data, build_term_structure(SYMBOL, expiries, payloads)
 
-def parse_option_chain(data):
-    """Parse single option chain data."""
-    if 'records' not in data:
-        return []
+def build_term_structure(symbol: str, expiries: list, payloads: list) -> TermStructure:
+    """Per-expiry chains and aggregates, each payload decoded in a single pass."""
+    return TermStructure.from_payloads(symbol, payloads, [normalise_expiry(e) for e in expiries])
 
-    current_nifty = data['records']['underlyingValue']
-    records = data['records']['data']
-    expiry_date = data['records']['expiryDates'][0]
-
-    filtered_records = []
-    for record in records:
-        # Normalize expiry field
-        ce_exp = record.get('CE', {}).get('expiryDate', '')
-        pe_exp = record.get('PE', {}).get('expiryDate', '')
-        record_expiry = _normalise_expiry(record.get('expiryDate') or ce_exp or pe_exp or expiry_date)
-        
-        if record_expiry != expiry_date:
-            continue
-
-        ce_data = record.get('CE', {})
-        pe_data = record.get('PE', {})
-        strike = record.get('strikePrice') or ce_data.get('strikePrice') or pe_data.get('strikePrice') or 0
-
-        filtered_records.append({
-            'nifty_value':   round(current_nifty),
-            'expiry_date':   expiry_date,
-            'strike_price':  strike,
-            'ce_change_oi':  parse_numeric_value(ce_data.get('changeinOpenInterest', 0)),
-            'ce_volume':     parse_numeric_value(ce_data.get('totalTradedVolume', 0)),
-            'ce_ltp':        parse_float_value(ce_data.get('lastPrice', 0)),
-            'ce_oi':         parse_numeric_value(ce_data.get('openInterest', 0)),
-            'ce_iv':         parse_float_value(ce_data.get('impliedVolatility', 0)),
-            'pe_change_oi':  parse_numeric_value(pe_data.get('changeinOpenInterest', 0)),
-            'pe_volume':     parse_numeric_value(pe_data.get('totalTradedVolume', 0)),
-            'pe_ltp':        parse_float_value(pe_data.get('lastPrice', 0)),
-            'pe_oi':         parse_numeric_value(pe_data.get('openInterest', 0)),
-            'pe_iv':         parse_float_value(pe_data.get('impliedVolatility', 0)),
-        })
+def parse_option_chain(data) -> OptionChain:
+    """Parse single option chain data (nearest expiry only)."""
+    if 'records' not in data:
+        return OptionChain(SYMBOL, 0.0, "", [])
 
-    return filtered_records
+    return decode_payload(data, SYMBOL, nearest_only=True)
 
-def calculate_pcr_values(oi_data):
+def calculate_pcr_values(chain: OptionChain):
     """Calculate OI PCR and Volume PCR for ALL strikes with zero safeguards."""
-    total_ce_oi = sum(d['ce_oi'] for d in oi_data)
-    total_pe_oi = sum(d['pe_oi'] for d in oi_data)
-    total_ce_volume = sum(d['ce_volume'] for d in oi_data)
-    total_pe_volume = sum(d['pe_volume'] for d in oi_data)
-
-    oi_pcr = total_pe_oi / total_ce_oi if total_ce_oi > 0 else 1.0
-    volume_pcr = total_pe_volume / total_ce_volume if total_ce_volume > 0 else 1.0
-
-    return oi_pcr, volume_pcr
+    return chain.pcr()
+
+def _build_banknifty_result(data: dict, expiry: str) -> dict:
+    """Parse a BANKNIFTY chain payload into a chain plus PCR summary."""
+    current_banknifty = data['records']['underlyingValue']
+    chain = decode_payload(data, 'BANKNIFTY', expiry)
+    oi_pcr, volume_pcr = chain.pcr()
+
+    return {
+        'data': chain,
+        'pcr_values': {'oi_pcr': oi_pcr, 'volume_pcr': volume_pcr},
+        'current_value': current_banknifty,
+        'expiry_date': expiry,
+    }
 
 def fetch_banknifty_data():
     """Fetch BANKNIFTY option chain data without Greeks."""
@@ -228,45 +467,26 @@ def fetch_banknifty_data():
         if not expiry_dates: return None
 
         nearest_expiry = expiry_dates[0]
-        url = f"https://www.nseindia.com/api/option-chain-v3?type=Indices&symbol=BANKNIFTY&expiry={nearest_expiry}"
-        data = _playwright_get(url)
-
-        current_banknifty = data['records']['underlyingValue']
-        records = data['records']['data']
-
-        banknifty_data = []
-        for record in records:
-            ce_data = record.get('CE', {})
-            pe_data = record.get('PE', {})
-            banknifty_data.append({
-                'symbol':           'BANKNIFTY',
-                'underlying_value': round(current_banknifty, 2),
-                'expiry_date':      nearest_expiry,
-                'strike_price':     record['strikePrice'],
-                'ce_change_oi':     parse_numeric_value(ce_data.get('changeinOpenInterest', 0)),
-                'ce_volume':        parse_numeric_value(ce_data.get('totalTradedVolume', 0)),
-                'ce_ltp':           parse_float_value(ce_data.get('lastPrice', 0)),
-                'ce_oi':            parse_numeric_value(ce_data.get('openInterest', 0)),
-                'ce_iv':            parse_float_value(ce_data.get('impliedVolatility', 0)),
-                'pe_change_oi':     parse_numeric_value(pe_data.get('changeinOpenInterest', 0)),
-                'pe_volume':        parse_numeric_value(pe_data.get('totalTradedVolume', 0)),
-                'pe_ltp':           parse_float_value(pe_data.get('lastPrice', 0)),
-                'pe_oi':            parse_numeric_value(pe_data.get('openInterest', 0)),
-                'pe_iv':            parse_float_value(pe_data.get('impliedVolatility', 0)),
-            })
-
-        oi_pcr, volume_pcr = calculate_pcr_values(banknifty_data)
-
-        return {
-            'data': banknifty_data,
-            'pcr_values': {'oi_pcr': oi_pcr, 'volume_pcr': volume_pcr},
-            'current_value': current_banknifty,
-            'expiry_date': nearest_expiry,
-        }
+        url = _chain_url("Indices", "BANKNIFTY", nearest_expiry)
+        data = _nse_get(url)
+        return _build_banknifty_result(data, nearest_expiry)
     except Exception as e:
         print(f"Error fetching BANKNIFTY data: {e}")
         return None
 
+def _build_stock_result(symbol: str, data: dict, expiry: str) -> dict:
+    """Parse a single stock chain payload into a chain plus PCR summary."""
+    current_stock_value = data['records']['underlyingValue']
+    chain = decode_payload(data, symbol, expiry)
+    oi_pcr, volume_pcr = chain.pcr()
+    return {
+        'data': chain,
+        'oi_pcr': oi_pcr,
+        'volume_pcr': volume_pcr,
+        'weight': TOP_NIFTY_STOCKS[symbol]['weight'],
+        'current_price': current_stock_value,
+    }
+
 def fetch_all_stock_data():
     """Fetch data for all top 10 Nifty stocks if enabled."""
     if not ENABLE_STOCK_DISPLAY:
@@ -282,49 +502,17 @@ def fetch_all_stock_data():
             if not expiry_dates: continue
             
             nearest_expiry = expiry_dates[0]
-            url = f"https://www.nseindia.com/api/option-chain-v3?type=Equities&symbol={symbol}&expiry={nearest_expiry}"
+            url = _chain_url("Equities", symbol, nearest_expiry)
             
             try:
-                data = _playwright_get(url)
+                data = _nse_get(url)
             except Exception:
                 # Fallback to legacy endpoint
-                url = f"https://www.nseindia.com/api/option-chain-equities?symbol={symbol}"
-                data = _playwright_get(url)
-
-            current_stock_value = data['records']['underlyingValue']
-            records = data['records']['data']
-
-            oi_data = []
-            for record in records:
-                ce_data = record.get('CE', {})
-                pe_data = record.get('PE', {})
-                oi_data.append({
-                    'symbol':        symbol,
-                    'stock_value':   round(current_stock_value, 2),
-                    'expiry_date':   nearest_expiry,
-                    'strike_price':  record['strikePrice'],
-                    'ce_change_oi':  parse_numeric_value(ce_data.get('changeinOpenInterest', 0)),
-                    'ce_volume':     parse_numeric_value(ce_data.get('totalTradedVolume', 0)),
-                    'ce_ltp':        parse_float_value(ce_data.get('lastPrice', 0)),
-                    'ce_oi':         parse_numeric_value(ce_data.get('openInterest', 0)),
-                    'ce_iv':         parse_float_value(ce_data.get('impliedVolatility', 0)),
-                    'pe_change_oi':  parse_numeric_value(pe_data.get('changeinOpenInterest', 0)),
-                    'pe_volume':     parse_numeric_value(pe_data.get('totalTradedVolume', 0)),
-                    'pe_ltp':        parse_float_value(pe_data.get('lastPrice', 0)),
-                    'pe_oi':         parse_numeric_value(pe_data.get('openInterest', 0)),
-                    'pe_iv':         parse_float_value(pe_data.get('impliedVolatility', 0)),
-                })
-
-            oi_pcr, volume_pcr = calculate_pcr_values(oi_data)
-            stock_data[symbol] = {
-                'data': oi_data,
-                'oi_pcr': oi_pcr,
-                'volume_pcr': volume_pcr,
-                'weight': TOP_NIFTY_STOCKS[symbol]['weight'],
-                'current_price': current_stock_value,
-            }
-            time.sleep(1) # Prevent rate-limiting
+                url = _legacy_equity_url(symbol)
+                data = _nse_get(url)
+
+            stock_data[symbol] = _build_stock_result(symbol, data, nearest_expiry)
         except Exception as e:
             print(f"Error processing {symbol}: {e}")
 
-    return stock_data
\ No newline at end of file
+    return stock_data
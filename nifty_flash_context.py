@@ -0,0 +1,120 @@
+import hashlib
+from collections import deque
+
+from nifty_config import FLASH_CONTEXT_TOKEN_BUDGET, FLASH_CONTEXT_MAX_TURNS, FLASH_REPLY_SUMMARY_CHARS
+from nifty_payload import payload_encoder
+
+_CHARS_PER_TOKEN = 4            # Rough estimate; good enough to keep the request under budget
+_REPLY_SECTIONS = ("ANALYSIS NARRATIVE", "TRADING IMPLICATION")
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // _CHARS_PER_TOKEN + 1
+
+# ---------------------------------------------------------
+# SNAPSHOT DELTAS (Older chains as per-strike differences vs the newest)
+# ---------------------------------------------------------
+def _split_snapshot(data: str, encoder):
+    """(summary lines, ATM, {strike: row fields}) from one cycle's data section."""
+    head, atm, rows = encoder.parse(data)
+    summary = [line.replace("CURRENT DATA FOR ANALYSIS - ", "") for line in head.splitlines()
+               if "FETCHED AT" in line or line.startswith(("- ", "NIFTY DATA", "BANKNIFTY DATA"))]
+    return summary, atm, rows
+
+def _delta(old: str, new: str) -> str:
+    if old == new:
+        return ""
+    try:
+        diff = float(old) - float(new)
+    except ValueError:
+        return old
+    return f"{diff:+.0f}" if diff == round(diff) else f"{round(diff, 2):+}"
+
+def encode_delta(old_data: str, new_data: str, encoder=None) -> str:
+    """
+    An older snapshot as its summary lines plus only the strikes that differ from the newest one.
+    Changed fields hold (older - current); unchanged fields are blank. Strikes absent from the
+    newest snapshot are given in full. Strike labels use the newest snapshot's ATM.
+    """
+    encoder = encoder or payload_encoder()
+    summary, _, old_rows = _split_snapshot(old_data, encoder)
+    _, new_atm, new_rows = _split_snapshot(new_data, encoder)
+    key = encoder.key_index
+    lines = ["EARLIER SNAPSHOT (per-strike deltas: older minus CURRENT; blank = unchanged; unchanged strikes omitted)"]
+    lines += summary
+    lines.append(encoder.columns)
+    for strike, fields in old_rows.items():
+        current = new_rows.get(strike)
+        if current is None:
+            row = list(fields)
+            row[key] = encoder.strike_label(strike, new_atm)
+            lines.append(",".join(row) + ",(FULL ROW - strike not in current window)")
+        elif fields != current:
+            deltas = [_delta(old, new) for old, new in zip(fields, current)]
+            deltas[key] = encoder.strike_label(strike, new_atm)
+            lines.append(",".join(deltas))
+    return "\n".join(lines)
+
+def summarise_reply(reply: str, max_chars: int = FLASH_REPLY_SUMMARY_CHARS) -> str:
+    """The narrative / implication section of an earlier answer (else its opening), capped at max_chars."""
+    upper = reply.upper()
+    starts = [upper.find(section) for section in _REPLY_SECTIONS if section in upper]
+    text = reply[min(starts):] if starts else reply
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    newline = cut.rfind("\n")
+    return (cut[:newline] if newline > max_chars // 2 else cut) + "\n[...]"
+
+# ---------------------------------------------------------
+# ROLLING CONTEXT (Token budget instead of a fixed snapshot count)
+# ---------------------------------------------------------
+class FlashContext:
+    """
+    Earlier (cycle data, reply) turns for the Flash fallback. The static prompt is not stored here
+    (it is sent once via the prompt cache / system instruction). Each request carries the newest
+    snapshot in full, then as many earlier turns as fit in `token_budget`, newest first, each
+    encoded as a delta against the newest snapshot with its reply summarised.
+    """
+
+    def __init__(self, token_budget: int = FLASH_CONTEXT_TOKEN_BUDGET, max_turns: int = FLASH_CONTEXT_MAX_TURNS):
+        self.token_budget = token_budget
+        self.turns = deque(maxlen=max_turns)
+
+    def __len__(self):
+        return len(self.turns)
+
+    def add(self, data: str, reply: str) -> None:
+        self.turns.append((data, reply))
+
+    def fingerprint(self) -> str:
+        """Changes whenever the stored turns do (part of the Flash response-cache key)."""
+        digest = hashlib.sha256()
+        for data, reply in self.turns:
+            digest.update(data.encode('utf-8'))
+            digest.update(b"\0")
+            digest.update(reply.encode('utf-8'))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def build(self, data: str) -> list:
+        """Gemini `contents` for a request about `data`: budgeted earlier turns, then `data` in full."""
+        budget = self.token_budget
+        earlier = []
+        for old_data, reply in reversed(self.turns):
+            turn = (encode_delta(old_data, data), summarise_reply(reply))
+            cost = estimate_tokens(turn[0]) + estimate_tokens(turn[1])
+            if cost > budget:
+                break
+            budget -= cost
+            earlier.append(turn)
+
+        if len(earlier) < len(self.turns):
+            print(f"   [!] Flash context: {len(earlier)}/{len(self.turns)} earlier snapshots fit the "
+                  f"{self.token_budget}-token budget")
+
+        contents = []
+        for delta, reply in reversed(earlier):
+            contents.append({"role": "user", "parts": [{"text": delta}]})
+            contents.append({"role": "model", "parts": [{"text": reply}]})
+        contents.append({"role": "user", "parts": [{"text": data}]})
+        return contents
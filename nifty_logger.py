@@ -1,9 +1,17 @@
 import os
 import datetime
-from typing import Dict, Any, List
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Dict, Any
 import urllib3
 
-from nifty_config import format_greek_value, AI_LOGS_DIR, RESEND_API_KEY, EMAIL_TO
+from nifty_config import AI_LOGS_DIR, RESEND_API_KEY, EMAIL_TO, HEARTBEAT_FILE
+from nifty_chain import OptionChain
+from nifty_payload import payload_encoder
+from nifty_strike_window import select_window
+from nifty_engine import ATM_EXTENDED_POINTS
+from nifty_manifest import write_latest_pointer
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -25,32 +33,31 @@ except Exception as e:
 # ---------------------------------------------------------
 # HELPER: CSV FORMATTER (Optimized for LLM Tokens)
 # ---------------------------------------------------------
-def format_csv_row(data: dict) -> str:
-    """Formats a single options chain row as a highly token-efficient CSV string."""
-    ce_iv = format_greek_value(data['ce_iv'], 1)
-    pe_iv = format_greek_value(data['pe_iv'], 1)
-    chg_oi_diff = data['ce_change_oi'] - data['pe_change_oi']
-    
-    # Handle missing/empty LTP values cleanly
-    ce_ltp = f"{data['ce_ltp']:.1f}" if data['ce_ltp'] else "0.0"
-    pe_ltp = f"{data['pe_ltp']:.1f}" if data['pe_ltp'] else "0.0"
-    
+def format_csv_rows(chain: OptionChain) -> str:
+    """Formats every strike of a chain as token-efficient CSV lines (vectorized over the columns)."""
     # Format: CE_ChgOI, CE_Vol, CE_LTP, CE_OI, CE_IV, STRIKE, PE_ChgOI, PE_Vol, PE_LTP, PE_OI, PE_IV, CE_PE_DIFF
-    return f"{data['ce_change_oi']},{data['ce_volume']},{ce_ltp},{data['ce_oi']},{ce_iv},{data['strike_price']},{data['pe_change_oi']},{data['pe_volume']},{pe_ltp},{data['pe_oi']},{pe_iv},{chg_oi_diff}\n"
+    return chain.to_csv()
 
 # ---------------------------------------------------------
 # EMAIL SENDING LOGIC
 # ---------------------------------------------------------
 def send_email_with_file_content(filepath: str, subject: str = None) -> bool:
     """Sends the complete text file content as an email using Resend API."""
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            file_content = f.read()
+    except OSError as e:
+        print(f"❌ Error reading {filepath} for email: {e}")
+        return False
+    return send_email_content(file_content, subject)
+
+def send_email_content(file_content: str, subject: str = None) -> bool:
+    """Sends an in-memory snapshot as an email using Resend API."""
     if not RESEND_AVAILABLE or not RESEND_API_KEY or "YOUR_" in RESEND_API_KEY:
         print("❌ Cannot send email: Resend module not available or key not configured")
         return False
         
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            file_content = f.read()
-        
         if not subject:
             timestamp = datetime.datetime.now().strftime("%d-%b-%Y %H:%M:%S")
             subject = f"🤖 Nifty AI Analysis - {timestamp}"
@@ -91,23 +98,10 @@ def send_email_with_file_content(filepath: str, subject: str = None) -> bool:
 # ---------------------------------------------------------
 # FILE SAVING LOGIC
 # ---------------------------------------------------------
-def save_ai_query_data(oi_data: List[Dict[str, Any]], 
-                      oi_pcr: float, 
-                      volume_pcr: float, 
-                      current_nifty: float,
-                      expiry_date: str,
-                      banknifty_data: Dict[str, Any] = None) -> str:
-    """Saves formatted option chain data to a text file and triggers email."""    
-    
-    timestamp = datetime.datetime.now().strftime("%d_%m_%Y_%H_%M_%S")
-    filepath = os.path.join(AI_LOGS_DIR, f"ai_query_{timestamp}.txt")
-    
-    # Using a list to build the string (Massive performance optimization)
-    lines = []
-    fetch_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    # 1. Add AI Prompt Header
-    system_prompt = """
+# ---------------------------------------------------------
+# STATIC PROMPT TEMPLATE (Identical in every ai_query file)
+# ---------------------------------------------------------
+SYSTEM_PROMPT = """
 🤖 NIFTY AI TRADING ANALYSIS
 # ===================================================================
 This report is run from the server having UST time Zone so calculate time in IST accordingly.
@@ -833,8 +827,134 @@ EVIDENCE BREAKDOWN:
 # ACTION: Provide SCRATCHPAD workings first.
 # ═══════════════════════════════════════════════════════
 """
-    lines.append(system_prompt)
+
+# ---------------------------------------------------------
+# NARRATIVE PROMPT TEMPLATE (Engine already computed v15.1; LLM only narrates)
+# ---------------------------------------------------------
+NARRATIVE_PROMPT = """
+🤖 NIFTY AI TRADING ANALYSIS
+# ===================================================================
+This report is run from the server having UST time Zone so calculate time in IST accordingly.
+Data is not pre market but in IST market hours but due to UST time show early.
+# ===================================================================
+
+# ═══════════════════════════════════════════════════════
+# NARRATIVE MODE — v15.1 VALUES ALREADY COMPUTED
+# ═══════════════════════════════════════════════════════
+# The LOCKED REPORT below was computed by the local deterministic v15.1 engine
+# from the option chain further down. Every value in it is final:
+# - Do NOT recompute any value and do NOT produce a STRIKE SCRATCHPAD.
+# - Use the option chain only as supporting evidence for the narrative.
+
+# ═══════════════════════════════════════════════════════
+# OUTPUT FORMAT
+# ═══════════════════════════════════════════════════════
+ANALYSIS NARRATIVE:
+  [4–6 sentences from the locked values — momentum, IV environment,
+   Max Pain gravity, support/resistance walls, and expiry context]
+
+TRADING IMPLICATION:
+  [Momentum Bias, Setup Confidence, Statistical Setup Surety and Volatility Context
+   exactly as given under TRADING IMPLICATION (LOCKED VALUES)]
+
+TRADE RECOMMENDATION & TARGETS:
+  [Action, Entry Zone, T1, T2 and Stop Loss exactly as locked]
+
+REVERSAL ALERT:
+  [The REVERSAL ALERT block of the locked report, verbatim]
+"""
+
+# Every static header an ai_query file can start with (prompt caching, log archives)
+STATIC_PROMPTS = (SYSTEM_PROMPT, NARRATIVE_PROMPT)
+
+# ---------------------------------------------------------
+# IN-MEMORY SNAPSHOT & SINKS (Disk and email run off the critical path)
+# ---------------------------------------------------------
+@dataclass
+class QuerySnapshot:
+    """One cycle's AI query, built once and shared by the analyzer and every sink."""
+    name: str        # ai_query_<timestamp>.txt
+    path: str        # Where the disk sink writes it
+    content: str
+    created_at: datetime.datetime
+
+def _write_snapshot(snapshot: QuerySnapshot):
+    with open(snapshot.path, 'w', encoding='utf-8') as f:
+        f.write(snapshot.content)
+    write_latest_pointer(snapshot.path)
+    print(f"✅ AI query data saved to: {snapshot.name}")
+
+def _email_snapshot(snapshot: QuerySnapshot):
+    if send_email_content(snapshot.content):
+        print("✅ Email dispatched successfully!")
+
+# Each sink (built-in or registered) gets its own worker so a slow email never delays the disk write
+SNAPSHOT_SINKS = [_write_snapshot, _email_snapshot]
+_sink_executors = {}
+_pending = []
+_pending_lock = threading.Lock()
+
+def register_snapshot_sink(sink) -> None:
+    """Adds a callable(QuerySnapshot) that runs in the background for every saved snapshot."""
+    SNAPSHOT_SINKS.append(sink)
+
+def _executor_for(sink) -> ThreadPoolExecutor:
+    executor = _sink_executors.get(sink)
+    if executor is None:
+        name = getattr(sink, '__name__', 'sink').strip('_')
+        executor = _sink_executors[sink] = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"snapshot-{name}")
+    return executor
+
+def _run_sink(sink, snapshot: QuerySnapshot):
+    try:
+        sink(snapshot)
+    except Exception as e:
+        print(f"❌ Snapshot sink {getattr(sink, '__name__', sink)} failed: {e}")
+
+def dispatch_snapshot(snapshot: QuerySnapshot) -> None:
+    with _pending_lock:
+        _pending[:] = [future for future in _pending if not future.done()]
+        _pending.extend(_executor_for(sink).submit(_run_sink, sink, snapshot) for sink in SNAPSHOT_SINKS)
+
+def flush_snapshot_sinks(timeout: float = None) -> None:
+    """Blocks until queued disk/email work is done (called at shutdown)."""
+    with _pending_lock:
+        pending = list(_pending)
+    if pending:
+        wait(pending, timeout=timeout)
+
+# ---------------------------------------------------------
+# AI QUERY BUILDER
+# ---------------------------------------------------------
+def save_ai_query_data(oi_data: OptionChain, 
+                      oi_pcr: float, 
+                      volume_pcr: float, 
+                      current_nifty: float,
+                      expiry_date: str,
+                      banknifty_data: Dict[str, Any] = None,
+                      engine_result=None,
+                      term_structure=None,
+                      strike_window=None) -> QuerySnapshot:
+    """Builds the AI query once, hands it to the background sinks (disk, email) and returns it."""    
     
+    now = datetime.datetime.now()
+    timestamp = now.strftime("%d_%m_%Y_%H_%M_%S")
+    filename = f"ai_query_{timestamp}.txt"
+    filepath = os.path.join(AI_LOGS_DIR, filename)
+    
+    # Using a list to build the string (Massive performance optimization)
+    lines = []
+    fetch_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    # 1. Add AI Prompt Header: narrative-only when the local v15.1 engine produced the values,
+    #    else the full pseudo-code prompt for the LLM to execute
+    if engine_result is not None:
+        lines.append(NARRATIVE_PROMPT)
+        lines.append("\nLOCKED REPORT:\n")
+        lines.append(engine_result.format_report())
+    else:
+        lines.append(SYSTEM_PROMPT)
+
     # 2. Add Nifty Summary
     lines.append(f"\nCURRENT DATA FOR ANALYSIS - FETCHED AT: {fetch_time}\n")
     lines.append("=" * 80 + "\n")
@@ -848,33 +968,38 @@ EVIDENCE BREAKDOWN:
         bn_vol_pcr = banknifty_data.get('pcr_values', {}).get('volume_pcr', 0)
         lines.append(f"\nBANKNIFTY DATA:\n- Current Value: {bn_curr}\n- Expiry Date: {bn_exp}\n- OI PCR: {bn_pcr:.2f}\n- Volume PCR: {bn_vol_pcr:.2f}\n")
 
-    # 4. Add Nifty Data Table (Optimized CSV format)
-    lines.append(f"\n\nCOMPLETE NIFTY OPTION CHAIN DATA (CSV FORMAT):\n")
-    lines.append("CE_ChgOI,CE_Vol,CE_LTP,CE_OI,CE_IV,STRIKE,PE_ChgOI,PE_Vol,PE_LTP,PE_OI,PE_IV,CE-PE_DIFF\n")
-    
-    # Filter to only include strikes within ATM +/- 600 points
-    atm_strike = round(current_nifty / 50) * 50
-    filtered_data = [d for d in oi_data if abs(d['strike_price'] - atm_strike) <= 600]
+    # Next weekly / monthly expiries (matter most on expiry day)
+    if term_structure is not None and len(term_structure) > 1:
+        lines.append(f"\n{term_structure.format_summary()}\n")
+
+    # 4. Add Nifty Data Table (Encoder chosen by PAYLOAD_FORMAT)
+    encoder = payload_encoder()
+    lines.append(f"\n\nCOMPLETE NIFTY OPTION CHAIN DATA ({encoder.title}):\n")
     
-    for data in filtered_data:
-        lines.append(format_csv_row(data))
+    # Filter to the strikes that carry the activity (see nifty_strike_window.py). Without the locked
+    # report the LLM scans ATM_EXTENDED itself, so that whole range has to be in the table
+    if engine_result is None:
+        strike_window = select_window(oi_data, min_points=ATM_EXTENDED_POINTS)
+    else:
+        strike_window = strike_window or select_window(oi_data)
+    lines.append(f"Strike window: {strike_window.describe()}\n")
+    lines.append(encoder.encode(strike_window.apply(oi_data), strike_window.atm))
         
     lines.append("\n")
 
     # Final string compilation
-    full_content = "".join(lines)
+    snapshot = QuerySnapshot(name=filename, path=filepath, content="".join(lines), created_at=now)
     
-    # Write to File
+    # Disk write + email happen in the background; the caller already has the content
+    print(f"💾 Queued {filename} for disk and email")
+    dispatch_snapshot(snapshot)
+    return snapshot
+
+def record_heartbeat(current_nifty: float, expiry_date: str, fingerprint: str) -> None:
+    """Appends one line for a cycle whose chain was identical to the last saved snapshot."""
+    stamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     try:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(full_content)
-        print(f"✅ AI query data saved to: {os.path.basename(filepath)}")
-        
-        print("📧 Sending to Email...")
-        if send_email_with_file_content(filepath):
-            print("✅ Email dispatched successfully!")
-            
-        return filepath
-    except Exception as e:
-        print(f"❌ Error saving AI query data: {e}")
-        return ""
+        with open(HEARTBEAT_FILE, 'a', encoding='utf-8') as f:
+            f.write(f"{stamp} | UNCHANGED | spot={current_nifty} | expiry={expiry_date} | {fingerprint}\n")
+    except OSError as e:
+        print(f"⚠️ Could not record heartbeat: {e}")
@@ -1,4 +1,5 @@
 import time
+import datetime
 import signal
 import sys
 import urllib3
@@ -11,32 +12,71 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 import nifty_config
 from nifty_config import (
     SYMBOL, FETCH_INTERVAL, ENABLE_AI_ANALYSIS, 
-    ENABLE_LOOP_FETCHING, ENABLE_STOCK_DISPLAY
+    ENABLE_LOOP_FETCHING, ENABLE_STOCK_DISPLAY, ENABLE_LOCAL_ENGINE,
+    ENABLE_CONCURRENT_FETCH, CYCLE_RETRY_BASE_DELAY, ENABLE_CHANGE_DETECTION,
+    BROWSER_IDLE_CLOSE_AFTER, ENABLE_SNAPSHOT_STORE, ENABLE_LOG_RETENTION
 )
 from nifty_fetcher import (
-    fetch_option_chain, parse_option_chain, calculate_pcr_values,
-    fetch_banknifty_data, fetch_all_stock_data, stop_playwright
+    fetch_option_chains, parse_option_chain, calculate_pcr_values,
+    fetch_banknifty_data, fetch_all_stock_data, stop_playwright, stop_http_session,
+    browser_running, browser_request_count, recycle_browser
 )
-from nifty_logger import save_ai_query_data, format_csv_row
+from nifty_async_fetcher import fetch_all_concurrent
+from nifty_logger import (
+    save_ai_query_data, format_csv_rows, record_heartbeat, flush_snapshot_sinks, STATIC_PROMPTS
+)
+from nifty_chain import CSV_HEADER
+from nifty_strike_window import select_window
 from nifty_ai import NiftyAIAnalyzer
+from nifty_engine import V15Engine
+from nifty_retry import RetryPolicy, circuit_status, max_circuit_wait
+from nifty_rate_limit import limiter_report
+from nifty_watchdog import BrowserWatchdog
+from nifty_store import SnapshotStore
+from nifty_retention import run_retention
 
 # Initialize the AI Analyzer
 ai_analyzer = NiftyAIAnalyzer()
 
+# Local v15.1 engine (keeps previous spot / peak Chg OI across cycles)
+v15_engine = V15Engine()
+
+# Backoff between failed cycles in loop mode (never longer than the normal fetch interval)
+cycle_retry_policy = RetryPolicy(base_delay=CYCLE_RETRY_BASE_DELAY, max_delay=FETCH_INTERVAL, jitter=0.5)
+
+# Append-only history of every parsed chain (NIFTY expiries, BANKNIFTY, stocks)
+snapshot_store = SnapshotStore() if ENABLE_SNAPSHOT_STORE else None
+
+# Recycles the long-lived sync browser on memory / request / latency thresholds
+browser_watchdog = BrowserWatchdog()
+
+# Fingerprints of the last snapshot that was logged and of the last one the AI analysed
+# successfully (change detection); an unchanged chain whose analysis failed is retried
+last_fingerprint = None
+last_analysed_fingerprint = None
+last_snapshot = None
+
+def snapshot_fingerprint(oi_data, banknifty_data, nifty_term=None) -> str:
+    """NIFTY chain fingerprint, extended with the other expiries and BANKNIFTY when present (all feed the AI prompt)."""
+    fingerprint = nifty_term.fingerprint() if nifty_term is not None and len(nifty_term) else oi_data.fingerprint()
+    if banknifty_data and banknifty_data.get('data') is not None:
+        fingerprint += ":" + banknifty_data['data'].fingerprint()
+    return fingerprint
+
 # ---------------------------------------------------------
 # CONSOLE DISPLAY HELPERS
 # ---------------------------------------------------------
 def print_table_header():
     """Prints the standardized CSV header for options data."""
-    print("CE_ChgOI,CE_Vol,CE_LTP,CE_OI,CE_IV,STRIKE,PE_ChgOI,PE_Vol,PE_LTP,PE_OI,PE_IV,CE-PE_DIFF")
+    print(CSV_HEADER)
     print("-" * 100)
 
-def display_nifty_data(oi_data, oi_pcr, volume_pcr):
-    """Displays Nifty OI data to the console (Filtered for ATM +/- 600)."""
+def display_nifty_data(oi_data, oi_pcr, volume_pcr, strike_window=None):
+    """Displays Nifty OI data to the console (Filtered to the adaptive strike window)."""
     if not oi_data: return
 
-    current_value = oi_data[0]['nifty_value']
-    expiry_date = oi_data[0]['expiry_date']
+    current_value = round(oi_data.underlying_value)
+    expiry_date = oi_data.expiry_date
 
     print(f"\n{'='*80}")
     print(f"OI Data for NIFTY - Current: {current_value}, Expiry: {expiry_date}")
@@ -44,15 +84,14 @@ def display_nifty_data(oi_data, oi_pcr, volume_pcr):
     print(f"{'='*80}")
     print_table_header()
 
-    # FILTER: Only print ATM +/- 600 to the console so it doesn't flood your screen
-    atm_strike = round(current_value / 50) * 50
-    filtered_data = [d for d in oi_data if abs(d['strike_price'] - atm_strike) <= 600]
-
-    for data in filtered_data:
-        print(format_csv_row(data), end="")
+    # FILTER: Only print the strike window to the console so it doesn't flood your screen
+    strike_window = strike_window or select_window(oi_data)
+    filtered_data = strike_window.apply(oi_data)
+    print(format_csv_rows(filtered_data), end="")
 
     print("-" * 100)
-    print(f"... (Hidden {len(oi_data) - len(filtered_data)} deep OTM strikes from console display) ...")
+    print(f"Strike window: {strike_window.describe()}")
+    print(f"... (Hidden {len(oi_data) - len(filtered_data)} strikes outside the window from console display) ...")
     print("=" * 100)
 
 def display_banknifty_data(banknifty_data):
@@ -83,52 +122,159 @@ def display_stocks_summary(stock_data):
               f"{info.get('oi_pcr', 0):<10.2f} {info.get('volume_pcr', 0):<10.2f}")
     print("=" * 80)
 
+# ---------------------------------------------------------
+# SNAPSHOT HISTORY
+# ---------------------------------------------------------
+def store_snapshots(oi_data, nifty_term, banknifty_data, stock_data):
+    """Appends this cycle's chains to the snapshot store under one timestamp."""
+    if snapshot_store is None:
+        return
+    chains = list(nifty_term.chains.values()) if nifty_term is not None and len(nifty_term) else [oi_data]
+    if banknifty_data and banknifty_data.get('data') is not None:
+        chains.append(banknifty_data['data'])
+    if stock_data:
+        chains.extend(info['data'] for info in stock_data.values() if info.get('data') is not None)
+    try:
+        stored = snapshot_store.append_cycle(chains)
+        print(f"🗄️ Snapshot store: {stored}/{len(chains)} chains appended")
+    except Exception as e:
+        print(f"⚠️ Snapshot store write failed: {e}")
+
+# ---------------------------------------------------------
+# LOG & SNAPSHOT RETENTION (Once per process start and once per day in loop mode)
+# ---------------------------------------------------------
+last_retention_day = None
+
+def maybe_run_retention():
+    global last_retention_day
+    today = datetime.date.today()
+    if ENABLE_LOG_RETENTION and today != last_retention_day:
+        last_retention_day = today
+        run_retention(STATIC_PROMPTS)
+        if snapshot_store is not None:
+            try:
+                removed = snapshot_store.prune()
+                if removed:
+                    print(f"🗄️ Snapshot store: pruned {removed} old snapshots")
+            except Exception as e:
+                print(f"⚠️ Snapshot store prune failed: {e}")
+
+# ---------------------------------------------------------
+# BROWSER WATCHDOG
+# ---------------------------------------------------------
+def check_browser_health(fetch_seconds: float):
+    """Feeds the watchdog and restarts Chromium (cookies preserved) when it trips."""
+    reason = browser_watchdog.check(fetch_seconds, browser_request_count(), browser_running())
+    if browser_running():
+        print(f"🐕 Browser watchdog: {browser_watchdog.status(browser_request_count())}")
+    if reason and recycle_browser(reason):
+        browser_watchdog.reset_latency()
+
+def release_browser_for_wait(wait_seconds: float):
+    """Don't hold Chromium's memory through a long sleep; the next cycle restarts it from saved cookies."""
+    if wait_seconds >= BROWSER_IDLE_CLOSE_AFTER and browser_running():
+        recycle_browser(f"idle for {wait_seconds:.0f}s")
+
+# ---------------------------------------------------------
+# AI ANALYSIS
+# ---------------------------------------------------------
+def run_ai_analysis(snapshot, fingerprint: str):
+    """Analyses the snapshot; only a successful answer marks its chain as analysed."""
+    global last_analysed_fingerprint
+    print("\n" + "="*80 + "\nREQUESTING AI ANALYSIS...\n" + "="*80)
+    ai_analysis = ai_analyzer.get_ai_analysis(snapshot=snapshot)
+    print(ai_analysis)
+    if not ai_analysis.startswith("❌"):
+        last_analysed_fingerprint = fingerprint
+
 # ---------------------------------------------------------
 # CORE EXECUTION CYCLE
 # ---------------------------------------------------------
 def data_collection_cycle():
     """Performs one complete data fetch, log, and AI analysis cycle."""
+    global last_fingerprint, last_snapshot
     print(f"\nFetching {SYMBOL} option chain...")
     
     try:
-        # 1. Fetch & Parse Nifty
-        raw_data = fetch_option_chain()
-        oi_data = parse_option_chain(raw_data)
+        # 1. Fetch Nifty, BankNifty & Stocks (all at once, or one after another)
+        fetch_start = time.perf_counter()
+        if ENABLE_CONCURRENT_FETCH:
+            raw_data, banknifty_data, stock_data, nifty_term = fetch_all_concurrent(ENABLE_STOCK_DISPLAY)
+        else:
+            raw_data, nifty_term = fetch_option_chains()
+            banknifty_data = fetch_banknifty_data()
+            stock_data = fetch_all_stock_data() if ENABLE_STOCK_DISPLAY else None
+        print(f"🚦 NSE rate limiter: {limiter_report()}")
+        check_browser_health(time.perf_counter() - fetch_start)
+
+        # 2. Nearest Nifty chain (already decoded into the term structure; parsed only without one)
+        oi_data = nifty_term.nearest() if nifty_term is not None else None
+        if oi_data is None:
+            oi_data = parse_option_chain(raw_data)
         
         if not oi_data:
             print("❌ No valid expiry data parsed. Skipping this cycle.")
             return False
             
+        store_snapshots(oi_data, nifty_term, banknifty_data, stock_data)
+
+        # Same chain as last time (lunch hours, after close): heartbeat only, no log / email / AI
+        fingerprint = snapshot_fingerprint(oi_data, banknifty_data, nifty_term) if ENABLE_CHANGE_DETECTION else None
+        if fingerprint and fingerprint == last_fingerprint:
+            record_heartbeat(round(oi_data.underlying_value), oi_data.expiry_date, fingerprint)
+            if ENABLE_AI_ANALYSIS and fingerprint != last_analysed_fingerprint and last_snapshot is not None:
+                print(f"🔁 Chain unchanged since last snapshot (Nifty {round(oi_data.underlying_value)}) "
+                      f"but its AI analysis failed. Skipping log and email, retrying AI.")
+                run_ai_analysis(last_snapshot, fingerprint)
+            else:
+                print(f"💤 Chain unchanged since last snapshot (Nifty {round(oi_data.underlying_value)}). "
+                      f"Skipping log, email and AI.")
+            return True
+
         oi_pcr, volume_pcr = calculate_pcr_values(oi_data)
-        
-        # 2. Fetch BankNifty & Stocks
-        banknifty_data = fetch_banknifty_data()
-        stock_data = fetch_all_stock_data() if ENABLE_STOCK_DISPLAY else None
 
         # 3. Console Display
-        display_nifty_data(oi_data, oi_pcr, volume_pcr)
+        strike_window = select_window(oi_data)
+        display_nifty_data(oi_data, oi_pcr, volume_pcr, strike_window)
         if banknifty_data: display_banknifty_data(banknifty_data)
         if stock_data: display_stocks_summary(stock_data)
+        if nifty_term is not None and len(nifty_term) > 1:
+            print(f"\n{nifty_term.format_summary()}\n{'='*80}")
 
         # 4. Save Logs & Email
         print("\n💾 Archiving data and preparing email...")
-        current_nifty = oi_data[0]['nifty_value']
-        expiry_date = oi_data[0]['expiry_date']
+        current_nifty = round(oi_data.underlying_value)
+        expiry_date = oi_data.expiry_date
+
+        engine_result = None
+        if ENABLE_LOCAL_ENGINE:
+            try:
+                bn_pcr = banknifty_data['pcr_values']['oi_pcr'] if banknifty_data else None
+                engine_result = v15_engine.compute(
+                    oi_data, oi_data.underlying_value, expiry_date,
+                    oi_pcr, volume_pcr, banknifty_oi_pcr=bn_pcr
+                )
+                print(f"🧮 Local v15.1 engine: {engine_result.momentum} | {engine_result.strength} "
+                      f"({engine_result.score}/10) | Rev {engine_result.rev_score} → {engine_result.confidence}")
+            except Exception as e:
+                print(f"⚠️ Local engine failed, falling back to LLM-side math: {e}")
         
-        save_ai_query_data(
+        snapshot = save_ai_query_data(
             oi_data=oi_data,
             oi_pcr=oi_pcr,
             volume_pcr=volume_pcr,
             current_nifty=current_nifty,
             expiry_date=expiry_date,
-            banknifty_data=banknifty_data
+            banknifty_data=banknifty_data,
+            engine_result=engine_result,
+            term_structure=nifty_term,
+            strike_window=strike_window
         )
+        last_fingerprint, last_snapshot = fingerprint, snapshot
 
         # 5. Execute AI Analysis & Telegram Alert
         if ENABLE_AI_ANALYSIS:
-            print("\n" + "="*80 + "\nREQUESTING AI ANALYSIS...\n" + "="*80)
-            ai_analysis = ai_analyzer.get_ai_analysis()
-            print(ai_analysis)
+            run_ai_analysis(snapshot, fingerprint)
 
         print("="*80)
         print(f"✅ Cycle complete. Nifty: {current_nifty} | Expiry: {expiry_date}")
@@ -146,23 +292,35 @@ def data_collection_loop():
     try:
         if ENABLE_LOOP_FETCHING:
             cycle_count = 0
+            consecutive_failures = 0
             while nifty_config.running:
                 cycle_count += 1
+                maybe_run_retention()
                 print(f"\n{'#'*80}\nDATA COLLECTION CYCLE {cycle_count}\n{'#'*80}")
                 
                 success = data_collection_cycle()
                 
                 if not success:
-                    print("⚠️ Cycle failed, waiting 30 seconds before retry...")
-                    time.sleep(30)
+                    consecutive_failures += 1
+                    # Jittered exponential backoff, but no point retrying before an open circuit can probe
+                    wait = max(cycle_retry_policy.backoff(consecutive_failures), max_circuit_wait())
+                    wait = min(wait, FETCH_INTERVAL)
+                    print(f"⚠️ Cycle failed ({consecutive_failures} in a row), retrying in {wait:.0f}s | circuits: {circuit_status()}")
+                    release_browser_for_wait(wait)
+                    end = time.monotonic() + wait
+                    while nifty_config.running and time.monotonic() < end:
+                        time.sleep(min(1, end - time.monotonic()))
                     continue
+                consecutive_failures = 0
 
                 if nifty_config.running:
+                    release_browser_for_wait(FETCH_INTERVAL)
                     print(f"\n⏳ Waiting {FETCH_INTERVAL} seconds for next cycle...")
                     for _ in range(FETCH_INTERVAL):
                         if not nifty_config.running: break
                         time.sleep(1)
         else:
+            maybe_run_retention()
             data_collection_cycle()
             print("\n✅ Single execution mode completed successfully.")
 
@@ -189,6 +347,10 @@ def main():
     finally:
         print("🧹 Cleaning up background processes...")
         stop_playwright()
+        stop_http_session()
+        flush_snapshot_sinks(timeout=30)
+        ai_analyzer.close()
+        if snapshot_store is not None: snapshot_store.close()
         print("✅ Application shutdown complete.")
         sys.exit(0)
 
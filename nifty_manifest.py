@@ -0,0 +1,61 @@
+import os
+import glob
+import json
+import time
+
+from nifty_config import AI_LOGS_DIR, LATEST_SNAPSHOT_MANIFEST
+
+# ---------------------------------------------------------
+# LATEST-SNAPSHOT POINTER (Written atomically after every saved ai_query file)
+# ---------------------------------------------------------
+def write_latest_pointer(filepath: str, manifest_path: str = None) -> None:
+    """Points the manifest at filepath. Readers see either the old or the new pointer, never a torn one."""
+    manifest_path = manifest_path or LATEST_SNAPSHOT_MANIFEST
+    previous = _read_manifest(manifest_path) or {}
+    entry = {
+        "file": os.path.basename(filepath),
+        "written_at": time.time(),
+        "sequence": previous.get("sequence", 0) + 1,
+    }
+    tmp_path = f"{manifest_path}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, manifest_path)
+    except OSError as e:
+        print(f"⚠️ Could not update latest-snapshot manifest: {e}")
+
+def _read_manifest(manifest_path: str):
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+        return entry if isinstance(entry, dict) and entry.get("file") else None
+    except (OSError, ValueError):
+        return None
+
+def _scan_latest(logs_dir: str):
+    """Recovery path: newest *.txt by ctime (the pre-manifest behaviour)."""
+    files = glob.glob(os.path.join(logs_dir, '*.txt'))
+    return max(files, key=os.path.getctime) if files else None
+
+def latest_snapshot_file(logs_dir: str = None, manifest_path: str = None):
+    """
+    Path of the newest ai_query file in O(1) via the manifest. Falls back to a directory scan
+    (and repairs the manifest) only when the pointer is missing or names a file that is gone.
+    """
+    logs_dir = logs_dir or AI_LOGS_DIR
+    manifest_path = manifest_path or LATEST_SNAPSHOT_MANIFEST
+    entry = _read_manifest(manifest_path)
+    if entry:
+        path = os.path.join(logs_dir, entry["file"])
+        if os.path.exists(path):
+            return path
+        print(f"⚠️ Manifest points at missing file {entry['file']}, rescanning {logs_dir}")
+
+    if not os.path.exists(logs_dir):
+        print(f"⚠️ Input directory not found: {logs_dir}")
+        return None
+    latest = _scan_latest(logs_dir)
+    if latest:
+        write_latest_pointer(latest, manifest_path)
+    return latest
@@ -0,0 +1,135 @@
+import re
+import numpy as np
+
+from nifty_config import PAYLOAD_FORMAT
+from nifty_chain import OptionChain, CSV_HEADER
+
+_ATM_LEGEND = re.compile(r'^ATM=(-?\d+(?:\.\d+)?)', re.MULTILINE)
+
+def _one_decimal(values: np.ndarray) -> np.ndarray:
+    """%.1f without a trailing '.0' (370.2 -> '370.2', 0.0 -> '0', 125.0 -> '125')."""
+    text = np.char.mod('%.1f', values)
+    text = np.where(np.char.endswith(text, '.0'), np.char.rstrip(np.char.rstrip(text, '0'), '.'), text)
+    return np.where(text == '-0', '0', text)
+
+def _plain(value: float) -> str:
+    return f"{value:.0f}" if value == int(value) else f"{value:g}"
+
+# ---------------------------------------------------------
+# PAYLOAD ENCODERS (How the option chain table is written into the AI query)
+# ---------------------------------------------------------
+class PayloadEncoder:
+    """
+    Current 12-column CSV. Subclasses override `columns`, `legend` and `rows`; the table is
+    always `legend`, then the `columns` line, then one comma-separated row per strike, so it can be
+    parsed back (`parse`) for the Flash delta context.
+    """
+    name = "csv"
+    title = "CSV FORMAT"
+    columns = CSV_HEADER
+    key = "STRIKE"          # Column that identifies the strike
+
+    @property
+    def key_index(self) -> int:
+        return self.columns.split(",").index(self.key)
+
+    def legend(self, atm: float) -> str:
+        return ""
+
+    def rows(self, chain: OptionChain, atm: float) -> str:
+        return chain.to_csv()
+
+    def encode(self, chain: OptionChain, atm: float) -> str:
+        legend = self.legend(atm)
+        return (f"{legend}\n" if legend else "") + self.columns + "\n" + self.rows(chain, atm)
+
+    def strike_label(self, strike: float, atm: float) -> str:
+        """Text of the key column for `strike` when the table's ATM is `atm`."""
+        return _plain(strike)
+
+    def parse(self, text: str):
+        """(text before the table, ATM or None, {strike: row fields}) from an encoded query."""
+        head, _, table = text.partition(self.columns + "\n")
+        match = _ATM_LEGEND.search(head)
+        atm = float(match.group(1)) if match else None
+        rows, key = {}, self.key_index
+        for line in table.splitlines():
+            fields = line.split(",")
+            if len(fields) <= key:
+                break
+            try:
+                rows[self._strike(fields[key], atm)] = fields
+            except ValueError:
+                break
+        return head, atm, rows
+
+    def _strike(self, label: str, atm: float) -> float:
+        return float(label)
+
+class CompactEncoder(PayloadEncoder):
+    """Same values, minus the derivable CE-PE_DIFF column and the '.0' on whole numbers."""
+    name = "compact"
+    title = "COMPACT CSV FORMAT"
+    columns = "CE_ChgOI,CE_Vol,CE_LTP,CE_OI,CE_IV,STRIKE,PE_ChgOI,PE_Vol,PE_LTP,PE_OI,PE_IV"
+
+    def legend(self, atm: float) -> str:
+        return "# CE-PE_DIFF omitted (= CE_ChgOI - PE_ChgOI); whole-number LTP/IV written without '.0'"
+
+    def _quantities(self, chain: OptionChain):
+        return [chain.ce_change_oi.astype(str), chain.ce_volume.astype(str), chain.ce_oi.astype(str),
+                chain.pe_change_oi.astype(str), chain.pe_volume.astype(str), chain.pe_oi.astype(str)]
+
+    def _strikes(self, chain: OptionChain, atm: float):
+        return [self.strike_label(strike, atm) for strike in chain.strike_price.tolist()]
+
+    def rows(self, chain: OptionChain, atm: float) -> str:
+        if not len(chain):
+            return ""
+        ce_chg, ce_vol, ce_oi, pe_chg, pe_vol, pe_oi = (c.tolist() for c in self._quantities(chain))
+        columns = [ce_chg, ce_vol, _one_decimal(chain.ce_ltp).tolist(), ce_oi, _one_decimal(chain.ce_iv).tolist(),
+                   self._strikes(chain, atm),
+                   pe_chg, pe_vol, _one_decimal(chain.pe_ltp).tolist(), pe_oi, _one_decimal(chain.pe_iv).tolist()]
+        return "\n".join(map(",".join, zip(*columns))) + "\n"
+
+class OffsetEncoder(CompactEncoder):
+    """Compact, with strikes written as offsets from ATM (K) under an ATM legend."""
+    name = "offset"
+    title = "COMPACT CSV FORMAT, STRIKES AS ATM OFFSETS"
+    columns = "CE_ChgOI,CE_Vol,CE_LTP,CE_OI,CE_IV,K,PE_ChgOI,PE_Vol,PE_LTP,PE_OI,PE_IV"
+    key = "K"
+
+    def legend(self, atm: float) -> str:
+        return (f"ATM={_plain(atm)}\n# K = STRIKE - ATM (e.g. K=-100 is strike {_plain(atm - 100)}); "
+                f"CE-PE_DIFF omitted (= CE_ChgOI - PE_ChgOI)")
+
+    def strike_label(self, strike: float, atm: float) -> str:
+        if atm is None:
+            return _plain(strike)
+        return f"{strike - atm:+g}" if strike != atm else "0"
+
+    def _strike(self, label: str, atm: float) -> float:
+        return float(label) + (atm or 0)
+
+class OffsetThousandsEncoder(OffsetEncoder):
+    """Offsets plus OI, Chg OI and volume in whole thousands (lossy; a decimal point costs more tokens than it saves)."""
+    name = "offset_k"
+    title = "COMPACT CSV FORMAT, STRIKES AS ATM OFFSETS, QUANTITIES IN THOUSANDS"
+
+    def legend(self, atm: float) -> str:
+        return (f"ATM={_plain(atm)}\n# K = STRIKE - ATM (e.g. K=-100 is strike {_plain(atm - 100)}); "
+                f"ChgOI, Vol and OI in thousands of contracts, rounded (77 = ~77,000); CE-PE_DIFF omitted")
+
+    def _quantities(self, chain: OptionChain):
+        quantities = (chain.ce_change_oi, chain.ce_volume, chain.ce_oi, chain.pe_change_oi, chain.pe_volume, chain.pe_oi)
+        return [np.rint(c / 1000).astype(np.int64).astype(str) for c in quantities]
+
+ENCODERS = {encoder.name: encoder for encoder in
+            (PayloadEncoder(), CompactEncoder(), OffsetEncoder(), OffsetThousandsEncoder())}
+
+def payload_encoder(name: str = None) -> PayloadEncoder:
+    """The encoder for `name` (default PAYLOAD_FORMAT). Unknown names fall back to the plain CSV."""
+    name = name or PAYLOAD_FORMAT
+    if name not in ENCODERS:
+        print(f"⚠️ Unknown PAYLOAD_FORMAT '{name}', using csv")
+        return ENCODERS["csv"]
+    return ENCODERS[name]
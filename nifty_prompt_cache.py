@@ -0,0 +1,141 @@
+import json
+import time
+import hashlib
+import datetime
+
+from google.genai import types
+
+from nifty_config import GEMINI_PROMPT_CACHE_TTL, CLAUDE_PROMPT_CACHE_TTL, AI_TOKEN_USAGE_LOG
+from nifty_logger import STATIC_PROMPTS
+
+# Recreate a Gemini cache instead of reusing it when it expires this soon (seconds)
+_EXPIRY_MARGIN = 60
+# Gemini refuses cachedContent below ~2k tokens (e.g. the short narrative prompt); don't try
+_MIN_CACHE_CHARS = 8192
+
+# ---------------------------------------------------------
+# STATIC / PER-CYCLE SPLIT (The v15.1 prompt is identical on every cycle)
+# ---------------------------------------------------------
+def split_prompt(content: str):
+    """(static, dynamic): the static prompt header (full or narrative) and the per-cycle data after it."""
+    for static in STATIC_PROMPTS:
+        if content.startswith(static):
+            return static, content[len(static):]
+    return "", content
+
+def claude_system_blocks(system_instruction: str, static: str, cache: bool = True) -> list:
+    """System blocks for messages.create with the static prompt marked as a cache breakpoint."""
+    if not static:
+        return [{"type": "text", "text": system_instruction}]
+    block = {"type": "text", "text": f"{system_instruction}\n\n{static}"}
+    if cache:
+        block["cache_control"] = {"type": "ephemeral", "ttl": CLAUDE_PROMPT_CACHE_TTL}
+    return [block]
+
+# ---------------------------------------------------------
+# GEMINI CACHED CONTENT (One cache per model, extended on every use)
+# ---------------------------------------------------------
+class _CacheEntry:
+    __slots__ = ('name', 'digest', 'expires_at')
+
+    def __init__(self, name: str, digest: str, expires_at: float):
+        self.name = name
+        self.digest = digest
+        self.expires_at = expires_at
+
+class GeminiPromptCache:
+    """
+    Holds a Gemini cachedContent for the static prompt per model. A cache is reused while the
+    prompt text is unchanged, its TTL is pushed forward on each use, and it is replaced when the
+    prompt changes or it is about to expire. Models that refuse caching are retried after one TTL.
+    """
+
+    def __init__(self, client, ttl: int = GEMINI_PROMPT_CACHE_TTL):
+        self.client = client
+        self.ttl = ttl
+        self._entries = {}
+        self._failed_until = {}
+
+    def get(self, model: str, system_instruction: str, static: str):
+        """Name of a live cache holding system_instruction + static for model, or None."""
+        if len(static) < _MIN_CACHE_CHARS:
+            return None
+        digest = hashlib.sha256(f"{system_instruction}\0{static}".encode('utf-8')).hexdigest()[:16]
+        now = time.time()
+        entry = self._entries.get(model)
+
+        if entry and entry.digest == digest and entry.expires_at - now > _EXPIRY_MARGIN:
+            try:
+                self.client.caches.update(name=entry.name, config=types.UpdateCachedContentConfig(ttl=f"{self.ttl}s"))
+                entry.expires_at = now + self.ttl
+            except Exception as e:
+                print(f"⚠️ Could not extend Gemini prompt cache ({e}); using it until it expires")
+            return entry.name
+
+        if entry:
+            self.invalidate(model)
+        if self._failed_until.get(model, 0) > now:
+            return None
+
+        try:
+            cache = self.client.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    display_name=f"nifty-v15-{digest}",
+                    system_instruction=system_instruction,
+                    contents=[static],
+                    ttl=f"{self.ttl}s",
+                )
+            )
+        except Exception as e:
+            print(f"⚠️ Gemini prompt cache unavailable for {model}: {e}")
+            self._failed_until[model] = now + self.ttl
+            return None
+        self._entries[model] = _CacheEntry(cache.name, digest, now + self.ttl)
+        print(f"🗃️ Created Gemini prompt cache for {model} (TTL {self.ttl}s)")
+        return cache.name
+
+    def invalidate(self, model: str):
+        """Forgets (and deletes) the model's cache, e.g. after a request that used it failed."""
+        entry = self._entries.pop(model, None)
+        if entry is None:
+            return
+        try:
+            self.client.caches.delete(name=entry.name)
+        except Exception:
+            pass # Already expired or deleted server-side
+
+    def close(self):
+        for model in list(self._entries):
+            self.invalidate(model)
+
+# ---------------------------------------------------------
+# TOKEN ACCOUNTING (Cached vs uncached input per call)
+# ---------------------------------------------------------
+def gemini_usage(response) -> dict:
+    meta = getattr(response, 'usage_metadata', None)
+    prompt = (meta and meta.prompt_token_count) or 0
+    cached = (meta and meta.cached_content_token_count) or 0
+    return {"cached": cached, "cache_write": 0, "uncached": prompt - cached,
+            "output": (meta and meta.candidates_token_count) or 0}
+
+def claude_usage(message) -> dict:
+    usage = message.usage
+    return {"cached": usage.cache_read_input_tokens or 0, "cache_write": usage.cache_creation_input_tokens or 0,
+            "uncached": usage.input_tokens or 0, "output": usage.output_tokens or 0}
+
+def format_usage(usage: dict) -> str:
+    text = f"{usage['cached']} cached / {usage['uncached']} uncached in, {usage['output']} out"
+    if usage['cache_write']:
+        text += f" ({usage['cache_write']} written to cache)"
+    return text
+
+def record_usage(model: str, usage: dict, path: str = AI_TOKEN_USAGE_LOG) -> None:
+    """Appends one JSON line per LLM call and prints the split."""
+    print(f"🪙 {model} tokens: {format_usage(usage)}")
+    entry = {"time": datetime.datetime.now().isoformat(timespec='seconds'), "model": model, **usage}
+    try:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + "\n")
+    except OSError as e:
+        print(f"⚠️ Could not record token usage: {e}")
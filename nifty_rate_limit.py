@@ -0,0 +1,91 @@
+import time
+import asyncio
+import threading
+from urllib.parse import urlsplit
+
+from nifty_config import NSE_RATE_LIMIT, NSE_RATE_BURST
+
+# ---------------------------------------------------------
+# TOKEN BUCKET (Reservation based, so sync and async callers share one bucket)
+# ---------------------------------------------------------
+class TokenBucket:
+    """
+    `rate` tokens per second, at most `burst` saved up. reserve() takes a token immediately
+    (the balance may go negative) and returns how long the caller must wait before using it,
+    so waiting happens outside the lock and callers are served in arrival order.
+    """
+
+    def __init__(self, rate: float, burst: int, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.waited = 0.0
+        self.max_wait = 0.0
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.requests += 1
+            self.waited += wait
+            self.max_wait = max(self.max_wait, wait)
+            return wait
+
+    def acquire(self) -> float:
+        wait = self.reserve()
+        if wait:
+            self._sleep(wait)
+        return wait
+
+    async def acquire_async(self) -> float:
+        wait = self.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+    def snapshot(self, reset: bool = False) -> dict:
+        with self._lock:
+            stats = {"requests": self.requests, "waited": self.waited, "max_wait": self.max_wait}
+            if reset:
+                self.requests, self.waited, self.max_wait = 0, 0.0, 0.0
+            return stats
+
+# ---------------------------------------------------------
+# PER-HOST REGISTRY (Every NSE request goes through throttle / throttle_async)
+# ---------------------------------------------------------
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+def limiter_for(url: str) -> TokenBucket:
+    host = urlsplit(url).netloc or url
+    with _buckets_lock:
+        if host not in _buckets:
+            _buckets[host] = TokenBucket(NSE_RATE_LIMIT, NSE_RATE_BURST)
+        return _buckets[host]
+
+def throttle(url: str) -> float:
+    """Blocks until the host's bucket allows a request. Returns seconds waited."""
+    return limiter_for(url).acquire()
+
+async def throttle_async(url: str) -> float:
+    return await limiter_for(url).acquire_async()
+
+def limiter_report(reset: bool = True) -> str:
+    """One line per host: requests, total and worst wait since the last report."""
+    with _buckets_lock:
+        buckets = list(_buckets.items())
+    parts = []
+    for host, bucket in buckets:
+        stats = bucket.snapshot(reset)
+        if stats["requests"]:
+            parts.append(f"{host}: {stats['requests']} req, waited {stats['waited']:.2f}s "
+                         f"(max {stats['max_wait']:.2f}s)")
+    return " | ".join(parts) if parts else "no requests"
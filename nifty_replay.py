@@ -0,0 +1,270 @@
+import os
+import re
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from nifty_config import NSE_RECORD_DIR
+
+# ---------------------------------------------------------
+# PAYLOAD KEYS (One recorded file per endpoint / symbol / expiry)
+# ---------------------------------------------------------
+def payload_key(url: str, with_expiry: bool = True) -> str:
+    """Maps an NSE API URL to a stable file key, e.g. 'option-chain-v3__Indices__NIFTY__23-Oct-2026'."""
+    parts = urlsplit(url)
+    endpoint = parts.path.rstrip('/').rsplit('/', 1)[-1] or "root"
+    query = parse_qs(parts.query)
+    fields = [endpoint]
+    for name in ("type", "symbol", "expiry"):
+        if name == "expiry" and not with_expiry:
+            continue
+        if name in query:
+            fields.append(query[name][0])
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', "__".join(fields))
+
+# ---------------------------------------------------------
+# RECORDER (Called by every fetch path with the raw response body)
+# ---------------------------------------------------------
+_record_lock = threading.Lock()
+
+def record_payload(url: str, text: str, record_dir: str = None):
+    """Stores the raw body exactly as received, keyed by URL. No-op unless NSE_RECORD_DIR is set."""
+    record_dir = record_dir or NSE_RECORD_DIR
+    if not record_dir or not text:
+        return
+    try:
+        os.makedirs(record_dir, exist_ok=True)
+        with _record_lock:
+            with open(os.path.join(record_dir, f"{payload_key(url)}.json"), 'w', encoding='utf-8') as f:
+                f.write(text)
+    except OSError as e:
+        print(f"⚠️ Could not record payload for {url}: {e}")
+
+# ---------------------------------------------------------
+# FAULT-INJECTING NSE STAND-IN SERVER
+# ---------------------------------------------------------
+class FaultProfile:
+    """Per-request fault probabilities; all draws come from one seeded RNG so runs are reproducible."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 503, empty_rate: float = 0.0, zero_spot_rate: float = 0.0,
+                 seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.empty_rate = empty_rate
+        self.zero_spot_rate = zero_spot_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """Returns (delay_seconds, fault) where fault is None, 'error', 'empty' or 'zero_spot'."""
+        with self._lock:
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            roll = self._rng.random()
+        if roll < self.error_rate:
+            return delay, "error"
+        roll -= self.error_rate
+        if roll < self.empty_rate:
+            return delay, "empty"
+        roll -= self.empty_rate
+        if roll < self.zero_spot_rate:
+            return delay, "zero_spot"
+        return delay, None
+
+class ReplayStore:
+    """Loads recorded payloads from a directory and resolves request URLs against them."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.payloads = {}
+        for name in os.listdir(directory):
+            if name.endswith(".json"):
+                with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+                    self.payloads[name[:-5]] = f.read()
+
+    def lookup(self, url: str):
+        """Exact key first, then any recorded expiry for the same endpoint/symbol (expiries roll weekly)."""
+        exact = self.payloads.get(payload_key(url))
+        if exact is not None:
+            return exact
+        prefix = payload_key(url, with_expiry=False)
+        for key in sorted(self.payloads):
+            if key == prefix or key.startswith(prefix + "__"):
+                return self.payloads[key]
+        return None
+
+def _zero_spot(text: str) -> str:
+    try:
+        data = json.loads(text)
+        data["records"]["underlyingValue"] = 0
+        return json.dumps(data)
+    except (ValueError, KeyError, TypeError):
+        return text
+
+def _make_handler(store: ReplayStore, faults: FaultProfile, stats: dict):
+    class NSEStandInHandler(BaseHTTPRequestHandler):
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send(self, status: int, body: str, content_type: str = "application/json"):
+            payload = body.encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            if not self.path.startswith("/api/"):
+                self.send_header("Set-Cookie", "nsit=replay; Path=/")
+                self.send_header("Set-Cookie", "nseappid=replay; Path=/")
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            delay, fault = faults.draw()
+            if delay:
+                time.sleep(delay)
+            stats[fault or "ok"] = stats.get(fault or "ok", 0) + 1
+
+            if not self.path.startswith("/api/"):
+                return self._send(200, "<html><body>NSE stand-in</body></html>", "text/html")
+            if fault == "error":
+                return self._send(faults.error_status, '{"error": "injected"}')
+            if fault == "empty":
+                return self._send(200, "{}")
+
+            body = store.lookup(self.path)
+            if body is None:
+                stats["missing"] = stats.get("missing", 0) + 1
+                return self._send(404, '{"error": "no recorded payload"}')
+            if fault == "zero_spot":
+                body = _zero_spot(body)
+            return self._send(200, body)
+
+    return NSEStandInHandler
+
+def start_server(directory: str, port: int = 8000, faults: FaultProfile = None, host: str = "127.0.0.1"):
+    """Starts the stand-in server on a daemon thread. Returns (server, stats); stop with server.shutdown()."""
+    stats = {}
+    store = ReplayStore(directory)
+    server = ThreadingHTTPServer((host, port), _make_handler(store, faults or FaultProfile(), stats))
+    server.store = store
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stats
+
+# ---------------------------------------------------------
+# OFFLINE BENCHMARK OF THE FULL COLLECTION CYCLE
+# ---------------------------------------------------------
+def _isolate_benchmark(workdir: str):
+    """
+    Keeps a benchmark off the live system: no AI, no email, no payload recording, and every file a
+    cycle writes (ai_query logs, manifest, heartbeat, snapshot store, expiry cache, NSE session)
+    goes under workdir. Config values are imported by value: nifty_config is redirected before the
+    first import of nifty_main, and modules that were already imported are patched directly.
+    """
+    import nifty_config
+    logs_dir = os.path.join(workdir, "ai-query-logs")
+    nifty_config.AI_LOGS_DIR = logs_dir
+    nifty_config.HEARTBEAT_FILE = os.path.join(logs_dir, "heartbeat.log")
+    nifty_config.LATEST_SNAPSHOT_MANIFEST = os.path.join(logs_dir, "latest.json")
+    nifty_config.GEMINI_LOGS_DIR = os.path.join(workdir, "gemini-logs")
+    nifty_config.AI_TOKEN_USAGE_LOG = os.path.join(workdir, "gemini-logs", "token_usage.jsonl")
+    nifty_config.SNAPSHOT_DB_FILE = os.path.join(workdir, "chain_snapshots.sqlite3")
+    nifty_config.EXPIRY_CACHE_FILE = os.path.join(workdir, "expiry_calendar.json")
+    nifty_config.SESSION_STATE_FILE = os.path.join(workdir, "nse_session_state.json")
+    nifty_config.AI_RESPONSE_CACHE_FILE = os.path.join(workdir, "ai_responses.sqlite3")
+    nifty_config.ENABLE_AI_ANALYSIS = False
+    nifty_config.NSE_RECORD_DIR = None
+    os.makedirs(logs_dir, exist_ok=True)
+    os.makedirs(nifty_config.GEMINI_LOGS_DIR, exist_ok=True)
+
+    import nifty_main, nifty_logger, nifty_manifest, nifty_fetcher, nifty_async_fetcher, nifty_expiry_cache
+    from nifty_store import SnapshotStore
+    global NSE_RECORD_DIR
+
+    nifty_logger.AI_LOGS_DIR = nifty_manifest.AI_LOGS_DIR = logs_dir
+    nifty_logger.HEARTBEAT_FILE = nifty_config.HEARTBEAT_FILE
+    nifty_manifest.LATEST_SNAPSHOT_MANIFEST = nifty_config.LATEST_SNAPSHOT_MANIFEST
+    if nifty_logger._email_snapshot in nifty_logger.SNAPSHOT_SINKS:
+        nifty_logger.SNAPSHOT_SINKS.remove(nifty_logger._email_snapshot)
+
+    nifty_main.ENABLE_AI_ANALYSIS = False
+    if nifty_main.snapshot_store is not None and nifty_main.snapshot_store.path != nifty_config.SNAPSHOT_DB_FILE:
+        nifty_main.snapshot_store.close()
+        nifty_main.snapshot_store = SnapshotStore(nifty_config.SNAPSHOT_DB_FILE)
+
+    if nifty_expiry_cache.expiry_cache.path != nifty_config.EXPIRY_CACHE_FILE:
+        cache = nifty_expiry_cache.ExpiryCalendarCache(nifty_config.EXPIRY_CACHE_FILE)
+        nifty_expiry_cache.expiry_cache = nifty_fetcher.expiry_cache = nifty_async_fetcher.expiry_cache = cache
+    nifty_fetcher.SESSION_STATE_FILE = nifty_config.SESSION_STATE_FILE
+    NSE_RECORD_DIR = None   # Never re-record replayed payloads
+
+def run_benchmark(base_url: str, cycles: int):
+    """Runs data_collection_cycle against the stand-in at base_url, isolated from live logs, email and AI."""
+    import nifty_config
+    nifty_config.NSE_BASE_URL = base_url   # Must be set before nifty_fetcher is first imported
+
+    timings = []
+    with tempfile.TemporaryDirectory(prefix="nifty-bench-") as workdir:
+        _isolate_benchmark(workdir)
+        import nifty_main
+        print(f"🧪 Benchmark output goes to {workdir} (deleted afterwards)")
+        for cycle in range(1, cycles + 1):
+            start = time.perf_counter()
+            ok = nifty_main.data_collection_cycle()
+            timings.append(time.perf_counter() - start)
+            print(f"⏱️ Cycle {cycle}: {timings[-1]:.2f}s ({'ok' if ok else 'failed'})")
+        nifty_main.flush_snapshot_sinks(timeout=30)
+        if nifty_main.snapshot_store is not None:
+            nifty_main.snapshot_store.close()
+
+    timings.sort()
+    print(f"\n📊 {cycles} cycles | min {timings[0]:.2f}s | median {timings[len(timings) // 2]:.2f}s | max {timings[-1]:.2f}s")
+
+def _add_fault_args(parser):
+    parser.add_argument("--dir", required=True, help="Directory of recorded payloads (NSE_RECORD_DIR)")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Fixed delay per request (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra uniform random delay (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--empty-rate", type=float, default=0.0, help="Share of '{}' bodies")
+    parser.add_argument("--zero-spot-rate", type=float, default=0.0, help="Share of underlyingValue == 0 bodies")
+    parser.add_argument("--seed", type=int, default=0)
+
+def _faults_from_args(args) -> FaultProfile:
+    return FaultProfile(args.latency, args.jitter, args.error_rate, args.error_status,
+                        args.empty_rate, args.zero_spot_rate, args.seed)
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded NSE payloads with fault injection.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    _add_fault_args(sub.add_parser("serve", help="Run the stand-in server until Ctrl+C"))
+    bench = sub.add_parser("bench", help="Run data_collection_cycle against an in-process stand-in")
+    _add_fault_args(bench)
+    bench.add_argument("--cycles", type=int, default=5)
+    args = parser.parse_args()
+
+    server, stats = start_server(args.dir, args.port, _faults_from_args(args))
+    base_url = f"http://127.0.0.1:{args.port}"
+    print(f"🧪 NSE stand-in serving {len(server.store.payloads)} payloads at {base_url}")
+
+    try:
+        if args.command == "serve":
+            print(f"   Point the fetcher at it with: NSE_BASE_URL={base_url}")
+            while True:
+                time.sleep(1)
+        else:
+            run_benchmark(base_url, args.cycles)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        print(f"📈 Server stats: {stats}")
+
+if __name__ == "__main__":
+    main()
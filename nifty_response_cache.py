@@ -0,0 +1,109 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+from nifty_config import AI_RESPONSE_CACHE_FILE, AI_RESPONSE_CACHE_TTL, AI_RESPONSE_CACHE_MAX_ENTRIES
+
+# Lines that differ between otherwise identical snapshots: fetch / data timestamps, and the engine
+# report's session clock and its spot-history line (Vector, Prev, Data points move every cycle)
+_VOLATILE_LINES = re.compile(
+    r'^[ \t]*(CURRENT DATA FOR ANALYSIS - FETCHED AT:|DATA TIME:|Time since open:|SPOT=.*Data points=).*$',
+    re.MULTILINE)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key       TEXT PRIMARY KEY,
+    model     TEXT NOT NULL,
+    response  TEXT NOT NULL,
+    usage     TEXT NOT NULL,      -- JSON token counts of the call that produced it
+    created   REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_by_use ON responses (last_used);
+"""
+
+# ---------------------------------------------------------
+# CACHE KEY (Template version + model + normalised data payload)
+# ---------------------------------------------------------
+def template_version(*parts: str) -> str:
+    """Changes whenever the system instruction or the static v15.1 prompt changes."""
+    return hashlib.sha256("\0".join(parts).encode('utf-8')).hexdigest()[:16]
+
+def normalise_payload(data: str) -> str:
+    """Drops timestamps, the engine's session clock and trailing whitespace so identical market data hashes identically."""
+    data = _VOLATILE_LINES.sub("", data)
+    return "\n".join(line.rstrip() for line in data.strip().splitlines())
+
+def response_key(version: str, model: str, data: str, context: str = "") -> str:
+    """`context` covers anything else the answer depends on (e.g. Flash's rolling history)."""
+    digest = hashlib.sha256()
+    for part in (version, model, context, normalise_payload(data)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+# ---------------------------------------------------------
+# RESPONSE CACHE (Persistent SQLite, TTL + size-bounded LRU)
+# ---------------------------------------------------------
+class ResponseCache:
+    """
+    Stored LLM analyses by key. Entries older than `ttl` seconds are misses (and deleted);
+    beyond `max_entries` the least recently used are evicted.
+    """
+
+    def __init__(self, path: str = AI_RESPONSE_CACHE_FILE, ttl: float = AI_RESPONSE_CACHE_TTL,
+                 max_entries: int = AI_RESPONSE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, keys: list):
+        """
+        First live entry among `keys` (in priority order) as (model, response, usage, age_seconds),
+        or None. Counts one hit or one miss per lookup.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            for key in keys:
+                row = self._conn.execute("SELECT model, response, usage, created FROM responses WHERE key = ?",
+                                         (key,)).fetchone()
+                if row is None:
+                    continue
+                if now - row[3] > self.ttl:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    continue
+                self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                self.hits += 1
+                model, response, usage, created = row
+                return model, response, json.loads(usage), now - created
+            self.misses += 1
+        return None
+
+    def put(self, key: str, model: str, response: str, usage: dict) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                               (key, model, response, json.dumps(usage), now, now))
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM responses WHERE key NOT IN "
+                "(SELECT key FROM responses ORDER BY last_used DESC LIMIT ?)", (self.max_entries,))
+
+    def stats(self) -> str:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return f"{self.hits} hits / {self.misses} misses | {size} stored"
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,212 @@
+import os
+import re
+import gzip
+import json
+import time
+import hashlib
+import argparse
+import datetime
+
+from nifty_config import (
+    AI_LOGS_DIR, GEMINI_LOGS_DIR, ARCHIVE_DIR, LATEST_SNAPSHOT_MANIFEST,
+    LOG_ARCHIVE_AFTER_DAYS, LOG_RETENTION_DAYS, LOG_ARCHIVE_MAX_MB
+)
+
+# Matches the *_%d_%m_%Y_%H_%M_%S.txt names written by nifty_logger / nifty_ai
+_STAMP = re.compile(r'_(\d{2})_(\d{2})_(\d{4})_\d{2}_\d{2}_\d{2}\.txt$')
+_TEMPLATES_DIR = os.path.join(ARCHIVE_DIR, "templates")
+
+# ---------------------------------------------------------
+# PROMPT TEMPLATES (Stored once, referenced by hash)
+# ---------------------------------------------------------
+def template_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+def _store_template(text: str) -> str:
+    digest = template_hash(text)
+    path = os.path.join(_TEMPLATES_DIR, f"{digest}.txt")
+    if not os.path.exists(path):
+        os.makedirs(_TEMPLATES_DIR, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    return digest
+
+def _load_template(digest: str) -> str:
+    with open(os.path.join(_TEMPLATES_DIR, f"{digest}.txt"), 'r', encoding='utf-8') as f:
+        return f.read()
+
+def _split_template(content: str, templates: list):
+    """(template_hash, body) when content starts with a known template, else (None, content)."""
+    for template in templates:
+        if template and content.startswith(template):
+            return _store_template(template), content[len(template):]
+    return None, content
+
+# ---------------------------------------------------------
+# DAILY ARCHIVES (<ARCHIVE_DIR>/<log dir>/<YYYY-MM-DD>.jsonl.gz, one JSON record per file)
+# ---------------------------------------------------------
+def _file_date(name: str, path: str) -> datetime.date:
+    match = _STAMP.search(name)
+    if match:
+        day, month, year = (int(g) for g in match.groups())
+        try:
+            return datetime.date(year, month, day)
+        except ValueError:
+            pass
+    return datetime.date.fromtimestamp(os.path.getmtime(path))
+
+def _archive_path(source_dir: str, day: datetime.date) -> str:
+    return os.path.join(ARCHIVE_DIR, os.path.basename(source_dir.rstrip(os.sep)), f"{day.isoformat()}.jsonl.gz")
+
+def _protected_files() -> set:
+    """Never archive the file the latest-snapshot manifest points at."""
+    try:
+        with open(LATEST_SNAPSHOT_MANIFEST, 'r', encoding='utf-8') as f:
+            return {json.load(f).get("file")}
+    except (OSError, ValueError, AttributeError):
+        return set()
+
+def archive_directory(source_dir: str, templates: list = (), older_than_days: int = LOG_ARCHIVE_AFTER_DAYS,
+                      today: datetime.date = None) -> dict:
+    """
+    Moves *.txt files dated before (today - older_than_days) into per-day gzip archives.
+    Gzip members are appended, so an archive grows across runs without being rewritten.
+    """
+    today = today or datetime.date.today()
+    cutoff = today - datetime.timedelta(days=older_than_days)
+    protected = _protected_files()
+    stats = {"archived": 0, "bytes_in": 0, "bytes_out": 0}
+    if not os.path.isdir(source_dir):
+        return stats
+
+    by_day = {}
+    for name in sorted(os.listdir(source_dir)):
+        path = os.path.join(source_dir, name)
+        if not name.endswith(".txt") or name in protected or not os.path.isfile(path):
+            continue
+        day = _file_date(name, path)
+        if day < cutoff:
+            by_day.setdefault(day, []).append((name, path))
+
+    for day, files in by_day.items():
+        archive = _archive_path(source_dir, day)
+        os.makedirs(os.path.dirname(archive), exist_ok=True)
+        before = os.path.getsize(archive) if os.path.exists(archive) else 0
+        with gzip.open(archive, 'at', encoding='utf-8', compresslevel=9) as gz:
+            for name, path in files:
+                with open(path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+                digest, body = _split_template(content, templates)
+                gz.write(json.dumps({"name": name, "mtime": os.path.getmtime(path),
+                                     "template": digest, "body": body}) + "\n")
+                stats["bytes_in"] += len(content.encode('utf-8'))
+        stats["bytes_out"] += os.path.getsize(archive) - before
+        for _, path in files:
+            os.remove(path)
+        stats["archived"] += len(files)
+    return stats
+
+def prune_archives(max_age_days: int = LOG_RETENTION_DAYS, max_total_mb: float = LOG_ARCHIVE_MAX_MB,
+                   today: datetime.date = None) -> int:
+    """Deletes daily archives older than max_age_days, then oldest-first until under max_total_mb."""
+    today = today or datetime.date.today()
+    archives = []
+    for root, _, names in os.walk(ARCHIVE_DIR):
+        for name in names:
+            if name.endswith(".jsonl.gz"):
+                try:
+                    day = datetime.date.fromisoformat(name[:-len(".jsonl.gz")])
+                except ValueError:
+                    continue
+                path = os.path.join(root, name)
+                archives.append((day, path, os.path.getsize(path)))
+    archives.sort()
+
+    removed = 0
+    total = sum(size for _, _, size in archives)
+    limit = max_total_mb * 1024 * 1024
+    for day, path, size in archives:
+        if (today - day).days > max_age_days or total > limit:
+            os.remove(path)
+            total -= size
+            removed += 1
+    return removed
+
+# ---------------------------------------------------------
+# REHYDRATION (Any archived file back to its exact original text)
+# ---------------------------------------------------------
+def _candidate_archives(name: str):
+    match = _STAMP.search(name)
+    if match:
+        day, month, year = (int(g) for g in match.groups())
+        for source_dir in (AI_LOGS_DIR, GEMINI_LOGS_DIR):
+            try:
+                yield _archive_path(source_dir, datetime.date(year, month, day))
+            except ValueError:
+                break
+    for root, _, names in os.walk(ARCHIVE_DIR):   # Recovery: name without a parsable date
+        for archive in sorted(names):
+            if archive.endswith(".jsonl.gz"):
+                yield os.path.join(root, archive)
+
+def read_archived(name: str) -> str:
+    """Original content of an archived log file. Raises FileNotFoundError if no archive holds it."""
+    for archive in _candidate_archives(name):
+        if not os.path.exists(archive):
+            continue
+        with gzip.open(archive, 'rt', encoding='utf-8') as gz:
+            for line in gz:
+                record = json.loads(line)
+                if record["name"] == name:
+                    template = _load_template(record["template"]) if record["template"] else ""
+                    return template + record["body"]
+    raise FileNotFoundError(f"{name} is not in any archive under {ARCHIVE_DIR}")
+
+def rehydrate(name: str, dest_dir: str = None) -> str:
+    """Writes an archived file back to disk (its original log directory by default). Returns the path."""
+    if dest_dir is None:
+        dest_dir = GEMINI_LOGS_DIR if name.startswith("ai_analysis_") else AI_LOGS_DIR
+    path = os.path.join(dest_dir, name)
+    content = read_archived(name)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    return path
+
+# ---------------------------------------------------------
+# ENTRY POINT (Called from nifty_main once per day)
+# ---------------------------------------------------------
+def run_retention(templates: list = ()) -> None:
+    start = time.perf_counter()
+    try:
+        query_stats = archive_directory(AI_LOGS_DIR, templates)
+        analysis_stats = archive_directory(GEMINI_LOGS_DIR)
+        pruned = prune_archives()
+    except Exception as e:
+        print(f"⚠️ Log retention failed: {e}")
+        return
+    archived = query_stats["archived"] + analysis_stats["archived"]
+    bytes_in = query_stats["bytes_in"] + analysis_stats["bytes_in"]
+    bytes_out = query_stats["bytes_out"] + analysis_stats["bytes_out"]
+    if archived or pruned:
+        print(f"🗜️ Log retention: archived {archived} files ({bytes_in / 1024:.0f} KB → {bytes_out / 1024:.0f} KB), "
+              f"pruned {pruned} old archives in {time.perf_counter() - start:.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive, prune and rehydrate ai-query / gemini logs.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("run", help="Archive old logs and prune archives now")
+    restore = sub.add_parser("rehydrate", help="Restore an archived file by name")
+    restore.add_argument("name")
+    restore.add_argument("--dest", help="Directory to write to (default: its original log directory)")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        from nifty_logger import STATIC_PROMPTS
+        run_retention(STATIC_PROMPTS)
+    else:
+        print(f"✅ Restored {rehydrate(args.name, args.dest)}")
+
+if __name__ == "__main__":
+    main()
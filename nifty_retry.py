@@ -0,0 +1,247 @@
+import time
+import random
+import threading
+from urllib.parse import urlsplit
+
+from nifty_config import (
+    RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY,
+    CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT
+)
+
+# ---------------------------------------------------------
+# ERROR CLASSES (What went wrong decides how we retry)
+# ---------------------------------------------------------
+class FetchError(Exception):
+    """Base class for NSE request failures."""
+    kind = "transient"
+
+class SessionRejected(FetchError):
+    """NSE refused the session cookies (HTTP 401/403). Retry only after re-harvesting."""
+    kind = "auth"
+
+class EmptyPayload(FetchError):
+    """NSE answered 200 with '{}' or underlyingValue == 0, which it does while throttling."""
+    kind = "empty"
+
+class HTTPStatusError(FetchError):
+    """Non-OK status other than 401/403. 5xx and 429 are transient, other 4xx are permanent."""
+
+    def __init__(self, status: int):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.kind = "transient" if status >= 500 or status == 429 else "permanent"
+
+class CircuitOpenError(FetchError):
+    """The endpoint's circuit is open; the request was not sent."""
+    kind = "circuit_open"
+
+def classify(error: Exception) -> str:
+    """Map any exception to 'auth', 'empty', 'transient', 'permanent' or 'circuit_open'."""
+    if isinstance(error, FetchError):
+        return error.kind
+    return "transient"  # Timeouts, connection resets, truncated JSON, Playwright errors
+
+# ---------------------------------------------------------
+# RETRY POLICY (Exponential backoff + full jitter, per error class)
+# ---------------------------------------------------------
+class RetryPolicy:
+    """
+    Decides whether and how long to wait before the next attempt.
+    `rules` maps an error kind to (max_retries, base_delay); kinds missing from it are not retried.
+    `jitter` is the share of each delay that is randomised (1.0 = full jitter, 0 = none).
+    """
+
+    def __init__(self, max_attempts: int = RETRY_MAX_ATTEMPTS, base_delay: float = RETRY_BASE_DELAY,
+                 max_delay: float = RETRY_MAX_DELAY, jitter: float = 1.0, rules: dict = None,
+                 rng: random.Random = None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.rules = rules if rules is not None else {
+            "auth":      (2, 0.0),                       # Re-harvest cookies, then go again straight away
+            "empty":     (max_attempts, base_delay * 4),  # Throttling: back off harder, same session
+            "transient": (max_attempts, base_delay),
+        }
+        self._rng = rng or random.Random()
+
+    def backoff(self, attempt: int, base_delay: float = None) -> float:
+        """Exponential backoff capped at max_delay, with the top `jitter` share of it randomised."""
+        base = self.base_delay if base_delay is None else base_delay
+        ceiling = min(self.max_delay, base * (2 ** (attempt - 1)))
+        return ceiling * (1 - self.jitter * self._rng.random())
+
+    def next_delay(self, kind: str, attempt: int, kind_count: int):
+        """
+        Seconds to sleep before attempt `attempt + 1`, or None to give up.
+        kind_count is how many times this error kind has been seen so far in the call.
+        """
+        rule = self.rules.get(kind)
+        if rule is None or attempt >= self.max_attempts:
+            return None
+        max_retries, base_delay = rule
+        if kind_count > max_retries:
+            return None
+        return self.backoff(kind_count, base_delay)
+
+RETRY_POLICY = RetryPolicy()
+
+# ---------------------------------------------------------
+# CIRCUIT BREAKER (Per endpoint: closed -> open -> half-open -> closed)
+# ---------------------------------------------------------
+class CircuitBreaker:
+    """Fails fast after repeated endpoint failures; after reset_timeout one probe request is let through."""
+
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_TIMEOUT, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def before_call(self):
+        """Raises CircuitOpenError unless the request may go out."""
+        with self._lock:
+            if self.state == "closed":
+                return
+            if self.state == "open":
+                if self._clock() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError(f"circuit '{self.name}' open, retry in {self.retry_in():.0f}s")
+                self.state = "half_open"
+                print(f"🟡 Circuit '{self.name}' half-open, sending probe request")
+            if self._probe_in_flight:
+                raise CircuitOpenError(f"circuit '{self.name}' half-open, probe in flight")
+            self._probe_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                print(f"🟢 Circuit '{self.name}' closed")
+            self.state = "closed"
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self, kind: str):
+        """
+        Called once per request that gave up, not per attempt. Auth errors are the session's fault
+        (fixed by re-harvesting), permanent errors (e.g. a symbol without F&O) and empty payloads
+        (an illiquid stock, '{}' for one symbol) say nothing about the endpoint every symbol shares,
+        so none of them counts towards opening the circuit.
+        """
+        if kind in ("auth", "permanent", "empty", "circuit_open", "cancelled"):
+            with self._lock:
+                self._probe_in_flight = False
+            return
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"🔴 Circuit '{self.name}' open after {self.failures} failures "
+                          f"(failing fast for {self.reset_timeout:.0f}s)")
+                self.state = "open"
+                self.opened_at = self._clock()
+            self._probe_in_flight = False
+
+    def retry_in(self) -> float:
+        """Seconds until an open circuit allows its half-open probe (0 when not open)."""
+        if self.state != "open":
+            return 0.0
+        return max(0.0, self.reset_timeout - (self._clock() - self.opened_at))
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def endpoint_name(url: str) -> str:
+    """'https://www.nseindia.com/api/option-chain-v3?...' -> 'option-chain-v3'."""
+    return urlsplit(url).path.rstrip('/').rsplit('/', 1)[-1] or "root"
+
+def breaker_for(url: str) -> CircuitBreaker:
+    name = endpoint_name(url)
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+def circuit_status() -> dict:
+    """{endpoint: state} for every endpoint seen so far."""
+    with _breakers_lock:
+        return {name: breaker.state for name, breaker in _breakers.items()}
+
+def max_circuit_wait() -> float:
+    """Longest time any open circuit still needs before it will accept a probe."""
+    with _breakers_lock:
+        return max((breaker.retry_in() for breaker in _breakers.values()), default=0.0)
+
+# ---------------------------------------------------------
+# EXECUTION (Sync and asyncio share the same decisions)
+# ---------------------------------------------------------
+# The breaker judges whole requests: it is asked once before the first attempt and told the
+# outcome once, so a single flaky request can never trip it with its own retries.
+def _after_failure(url, policy, attempt, counts, error):
+    kind = classify(error)
+    counts[kind] = counts.get(kind, 0) + 1
+    delay = policy.next_delay(kind, attempt, counts[kind])
+    if delay is None:
+        if isinstance(error, FetchError):
+            raise error
+        raise FetchError(f"Failed to fetch {url} after {attempt} attempts: {error}") from error
+    return kind, delay
+
+def call_with_retry(url: str, attempt_fn, policy: RetryPolicy = None, on_error=None):
+    """
+    Runs attempt_fn() under the endpoint's circuit breaker and the retry policy.
+    on_error(kind, error) runs before each backoff sleep (e.g. to re-harvest cookies on 'auth').
+    """
+    policy = policy or RETRY_POLICY
+    breaker = breaker_for(url)
+    breaker.before_call()
+    counts = {}
+    try:
+        for attempt in range(1, policy.max_attempts + 1):
+            try:
+                result = attempt_fn()
+            except Exception as e:
+                kind, delay = _after_failure(url, policy, attempt, counts, e)
+                if on_error:
+                    on_error(kind, e)
+                if delay:
+                    time.sleep(delay)
+                continue
+            breaker.record_success()
+            return result
+        raise FetchError(f"Failed to fetch {url} after {policy.max_attempts} attempts")
+    except Exception as e:
+        breaker.record_failure(classify(e))
+        raise
+
+async def async_call_with_retry(url: str, attempt_coro_fn, policy: RetryPolicy = None):
+    """asyncio twin of call_with_retry; attempt_coro_fn() must return a fresh awaitable each time."""
+    import asyncio
+
+    policy = policy or RETRY_POLICY
+    breaker = breaker_for(url)
+    breaker.before_call()
+    counts = {}
+    try:
+        for attempt in range(1, policy.max_attempts + 1):
+            try:
+                result = await attempt_coro_fn()
+            except Exception as e:
+                _, delay = _after_failure(url, policy, attempt, counts, e)
+                if delay:
+                    await asyncio.sleep(delay)
+                continue
+            breaker.record_success()
+            return result
+        raise FetchError(f"Failed to fetch {url} after {policy.max_attempts} attempts")
+    except asyncio.CancelledError:
+        breaker.record_failure("cancelled")  # Frees a half-open probe without blaming the endpoint
+        raise
+    except Exception as e:
+        breaker.record_failure(classify(e))
+        raise
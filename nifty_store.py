@@ -0,0 +1,201 @@
+import os
+import time
+import sqlite3
+import argparse
+import threading
+from typing import List, Optional, Tuple
+
+from nifty_config import SNAPSHOT_DB_FILE, SNAPSHOT_RETENTION_DAYS
+from nifty_chain import OptionChain, FIELDS
+
+# ---------------------------------------------------------
+# SCHEMA (One row per snapshot, one row per strike per snapshot)
+# ---------------------------------------------------------
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS snapshots (
+    id          INTEGER PRIMARY KEY,
+    ts          REAL NOT NULL,          -- Unix seconds of the fetch
+    symbol      TEXT NOT NULL,
+    expiry      TEXT NOT NULL,
+    spot        REAL NOT NULL,
+    fingerprint TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_by_symbol ON snapshots (symbol, expiry, ts);
+CREATE INDEX IF NOT EXISTS snapshots_by_time ON snapshots (ts);
+
+CREATE TABLE IF NOT EXISTS strikes (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots(id),
+    strike      REAL NOT NULL,
+    {", ".join(f"{name} {'REAL' if name.endswith(('_ltp', '_iv')) else 'INTEGER'} NOT NULL" for name in FIELDS)},
+    PRIMARY KEY (snapshot_id, strike)
+) WITHOUT ROWID;
+"""
+
+_STRIKE_COLUMNS = ("strike",) + FIELDS
+_INSERT_STRIKES = (f"INSERT INTO strikes (snapshot_id, {', '.join(_STRIKE_COLUMNS)}) "
+                   f"VALUES (?, {', '.join('?' * len(_STRIKE_COLUMNS))})")
+
+# ---------------------------------------------------------
+# SNAPSHOT STORE (Append-only SQLite, indexed by time / symbol / expiry / strike)
+# ---------------------------------------------------------
+class SnapshotStore:
+    """
+    Append-only history of every parsed chain. A chain identical to the last one stored for the
+    same symbol/expiry is skipped (the gap in timestamps already says nothing changed).
+    """
+
+    def __init__(self, path: str = SNAPSHOT_DB_FILE):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._last_fingerprint = {}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ---------------------------------------------------------
+    # WRITES
+    # ---------------------------------------------------------
+    def _last_stored(self, symbol: str, expiry: str) -> Optional[str]:
+        key = (symbol, expiry)
+        if key not in self._last_fingerprint:
+            row = self._conn.execute(
+                "SELECT fingerprint FROM snapshots WHERE symbol = ? AND expiry = ? ORDER BY ts DESC LIMIT 1",
+                key).fetchone()
+            self._last_fingerprint[key] = row[0] if row else None
+        return self._last_fingerprint[key]
+
+    def append(self, chain: OptionChain, ts: float = None) -> Optional[int]:
+        """Stores every strike of the chain. Returns the snapshot id, or None if unchanged / empty."""
+        if chain is None or not len(chain):
+            return None
+        ts = time.time() if ts is None else ts
+        fingerprint = chain.fingerprint()
+        with self._lock:
+            if self._last_stored(chain.symbol, chain.expiry_date) == fingerprint:
+                return None
+            columns = [chain.strike_price.tolist()] + [getattr(chain, name).tolist() for name in FIELDS]
+            with self._conn:
+                snapshot_id = self._conn.execute(
+                    "INSERT INTO snapshots (ts, symbol, expiry, spot, fingerprint) VALUES (?, ?, ?, ?, ?)",
+                    (ts, chain.symbol, chain.expiry_date, float(chain.underlying_value), fingerprint)).lastrowid
+                self._conn.executemany(_INSERT_STRIKES, ((snapshot_id,) + row for row in zip(*columns)))
+            self._last_fingerprint[(chain.symbol, chain.expiry_date)] = fingerprint
+            return snapshot_id
+
+    def append_cycle(self, chains: List[OptionChain], ts: float = None) -> int:
+        """
+        Stores one fetch cycle's chains under a single timestamp. Returns how many were new.
+        Each chain is its own transaction, so one bad chain (e.g. duplicate strikes) doesn't lose the rest.
+        """
+        ts = time.time() if ts is None else ts
+        stored = 0
+        for chain in chains:
+            try:
+                stored += self.append(chain, ts) is not None
+            except sqlite3.Error as e:
+                print(f"⚠️ Snapshot store skipped {chain.symbol} {chain.expiry_date}: {e}")
+        return stored
+
+    # ---------------------------------------------------------
+    # RETENTION
+    # ---------------------------------------------------------
+    def prune(self, max_age_days: float = SNAPSHOT_RETENTION_DAYS, now: float = None) -> int:
+        """Deletes snapshots older than max_age_days and VACUUMs the file. Returns how many were removed."""
+        cutoff = (time.time() if now is None else now) - max_age_days * 86400
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM strikes WHERE snapshot_id IN (SELECT id FROM snapshots WHERE ts < ?)",
+                                   (cutoff,))
+                removed = self._conn.execute("DELETE FROM snapshots WHERE ts < ?", (cutoff,)).rowcount
+            self._conn.execute("VACUUM")
+            self._last_fingerprint.clear()
+            return removed
+
+    # ---------------------------------------------------------
+    # RANGE READS
+    # ---------------------------------------------------------
+    def snapshots(self, symbol: str, expiry: str = None, start: float = None,
+                  end: float = None) -> List[Tuple[int, float, str, float]]:
+        """[(id, ts, expiry, spot)] for a symbol in [start, end], oldest first."""
+        sql = "SELECT id, ts, expiry, spot FROM snapshots WHERE symbol = ?"
+        args = [symbol]
+        if expiry is not None:
+            sql += " AND expiry = ?"
+            args.append(expiry)
+        if start is not None:
+            sql += " AND ts >= ?"
+            args.append(start)
+        if end is not None:
+            sql += " AND ts <= ?"
+            args.append(end)
+        with self._lock:
+            return self._conn.execute(sql + " ORDER BY ts", args).fetchall()
+
+    def read_chain(self, snapshot_id: int, strike_min: float = None, strike_max: float = None) -> OptionChain:
+        """One stored snapshot back as an OptionChain, optionally limited to a strike range."""
+        with self._lock:
+            head = self._conn.execute("SELECT symbol, expiry, spot FROM snapshots WHERE id = ?",
+                                      (snapshot_id,)).fetchone()
+            if head is None:
+                raise KeyError(snapshot_id)
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_STRIKE_COLUMNS)} FROM strikes WHERE snapshot_id = ? "
+                f"AND strike BETWEEN ? AND ? ORDER BY strike",
+                (snapshot_id, float('-inf') if strike_min is None else strike_min,
+                 float('inf') if strike_max is None else strike_max)).fetchall()
+        columns = dict(zip(_STRIKE_COLUMNS, (list(c) for c in zip(*rows)))) if rows else \
+            {name: [] for name in _STRIKE_COLUMNS}
+        columns["strike_price"] = columns.pop("strike")
+        symbol, expiry, spot = head
+        return OptionChain.from_columns(symbol, spot, expiry, columns)
+
+    def read_range(self, symbol: str, expiry: str = None, start: float = None, end: float = None,
+                   strike_min: float = None, strike_max: float = None) -> List[Tuple[float, OptionChain]]:
+        """[(ts, OptionChain)] for every stored snapshot in the range."""
+        return [(ts, self.read_chain(snapshot_id, strike_min, strike_max))
+                for snapshot_id, ts, _, _ in self.snapshots(symbol, expiry, start, end)]
+
+    def series(self, symbol: str, strike: float, field: str, expiry: str = None,
+               start: float = None, end: float = None) -> List[Tuple[float, float]]:
+        """[(ts, value)] of one field at one strike over time, e.g. ('NIFTY', 24500, 'pe_change_oi')."""
+        if field not in FIELDS:
+            raise ValueError(f"Unknown field: {field}")
+        sql = (f"SELECT s.ts, k.{field} FROM snapshots s JOIN strikes k ON k.snapshot_id = s.id "
+               f"WHERE s.symbol = ? AND k.strike = ?")
+        args = [symbol, float(strike)]
+        if expiry is not None:
+            sql += " AND s.expiry = ?"
+            args.append(expiry)
+        if start is not None:
+            sql += " AND s.ts >= ?"
+            args.append(start)
+        if end is not None:
+            sql += " AND s.ts <= ?"
+            args.append(end)
+        with self._lock:
+            return self._conn.execute(sql + " ORDER BY s.ts", args).fetchall()
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the chain snapshot store.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    prune = sub.add_parser("prune", help="Delete old snapshots and VACUUM the store")
+    prune.add_argument("--days", type=float, default=SNAPSHOT_RETENTION_DAYS)
+    prune.add_argument("--db", default=SNAPSHOT_DB_FILE)
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.db)
+    try:
+        removed = store.prune(args.days)
+    finally:
+        store.close()
+    print(f"🗄️ Snapshot store: pruned {removed} snapshots older than {args.days:g} days "
+          f"({os.path.getsize(args.db) / 1024:.0f} KB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import math
+import datetime
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from nifty_config import (
+    ENABLE_ADAPTIVE_WINDOW, STRIKE_WINDOW_POINTS, STRIKE_WINDOW_COVERAGE, STRIKE_WINDOW_SIGMA,
+    STRIKE_WINDOW_MIN_STRIKES, STRIKE_WINDOW_MAX_STRIKES
+)
+from nifty_chain import OptionChain
+from nifty_expiry_cache import IST, parse_expiry
+
+# Static OI counts fully from this many DTE; on expiry day only volume and Chg OI mark live strikes
+_OI_FULL_WEIGHT_DTE = 7
+
+@dataclass
+class StrikeWindow:
+    """Contiguous strike range [low, high] around `atm` chosen for display and the AI query."""
+    atm: float
+    low: float
+    high: float
+    coverage: float             # Share of the chain's activity inside the window
+    expected_move: Optional[float]
+    dte: Optional[int]
+
+    def apply(self, chain: OptionChain) -> OptionChain:
+        return chain.take((chain.strike_price >= self.low) & (chain.strike_price <= self.high))
+
+    def describe(self) -> str:
+        move = "n/a" if self.expected_move is None else f"±{self.expected_move:.0f}"
+        dte = "NA" if self.dte is None else self.dte
+        return (f"{self.low:g}-{self.high:g} (ATM {self.atm:g}, {self.coverage:.0%} of activity, "
+                f"expected move {move}, DTE {dte})")
+
+# ---------------------------------------------------------
+# INPUTS (Activity per strike, ATM IV, days to expiry)
+# ---------------------------------------------------------
+def _share(values: np.ndarray) -> np.ndarray:
+    total = values.sum()
+    return values / total if total > 0 else np.zeros(len(values))
+
+def strike_activity(chain: OptionChain, dte: Optional[int] = None) -> np.ndarray:
+    """Per-strike share of OI, volume and |Chg OI| (OI down-weighted as expiry approaches)."""
+    oi_weight = 1.0 if dte is None else min(dte, _OI_FULL_WEIGHT_DTE) / _OI_FULL_WEIGHT_DTE
+    oi = (chain.ce_oi + chain.pe_oi).astype(float)
+    volume = (chain.ce_volume + chain.pe_volume).astype(float)
+    change = (np.abs(chain.ce_change_oi) + np.abs(chain.pe_change_oi)).astype(float)
+    return oi_weight * _share(oi) + _share(volume) + _share(change)
+
+def _days_to_expiry(chain: OptionChain, today: datetime.date = None) -> Optional[int]:
+    expiry = parse_expiry(chain.expiry_date)
+    if expiry is None:
+        return None
+    return max((expiry - (today or datetime.datetime.now(IST).date())).days, 0)
+
+def expected_move(chain: OptionChain, atm: float, dte: Optional[int], sigma: float = STRIKE_WINDOW_SIGMA):
+    """sigma x spot x ATM IV x sqrt(DTE / 365), at least half a day on expiry day. None without IV / DTE."""
+    i = chain.index_of(atm)
+    if i is None or dte is None:
+        return None
+    ivs = [iv for iv in (chain.ce_iv[i].item(), chain.pe_iv[i].item()) if iv > 0]
+    if not ivs:
+        return None
+    iv = sum(ivs) / len(ivs) / 100
+    return sigma * chain.underlying_value * iv * math.sqrt(max(dte, 0.5) / 365)
+
+# ---------------------------------------------------------
+# SELECTION
+# ---------------------------------------------------------
+def select_window(chain: OptionChain, coverage: float = STRIKE_WINDOW_COVERAGE,
+                  min_strikes: int = STRIKE_WINDOW_MIN_STRIKES, max_strikes: int = STRIKE_WINDOW_MAX_STRIKES,
+                  today: datetime.date = None, min_points: float = 0) -> StrikeWindow:
+    """
+    Smallest contiguous run of strikes around ATM holding `coverage` of the chain's activity, grown
+    greedily towards the busier neighbour, then widened to the IV-based expected range. Always keeps
+    `min_strikes` and at most `max_strikes` per side of ATM; zero-activity strikes are trimmed off
+    the edges. Works on any strike spacing (NIFTY 50, BANKNIFTY 100, stocks).
+    min_points keeps at least ATM +/- that many points regardless of the other bounds (a reader that
+    scans a fixed range, e.g. the SYSTEM_PROMPT's ATM_EXTENDED, must get all of it).
+    """
+    dte = _days_to_expiry(chain, today)
+    step = chain.strike_step()
+    atm = chain.atm_strike(step)
+
+    if not ENABLE_ADAPTIVE_WINDOW or len(chain) < 2:
+        half_width = max(STRIKE_WINDOW_POINTS, min_points)
+        return StrikeWindow(atm, atm - half_width, atm + half_width, 1.0, None, dte)
+
+    order = np.argsort(chain.strike_price)
+    strikes = chain.strike_price[order]
+    activity = strike_activity(chain, dte)[order]
+    n = len(strikes)
+    centre = int(np.argmin(np.abs(strikes - atm)))
+
+    # 1. Coverage: grow towards whichever neighbour carries more activity
+    lo = hi = centre
+    covered, target = activity[centre], coverage * activity.sum()
+    while covered < target and (lo > 0 or hi < n - 1):
+        take_low = hi == n - 1 or (lo > 0 and activity[lo - 1] >= activity[hi + 1])
+        if take_low:
+            lo -= 1
+            covered += activity[lo]
+        else:
+            hi += 1
+            covered += activity[hi]
+
+    # 2. Expected range from ATM IV and DTE
+    move = expected_move(chain, atm, dte)
+    if move is not None:
+        lo = min(lo, int(np.searchsorted(strikes, atm - move, side='left')))
+        hi = max(hi, int(np.searchsorted(strikes, atm + move, side='right')) - 1)
+
+    # 3. Per-side bounds (the min_points range beats max_strikes), then drop dead edge strikes
+    lo_floor, hi_floor = centre - min_strikes, centre + min_strikes
+    if min_points:
+        lo_floor = min(lo_floor, int(np.searchsorted(strikes, atm - min_points, side='left')))
+        hi_floor = max(hi_floor, int(np.searchsorted(strikes, atm + min_points, side='right')) - 1)
+    lo = max(min(lo, lo_floor), min(centre - max_strikes, lo_floor), 0)
+    hi = min(max(hi, hi_floor), max(centre + max_strikes, hi_floor), n - 1)
+    while lo < lo_floor and activity[lo] == 0:
+        lo += 1
+    while hi > hi_floor and activity[hi] == 0:
+        hi -= 1
+
+    total = activity.sum()
+    share = float(activity[lo:hi + 1].sum() / total) if total > 0 else 1.0
+    return StrikeWindow(atm, float(strikes[lo]), float(strikes[hi]), share, move, dte)
@@ -1,10 +1,14 @@
+import time
+import threading
 import requests
 import urllib3
-from nifty_config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID
+from nifty_config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, TELEGRAM_EDIT_INTERVAL
 
 # Disable SSL warnings for the Telegram API call
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+MAX_MESSAGE_LENGTH = 4000  # Safe buffer below Telegram's strict 4096 limit
+
 def send_telegram_message(text: str) -> bool:
     """
     Sends a formatted message to Telegram. 
@@ -16,10 +20,10 @@ def send_telegram_message(text: str) -> bool:
         return False
 
     # 2. Markdown Cleanup (Prevents Telegram 400 Bad Request Parse Errors)
-    clean_text = text.replace('**', '*').replace('##', '')
+    clean_text = _clean(text)
     
     # 3. Size Limit Handler
-    max_length = 4000  # Safe buffer below Telegram's strict 4096 limit
+    max_length = MAX_MESSAGE_LENGTH
     
     if len(clean_text) <= max_length:
         return _send_chunk(clean_text)
@@ -48,6 +52,9 @@ def send_telegram_message(text: str) -> bool:
                 
         return success
 
+def _clean(text: str) -> str:
+    return text.replace('**', '*').replace('##', '')
+
 def _send_chunk(text: str) -> bool:
     """Internal helper to send a single validated payload to Telegram."""
     url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
@@ -69,4 +76,112 @@ def _send_chunk(text: str) -> bool:
             return False
     except Exception as e:
         print(f"❌ Failed to send Telegram message: {e}")
-        return False
\ No newline at end of file
+        return False
+
+# ---------------------------------------------------------
+# LIVE MESSAGES (Send once, then edit in place while the AI streams)
+# ---------------------------------------------------------
+def _api(method: str, payload: dict):
+    """POSTs to a Bot API method. Returns the decoded JSON body, or None on a network error."""
+    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/{method}"
+    try:
+        response = requests.post(url, json={"chat_id": TELEGRAM_CHAT_ID, **payload}, verify=False, timeout=15)
+        return response.json()
+    except Exception as e:
+        print(f"❌ Telegram {method} failed: {e}")
+        return None
+
+def send_live_message(text: str):
+    """Sends a message that will be edited later. Returns its message_id, or None."""
+    body = _api("sendMessage", {"text": text})
+    if body and body.get("ok"):
+        return body["result"]["message_id"]
+    print(f"⚠️ Telegram live message not sent: {body}")
+    return None
+
+def edit_live_message(message_id: int, text: str) -> bool:
+    body = _api("editMessageText", {"message_id": message_id, "text": text})
+    if body and (body.get("ok") or "message is not modified" in body.get("description", "")):
+        return True
+    print(f"⚠️ Telegram edit failed: {body}")
+    return False
+
+def strategy_snippet(text: str, markers: tuple, max_lines: int = 50):
+    """(lines from the first marker line on, found?) - the opening lines when no marker is present."""
+    lines = text.split('\n')
+    for i, line in enumerate(lines):
+        upper_line = line.upper()
+        if any(marker in upper_line for marker in markers):
+            return "\n".join(lines[i:i + max_lines]), True
+    return "\n".join(lines[:max_lines]), False
+
+# ---------------------------------------------------------
+# STREAMING (One live message per AI cycle, owned by the first provider to reach the strategy)
+# ---------------------------------------------------------
+class TelegramStream:
+    """
+    Pushes the actionable section of a streaming AI answer to Telegram as soon as it appears,
+    then edits that one message in place (at most every `interval` seconds) as text arrives.
+    With hedged requests the first provider to reach the section owns the message; finish()
+    writes the winning answer's final snippet into it (or sends normally if nothing went live).
+    """
+
+    def __init__(self, markers: tuple, interval: float = TELEGRAM_EDIT_INTERVAL):
+        self.markers = markers
+        self.interval = interval
+        self.enabled = bool(TELEGRAM_BOT_TOKEN) and "YOUR_" not in TELEGRAM_BOT_TOKEN
+        self.owner = None
+        self.message_id = None
+        self.closed = False
+        self.last_edit = 0.0
+        self._lock = threading.Lock()
+
+    def _render(self, model: str, snippet: str, live: bool) -> str:
+        header = f"🤖 {model} Strategy Update{' (live…)' if live else ''}:\n\n"
+        text = _clean(header + snippet)
+        return text if len(text) <= MAX_MESSAGE_LENGTH else text[:MAX_MESSAGE_LENGTH].rsplit('\n', 1)[0]
+
+    def feed(self, model: str, text: str) -> None:
+        """Called with the accumulated answer so far by each streaming provider."""
+        if not self.enabled or self.closed or self.owner not in (None, model):
+            return
+        snippet, found = strategy_snippet(text, self.markers)
+        if not found or time.monotonic() - self.last_edit < self.interval:
+            return
+        with self._lock:
+            if self.closed or self.owner not in (None, model):
+                return
+            self.last_edit = time.monotonic()
+            if self.message_id is None:
+                self.owner = model
+                self.message_id = send_live_message(self._render(model, snippet, live=True))
+                if self.message_id is not None:
+                    print(f"📱 Live Telegram update started from {model} stream")
+            else:
+                edit_live_message(self.message_id, self._render(model, snippet, live=True))
+
+    def close(self) -> None:
+        """Stops further edits (e.g. every provider failed after one had gone live)."""
+        with self._lock:
+            self.closed = True
+
+    def finish(self, model: str, text: str) -> bool:
+        """Final snippet of the answer actually used; falls back to a normal send."""
+        snippet, found = strategy_snippet(text, self.markers)
+        if not found:
+            print("⚠️ Keywords 'ANALYSIS NARRATIVE' or 'TRADING IMPLICATION' not found. Sending fallback response...")
+        with self._lock:
+            self.closed = True
+            message_id = self.message_id
+        if message_id is None:
+            return send_telegram_message(f"🤖 {model} Strategy Update:\n\n{snippet}")
+
+        final = _clean(f"🤖 {model} Strategy Update:\n\n{snippet}")
+        head = self._render(model, snippet, live=False)
+        ok = edit_live_message(message_id, head)
+        if ok:
+            print("📱 Live Telegram message finalised")
+        rest = final[len(head):].lstrip('\n')
+        if rest:
+            ok = send_telegram_message(rest) and ok
+        return ok
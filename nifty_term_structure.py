@@ -0,0 +1,103 @@
+import datetime
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from nifty_chain import OptionChain
+from nifty_decoder import decode_by_expiry
+from nifty_expiry_cache import IST, parse_expiry
+
+# ---------------------------------------------------------
+# PER-EXPIRY AGGREGATES
+# ---------------------------------------------------------
+@dataclass
+class ExpiryTerm:
+    """Term-structure aggregates for one expiry of one underlying."""
+    expiry: str
+    dte: Optional[int]
+    strikes: int
+    atm: float
+    atm_iv: float
+    oi_pcr: float
+    volume_pcr: float
+    total_ce_chg_oi: int
+    total_pe_chg_oi: int
+
+    @property
+    def net_chg_oi(self) -> int:
+        """Put minus call Chg OI (positive = net put writing)."""
+        return self.total_pe_chg_oi - self.total_ce_chg_oi
+
+def _atm_iv(chain: OptionChain, atm: float) -> float:
+    """Mean of the non-zero CE/PE IVs at the ATM strike (0 when NSE publishes none)."""
+    i = chain.index_of(atm)
+    if i is None:
+        return 0.0
+    ivs = [iv for iv in (chain.ce_iv[i].item(), chain.pe_iv[i].item()) if iv > 0]
+    return sum(ivs) / len(ivs) if ivs else 0.0
+
+def summarise_expiry(chain: OptionChain, today: datetime.date = None) -> ExpiryTerm:
+    today = today or datetime.datetime.now(IST).date()
+    expiry = parse_expiry(chain.expiry_date)
+    atm = chain.atm_strike() if len(chain) else 0.0
+    oi_pcr, volume_pcr = chain.pcr()
+    return ExpiryTerm(
+        expiry=chain.expiry_date,
+        dte=max((expiry - today).days, 0) if expiry else None,
+        strikes=len(chain),
+        atm=atm,
+        atm_iv=_atm_iv(chain, atm),
+        oi_pcr=oi_pcr,
+        volume_pcr=volume_pcr,
+        total_ce_chg_oi=int(np.sum(chain.ce_change_oi)),
+        total_pe_chg_oi=int(np.sum(chain.pe_change_oi)),
+    )
+
+# ---------------------------------------------------------
+# TERM STRUCTURE (N nearest expiries of one underlying)
+# ---------------------------------------------------------
+class TermStructure:
+    """Ordered {expiry: OptionChain} for one underlying plus per-expiry aggregates."""
+
+    def __init__(self, symbol: str, chains: Dict[str, OptionChain], today: datetime.date = None):
+        self.symbol = symbol
+        self.chains = chains
+        self.terms: List[ExpiryTerm] = [summarise_expiry(chain, today) for chain in chains.values()]
+
+    @classmethod
+    def from_payloads(cls, symbol: str, payloads: list, expiries: list = None,
+                      today: datetime.date = None) -> "TermStructure":
+        """
+        Builds the structure from one or more raw NSE payloads (one per requested expiry, or a single
+        all-expiry payload). Each payload is decoded in one pass; `expiries` limits and orders the result.
+        """
+        chains = {}
+        for data in payloads:
+            if not data or 'records' not in data:
+                continue
+            for expiry, chain in decode_by_expiry(data, symbol).items():
+                if expiry not in chains and len(chain):
+                    chains[expiry] = chain
+        if expiries is not None:
+            chains = {expiry: chains[expiry] for expiry in expiries if expiry in chains}
+        return cls(symbol, chains, today)
+
+    def __len__(self) -> int:
+        return len(self.chains)
+
+    def nearest(self) -> Optional[OptionChain]:
+        return next(iter(self.chains.values()), None)
+
+    def fingerprint(self) -> str:
+        return ":".join(chain.fingerprint() for chain in self.chains.values())
+
+    def format_summary(self) -> str:
+        """Compact table for the console and the AI prompt."""
+        lines = [f"TERM STRUCTURE - {self.symbol} ({len(self)} expiries)",
+                 "EXPIRY,DTE,ATM,ATM_IV,OI_PCR,VOL_PCR,CE_ChgOI,PE_ChgOI,NET_ChgOI"]
+        for t in self.terms:
+            dte = "NA" if t.dte is None else t.dte
+            lines.append(f"{t.expiry},{dte},{t.atm:g},{t.atm_iv:.1f},{t.oi_pcr:.2f},{t.volume_pcr:.2f},"
+                         f"{t.total_ce_chg_oi},{t.total_pe_chg_oi},{t.net_chg_oi:+}")
+        return "\n".join(lines)
@@ -0,0 +1,104 @@
+import os
+from collections import deque
+from statistics import median
+
+from nifty_config import (
+    BROWSER_MAX_RSS_MB, BROWSER_MAX_REQUESTS, BROWSER_LATENCY_FACTOR, BROWSER_LATENCY_WINDOW
+)
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# ---------------------------------------------------------
+# MEMORY OF THE BROWSER PROCESS TREE
+# ---------------------------------------------------------
+def _proc_children_rss_mb(root_pid: int):
+    """Linux fallback without psutil: sum VmRSS of every descendant of root_pid via /proc."""
+    parents = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'r') as f:
+                # Field 4 is the ppid; the command name (field 2) may contain spaces, so split after ')'
+                parents[int(entry)] = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+
+    descendants, frontier = set(), [root_pid]
+    while frontier:
+        pid = frontier.pop()
+        for child, parent in parents.items():
+            if parent == pid and child not in descendants:
+                descendants.add(child)
+                frontier.append(child)
+
+    total_kb = 0
+    for pid in descendants:
+        try:
+            with open(f'/proc/{pid}/status', 'r') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+                        break
+        except (OSError, ValueError):
+            continue
+    return total_kb / 1024
+
+def browser_rss_mb():
+    """RSS of all child processes (Playwright driver + Chromium), in MB. None where it can't be measured."""
+    if PSUTIL_AVAILABLE:
+        try:
+            children = psutil.Process().children(recursive=True)
+            return sum(child.memory_info().rss for child in children if child.is_running()) / (1024 * 1024)
+        except psutil.Error:
+            return None
+    if os.path.isdir('/proc'):
+        return _proc_children_rss_mb(os.getpid())
+    return None
+
+# ---------------------------------------------------------
+# WATCHDOG (Decides when the long-lived browser should be recycled)
+# ---------------------------------------------------------
+class BrowserWatchdog:
+    """
+    Tracks browser RSS, requests served and fetch latency per cycle.
+    check() returns a reason string when the browser should be restarted, else None.
+    Only the sync browser in nifty_fetcher lives across cycles, so it is the one watched; the async
+    context pool's browser is closed at the end of every concurrent fetch.
+    """
+
+    def __init__(self, max_rss_mb: float = BROWSER_MAX_RSS_MB, max_requests: int = BROWSER_MAX_REQUESTS,
+                 latency_factor: float = BROWSER_LATENCY_FACTOR, window: int = BROWSER_LATENCY_WINDOW):
+        self.max_rss_mb = max_rss_mb
+        self.max_requests = max_requests
+        self.latency_factor = latency_factor
+        self.latencies = deque(maxlen=window)
+        self.last_rss_mb = None
+
+    def check(self, fetch_seconds: float, request_count: int, browser_alive: bool):
+        baseline = median(self.latencies) if len(self.latencies) >= 3 else None
+        self.latencies.append(fetch_seconds)
+        if not browser_alive:
+            return None
+
+        self.last_rss_mb = browser_rss_mb()
+        if self.last_rss_mb is not None and self.last_rss_mb > self.max_rss_mb:
+            return f"RSS {self.last_rss_mb:.0f} MB > {self.max_rss_mb} MB"
+        if request_count >= self.max_requests:
+            return f"{request_count} requests served"
+        if baseline and fetch_seconds > baseline * self.latency_factor:
+            return f"fetch took {fetch_seconds:.1f}s vs {baseline:.1f}s median"
+        return None
+
+    def reset_latency(self):
+        """A fresh browser has a new baseline (cold start is slower, so don't compare against it)."""
+        self.latencies.clear()
+
+    def status(self, request_count: int) -> str:
+        rss = "n/a" if self.last_rss_mb is None else f"{self.last_rss_mb:.0f} MB"
+        last = f"{self.latencies[-1]:.1f}s" if self.latencies else "n/a"
+        return f"RSS {rss} | requests {request_count} | last fetch {last}"
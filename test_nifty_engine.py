@@ -0,0 +1,127 @@
+import datetime
+
+import pytest
+
+from nifty_chain import OptionChain
+from nifty_engine import V15Engine, dte_tier, minutes_since_open
+from nifty_expiry_cache import IST
+
+EXPIRY = "23-Oct-2026"
+FRIDAY_11AM = datetime.datetime(2026, 10, 16, 11, 0, tzinfo=IST)
+
+def _chain(spot: float = 24510.0) -> OptionChain:
+    """Nine strikes around 24500: heavy put writing below spot, the largest static OI at 24400."""
+    strikes = [24300, 24350, 24400, 24450, 24500, 24550, 24600, 24650, 24700]
+    return OptionChain(
+        "NIFTY", spot, EXPIRY, strikes,
+        ce_change_oi=[0, 0, 1000, 2000, 5000, 8000, 12000, 6000, 3000],
+        ce_volume=[100, 200, 9000, 12000, 40000, 50000, 60000, 30000, 15000],
+        ce_ltp=[260, 215, 175, 140, 105, 78, 55, 38, 25],
+        ce_oi=[1000, 2000, 3000, 5000, 9000, 12000, 15000, 8000, 4000],
+        ce_iv=[14, 13.5, 13, 12.5, 12, 12, 12.5, 13, 13.5],
+        pe_change_oi=[5000, 15000, 30000, 25000, 20000, 2000, 1000, 0, 0],
+        pe_volume=[20000, 60000, 120000, 100000, 80000, 9000, 5000, 100, 100],
+        pe_ltp=[20, 30, 45, 62, 85, 115, 150, 190, 235],
+        pe_oi=[6000, 14000, 40000, 22000, 18000, 4000, 2000, 1000, 500],
+        pe_iv=[14, 13.5, 13, 12.5, 12, 12, 12.5, 13, 13.5],
+    )
+
+def _compute(engine: V15Engine, chain: OptionChain = None, now: datetime.datetime = FRIDAY_11AM):
+    chain = chain or _chain()
+    return engine.compute(chain, chain.underlying_value, EXPIRY, oi_pcr=1.3, volume_pcr=1.1,
+                          banknifty_oi_pcr=1.2, now=now)
+
+# ---------------------------------------------------------
+# PURE HELPERS
+# ---------------------------------------------------------
+@pytest.mark.parametrize("dte, expected", [
+    (0, (30, 25, "EXPIRY_DAY")),
+    (1, (60, 50, "DAY_BEFORE_EXPIRY")),
+    (2, (100, 90, "NEAR_EXPIRY")),
+    (7, (100, 90, "NEAR_EXPIRY")),
+    (8, (150, 130, "MID_CYCLE")),
+    (15, (150, 130, "MID_CYCLE")),
+    (16, (200, 175, "EARLY_CYCLE")),
+])
+def test_dte_tier_boundaries(dte, expected):
+    assert dte_tier(dte) == expected
+
+def test_minutes_since_open():
+    assert minutes_since_open(FRIDAY_11AM) == 105
+    assert minutes_since_open(FRIDAY_11AM.replace(hour=9, minute=0)) is None     # Before the open
+    assert minutes_since_open(FRIDAY_11AM.replace(hour=15, minute=31)) is None   # After the close
+    assert minutes_since_open(FRIDAY_11AM + datetime.timedelta(days=1)) is None  # Saturday
+    # Server clocks are UTC; 05:30 UTC is 11:00 IST
+    assert minutes_since_open(datetime.datetime(2026, 10, 16, 5, 30, tzinfo=datetime.timezone.utc)) == 105
+
+# ---------------------------------------------------------
+# LOCKED VALUES
+# ---------------------------------------------------------
+def test_context_and_dte_tier():
+    result = _compute(V15Engine())
+    assert result.atm == 24500
+    assert result.dte == 7
+    assert (result.inst_threshold, result.counter_threshold, result.dte_mode) == (100, 90, "NEAR_EXPIRY")
+    assert result.time_since_open == 105
+    assert result.previous_spot is None and result.price_vector is None
+    assert result.data_points == 1
+
+def test_expiry_day_caps_the_score():
+    result = _compute(V15Engine(), now=datetime.datetime(2026, 10, 23, 11, 0, tzinfo=IST))
+    assert result.is_expiry_day and result.dte_mode == "EXPIRY_DAY"
+    assert result.expiry_cap_applied and result.score <= 6
+
+def test_max_pain_is_largest_static_oi_in_extended_range():
+    result = _compute(V15Engine())
+    assert result.max_pain == 24400          # 3,000 CE + 40,000 PE
+    assert result.max_pain_reliable          # 31,000 Chg OI at that strike
+    assert result.spot_to_pain == pytest.approx(110)
+
+def test_momentum_levels_and_direction():
+    result = _compute(V15Engine())
+    assert result.momentum == "BULLISH"
+    # 24450 PE: 25,000 x 1.5 (near ATM) outweighs 24400 PE: 30,000 x 1.0 (OTM)
+    assert [d.strike for d in result.dominant_put_strikes][:2] == [24450, 24400]
+    assert result.support == 24450
+    assert result.resistance == 24600
+    assert result.trigger_condition == "BREAK ABOVE" and result.trigger_level == "24600"
+    assert result.rev_dir == "BULLISH"       # Single snapshot: no vector, no trap
+
+def test_falling_into_max_pain_traps_put_writers():
+    engine = V15Engine()
+    _compute(engine, _chain(spot=24600.0))
+    result = _compute(engine, _chain(spot=24480.0), now=FRIDAY_11AM + datetime.timedelta(minutes=30))
+    assert result.price_vector == pytest.approx(-120)
+    assert result.trapped
+    assert result.rev_dir == "BULLISH → BEARISH"
+
+# ---------------------------------------------------------
+# SESSION STATE
+# ---------------------------------------------------------
+def test_session_state_carries_within_a_day_and_resets_on_the_next():
+    engine = V15Engine()
+    _compute(engine, _chain(spot=24510.0))
+    same_day = _compute(engine, _chain(spot=24530.0), now=FRIDAY_11AM + datetime.timedelta(minutes=30))
+    assert same_day.data_points == 2
+    assert same_day.previous_spot == 24510.0
+    assert same_day.price_vector == pytest.approx(20)
+    assert engine.peak_chg_oi
+
+    next_day = _compute(engine, _chain(spot=24530.0), now=FRIDAY_11AM + datetime.timedelta(days=3))
+    assert next_day.data_points == 1
+    assert next_day.previous_spot is None and next_day.price_vector is None
+    assert not next_day.unwind_signals
+
+# ---------------------------------------------------------
+# REPORT
+# ---------------------------------------------------------
+def test_report_carries_the_locked_fields():
+    result = _compute(V15Engine())
+    report = result.format_report()
+    assert "SPOT=24510.00, Vector=UNAVAILABLE, Prev=None | ATM=24500, DTE=7 (NEAR_EXPIRY)" in report
+    assert "Max Pain:                                24400 (Reliable: True)" in report
+    assert f"CURRENT MOMENTUM: {result.momentum}" in report
+    assert f"STRENGTH:         {result.strength} ({result.score}/10)" in report
+    assert f"REVERSAL SCORE:  {result.rev_score} (can exceed 100)" in report
+    assert f"DIRECTION:       {result.rev_dir}" in report
+    assert "TRADING IMPLICATION (LOCKED VALUES):" in report
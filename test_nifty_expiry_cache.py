@@ -0,0 +1,32 @@
+import datetime
+
+from nifty_expiry_cache import ExpiryCalendarCache, IST
+
+DATES = ["23-Oct-2026", "30-Oct-2026", "27-Nov-2026"]
+
+def _cache(tmp_path) -> ExpiryCalendarCache:
+    cache = ExpiryCalendarCache(path=str(tmp_path / "expiry_cache.json"), ttl=24 * 3600)
+    cache.put("NIFTY", DATES)
+    return cache
+
+def _at(day: int, hour: int, minute: int = 0) -> datetime.datetime:
+    return datetime.datetime(2026, 10, day, hour, minute, tzinfo=IST)
+
+def test_serves_the_calendar_before_expiry(tmp_path):
+    assert _cache(tmp_path).get("NIFTY", now=_at(22, 16)) == DATES
+
+def test_expiry_day_is_live_until_the_close(tmp_path):
+    assert _cache(tmp_path).get("NIFTY", now=_at(23, 15, 29)) == DATES
+
+def test_expiry_day_rolls_over_at_the_close(tmp_path):
+    cache = _cache(tmp_path)
+    assert cache.get("NIFTY", now=_at(23, 15, 30)) is None
+    assert cache.get("NIFTY", now=_at(23, 18)) is None
+
+def test_day_after_expiry_is_stale(tmp_path):
+    assert _cache(tmp_path).get("NIFTY", now=_at(24, 9)) is None
+
+def test_close_is_judged_in_ist(tmp_path):
+    # 10:30 UTC is 16:00 IST on expiry day
+    utc = datetime.datetime(2026, 10, 23, 10, 30, tzinfo=datetime.timezone.utc)
+    assert _cache(tmp_path).get("NIFTY", now=utc) is None
@@ -0,0 +1,64 @@
+import pytest
+
+import nifty_rate_limit
+from nifty_rate_limit import TokenBucket, limiter_for, limiter_report
+
+class FakeClock:
+    """Manual clock; used as the bucket's sleep too, so sleeping moves time forward."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.slept.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+def _bucket(clock, rate: float = 2.0, burst: int = 3) -> TokenBucket:
+    return TokenBucket(rate, burst, clock=clock, sleep=clock.sleep)
+
+def test_burst_is_free_then_requests_queue_at_the_rate(clock):
+    bucket = _bucket(clock)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Balance goes negative: each later caller waits one more 1/rate slot
+    assert [bucket.reserve() for _ in range(3)] == pytest.approx([0.5, 1.0, 1.5])
+    assert bucket.snapshot() == {"requests": 6, "waited": pytest.approx(3.0), "max_wait": pytest.approx(1.5)}
+
+def test_tokens_refill_with_time_up_to_burst(clock):
+    bucket = _bucket(clock)
+    for _ in range(3):
+        bucket.reserve()
+    clock.now += 1.0                      # Two tokens back at 2/s
+    assert [bucket.reserve() for _ in range(3)] == pytest.approx([0.0, 0.0, 0.5])
+
+    clock.now += 60.0                     # Idle for a minute: capped at burst, not 120 tokens
+    assert [bucket.reserve() for _ in range(4)] == pytest.approx([0.0, 0.0, 0.0, 0.5])
+
+def test_acquire_sleeps_only_when_the_bucket_is_empty(clock):
+    bucket = _bucket(clock, rate=4.0, burst=1)
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == pytest.approx(0.25)
+    assert bucket.acquire() == pytest.approx(0.25)     # The first sleep refilled exactly one token
+    assert clock.slept == pytest.approx([0.25, 0.25])
+
+def test_snapshot_reset_clears_the_report_counters(clock):
+    bucket = _bucket(clock, burst=1)
+    bucket.reserve()
+    bucket.reserve()
+    assert bucket.snapshot(reset=True)["requests"] == 2
+    assert bucket.snapshot() == {"requests": 0, "waited": 0.0, "max_wait": 0.0}
+
+def test_limiter_is_shared_per_host(monkeypatch):
+    monkeypatch.setattr(nifty_rate_limit, "_buckets", {})
+    nifty = limiter_for("https://www.nseindia.com/api/option-chain-v3?type=Indices&symbol=NIFTY")
+    stock = limiter_for("https://www.nseindia.com/api/option-chain-v3?type=Equity&symbol=TCS")
+    other = limiter_for("http://127.0.0.1:8771/api/option-chain-v3?symbol=NIFTY")
+    assert nifty is stock and nifty is not other
+    assert limiter_report() == "no requests"
@@ -0,0 +1,38 @@
+from nifty_response_cache import response_key
+
+_REPORT = """
+CURRENT DATA FOR ANALYSIS - FETCHED AT: {fetched}
+LOCKED REPORT:
+═══════════════════════════════════════════════
+NIFTY INTRADAY ANALYSIS — v15.1 (LOCAL ENGINE)
+DATA TIME: {time_now} | DTE: 6 (NEAR_EXPIRY)
+═══════════════════════════════════════════════
+
+CONTEXT:
+  SPOT=24512.35, Vector={vector}, Prev={prev} | ATM=24500, DTE=6 (NEAR_EXPIRY), INST_THRESHOLD=100, Data points={points}
+  Time since open: {minutes} min | Expiry: 23-Oct-2026 | Today: 16-Oct-2026
+
+CURRENT MOMENTUM: BULLISH
+STRENGTH:         WEAK (4/10) | Expiry cap: False
+
+NIFTY DATA:
+- Current Value: 24512
+CE_ChgOI,CE_Vol,CE_LTP,CE_OI,CE_IV,STRIKE,PE_ChgOI,PE_Vol,PE_LTP,PE_OI,PE_IV
+100,2000,120.5,5000,12.1,24500,300,2500,98,7000,13
+"""
+
+def _key(data: str) -> str:
+    return response_key("v1", "Gemini Pro", data)
+
+def test_engine_session_clock_does_not_change_the_key():
+    first = _REPORT.format(fetched="2026-10-16 10:00:05", time_now="10:00", vector="UNAVAILABLE",
+                           prev="None", points=1, minutes=45)
+    rerun = _REPORT.format(fetched="2026-10-16 10:07:41", time_now="10:07", vector="+0.00",
+                           prev="24512.35", points=2, minutes=52)
+    assert _key(first) == _key(rerun)
+
+def test_locked_values_still_change_the_key():
+    first = _REPORT.format(fetched="2026-10-16 10:00:05", time_now="10:00", vector="UNAVAILABLE",
+                           prev="None", points=1, minutes=45)
+    changed = first.replace("CURRENT MOMENTUM: BULLISH", "CURRENT MOMENTUM: BEARISH")
+    assert _key(first) != _key(changed)
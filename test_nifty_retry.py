@@ -0,0 +1,163 @@
+import asyncio
+
+import pytest
+
+import nifty_retry
+from nifty_retry import (
+    CircuitBreaker, CircuitOpenError, EmptyPayload, FetchError, HTTPStatusError, RetryPolicy,
+    async_call_with_retry, call_with_retry
+)
+
+NIFTY = "https://www.nseindia.com/api/option-chain-v3?type=Indices&symbol=NIFTY&expiry=23-Oct-2026"
+BANKNIFTY = "https://www.nseindia.com/api/option-chain-v3?type=Indices&symbol=BANKNIFTY&expiry=28-Oct-2026"
+RELIANCE = "https://www.nseindia.com/api/option-chain-v3?type=Equity&symbol=RELIANCE&expiry=28-Oct-2026"
+TCS = "https://www.nseindia.com/api/option-chain-v3?type=Equity&symbol=TCS&expiry=28-Oct-2026"
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.fixture
+def breaker(clock, monkeypatch):
+    """Fresh shared 'option-chain-v3' breaker: threshold 3 (below max_attempts 4), 60s reset."""
+    breaker = CircuitBreaker("option-chain-v3", failure_threshold=3, reset_timeout=60, clock=clock)
+    monkeypatch.setattr(nifty_retry, "_breakers", {"option-chain-v3": breaker})
+    return breaker
+
+@pytest.fixture
+def policy():
+    """Four attempts, no sleeping."""
+    return RetryPolicy(max_attempts=4, base_delay=0.0, jitter=0.0)
+
+class FixedRandom:
+    """Stands in for random.Random: random() always returns `value`."""
+
+    def __init__(self, value: float):
+        self.value = value
+
+    def random(self):
+        return self.value
+
+def failing(error, calls):
+    def attempt():
+        calls.append(1)
+        raise error
+    return attempt
+
+def test_one_flaky_request_uses_all_its_attempts_without_opening_the_circuit(breaker, policy):
+    calls = []
+    with pytest.raises(FetchError):
+        call_with_retry(NIFTY, failing(HTTPStatusError(503), calls), policy)
+    assert len(calls) == 4                  # Threshold 3 < max_attempts 4, yet no fail-fast mid-request
+    assert breaker.failures == 1
+    assert breaker.state == "closed"
+
+def test_retry_that_succeeds_resets_the_count(breaker, policy):
+    outcomes = [HTTPStatusError(503), HTTPStatusError(503), "payload"]
+
+    def attempt():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert call_with_retry(NIFTY, attempt, policy) == "payload"
+    assert breaker.failures == 0 and breaker.state == "closed"
+
+def test_failed_requests_for_different_symbols_open_the_shared_circuit(breaker, policy):
+    for url in (NIFTY, BANKNIFTY, RELIANCE):
+        with pytest.raises(FetchError):
+            call_with_retry(url, failing(HTTPStatusError(503), []), policy)
+    assert breaker.state == "open"
+
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        call_with_retry(TCS, failing(HTTPStatusError(503), calls), policy)
+    assert calls == []                      # Failed fast, nothing sent
+
+def test_empty_payloads_do_not_open_the_shared_circuit(breaker, policy):
+    for url in (RELIANCE, TCS, NIFTY, BANKNIFTY):
+        with pytest.raises(EmptyPayload):
+            call_with_retry(url, failing(EmptyPayload("zero spot"), []), policy)
+    assert breaker.failures == 0 and breaker.state == "closed"
+
+def test_half_open_probe_may_retry_before_closing(breaker, policy, clock):
+    for url in (NIFTY, BANKNIFTY, RELIANCE):
+        with pytest.raises(FetchError):
+            call_with_retry(url, failing(HTTPStatusError(503), []), policy)
+    clock.now += 61
+    outcomes = [HTTPStatusError(503), "payload"]
+
+    def attempt():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert call_with_retry(NIFTY, attempt, policy) == "payload"
+    assert breaker.state == "closed"
+
+def test_failed_half_open_probe_reopens(breaker, policy, clock):
+    for url in (NIFTY, BANKNIFTY, RELIANCE):
+        with pytest.raises(FetchError):
+            call_with_retry(url, failing(HTTPStatusError(503), []), policy)
+    clock.now += 61
+    with pytest.raises(FetchError):
+        call_with_retry(NIFTY, failing(HTTPStatusError(503), []), policy)
+    assert breaker.state == "open"
+    assert breaker.retry_in() == 60
+
+def test_async_request_records_one_failure(breaker, policy):
+    calls = []
+
+    async def attempt():
+        calls.append(1)
+        raise HTTPStatusError(503)
+
+    with pytest.raises(FetchError):
+        asyncio.run(async_call_with_retry(NIFTY, attempt, policy))
+    assert len(calls) == 4
+    assert breaker.failures == 1 and breaker.state == "closed"
+
+# ---------------------------------------------------------
+# RETRY POLICY
+# ---------------------------------------------------------
+def test_backoff_doubles_up_to_max_delay():
+    policy = RetryPolicy(max_attempts=10, base_delay=1.0, max_delay=5.0, jitter=0.0)
+    assert [policy.backoff(n) for n in range(1, 6)] == [1.0, 2.0, 4.0, 5.0, 5.0]
+    assert policy.backoff(2, base_delay=0.5) == 1.0
+
+def test_jitter_randomises_the_top_share_of_the_delay():
+    assert RetryPolicy(base_delay=2.0, max_delay=30.0, jitter=1.0, rng=FixedRandom(0.25)).backoff(3) == 6.0
+    assert RetryPolicy(base_delay=2.0, max_delay=30.0, jitter=0.5, rng=FixedRandom(0.25)).backoff(3) == 7.0
+    assert RetryPolicy(base_delay=2.0, max_delay=30.0, jitter=0.5, rng=FixedRandom(0.999)).backoff(3) >= 4.0
+
+def test_next_delay_follows_the_rule_for_each_kind():
+    policy = RetryPolicy(max_attempts=4, base_delay=1.0, max_delay=30.0, jitter=0.0)
+    assert policy.next_delay("transient", attempt=1, kind_count=1) == 1.0
+    assert policy.next_delay("transient", attempt=2, kind_count=2) == 2.0
+    assert policy.next_delay("empty", attempt=1, kind_count=1) == 4.0     # Throttling backs off harder
+    assert policy.next_delay("empty", attempt=2, kind_count=2) == 8.0
+    assert policy.next_delay("auth", attempt=1, kind_count=1) == 0.0      # Straight back after re-harvest
+    assert policy.next_delay("auth", attempt=3, kind_count=3) is None     # Only two auth retries
+    assert policy.next_delay("permanent", attempt=1, kind_count=1) is None
+
+def test_next_delay_gives_up_at_max_attempts():
+    policy = RetryPolicy(max_attempts=4, base_delay=1.0, jitter=0.0)
+    assert policy.next_delay("transient", attempt=3, kind_count=3) == 4.0
+    assert policy.next_delay("transient", attempt=4, kind_count=4) is None
+    # Kinds share one attempt budget: a first "empty" on the last attempt still gives up
+    assert policy.next_delay("empty", attempt=4, kind_count=1) is None
+
+def test_custom_rules_replace_the_defaults():
+    policy = RetryPolicy(max_attempts=5, base_delay=1.0, jitter=0.0, rules={"transient": (1, 0.5)})
+    assert policy.next_delay("transient", attempt=1, kind_count=1) == 0.5
+    assert policy.next_delay("transient", attempt=2, kind_count=2) is None
+    assert policy.next_delay("empty", attempt=1, kind_count=1) is None
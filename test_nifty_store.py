@@ -0,0 +1,59 @@
+import pytest
+
+from nifty_chain import OptionChain
+from nifty_decoder import decode_payload
+from nifty_store import SnapshotStore
+
+def _record(strike: float, expiry: str, oi: int) -> dict:
+    leg = {"strikePrice": strike, "expiryDate": expiry, "openInterest": oi, "changeinOpenInterest": 0,
+           "totalTradedVolume": 10, "lastPrice": 5.0, "impliedVolatility": 20.0}
+    return {"strikePrice": strike, "expiryDate": expiry, "CE": dict(leg), "PE": dict(leg)}
+
+# Legacy equity endpoint: every expiry in one payload, so each strike appears once per expiry
+LEGACY_PAYLOAD = {"records": {
+    "underlyingValue": 2850.0,
+    "expiryDates": ["28-Oct-2026", "25-Nov-2026"],
+    "data": [_record(strike, expiry, oi)
+             for expiry, oi in (("28-Oct-2026", 100), ("25-Nov-2026", 900))
+             for strike in (2800, 2850, 2900)],
+}}
+
+@pytest.fixture
+def store(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots.sqlite3"))
+    yield store
+    store.close()
+
+def _chain(symbol: str, strikes: list, spot: float = 100.0) -> OptionChain:
+    n = len(strikes)
+    return OptionChain(symbol, spot, "28-Oct-2026", strikes,
+                       ce_change_oi=[1] * n, ce_volume=[1] * n, ce_ltp=[1.0] * n, ce_oi=[1] * n, ce_iv=[1.0] * n,
+                       pe_change_oi=[1] * n, pe_volume=[1] * n, pe_ltp=[1.0] * n, pe_oi=[1] * n, pe_iv=[1.0] * n)
+
+def test_given_expiry_filters_a_multi_expiry_payload():
+    chain = decode_payload(LEGACY_PAYLOAD, "RELIANCE", "28-Oct-2026")
+    assert chain.strike_price.tolist() == [2800, 2850, 2900]
+    assert chain.ce_oi.tolist() == [100, 100, 100]
+
+def test_expiry_filter_accepts_other_nse_date_formats():
+    assert len(decode_payload(LEGACY_PAYLOAD, "RELIANCE", "25-11-2026")) == 3
+
+def test_legacy_payload_stores_cleanly(store):
+    assert store.append(decode_payload(LEGACY_PAYLOAD, "RELIANCE", "28-Oct-2026"), ts=1.0) is not None
+    assert [v for _, v in store.series("RELIANCE", 2850, "ce_oi")] == [100]
+
+def test_one_bad_chain_does_not_lose_the_cycle(store):
+    chains = [_chain("NIFTY", [24500, 24550]), _chain("TCS", [4100, 4100]), _chain("INFY", [1500, 1520])]
+    assert store.append_cycle(chains, ts=1.0) == 2
+    assert [s for s in ("NIFTY", "TCS", "INFY") if store.snapshots(s)] == ["NIFTY", "INFY"]
+    assert store.append(_chain("TCS", [4100, 4150]), ts=2.0) is not None     # Nothing half-written is left behind
+
+def test_prune_drops_old_snapshots_and_their_strikes(store):
+    day = 86400
+    store.append(_chain("NIFTY", [24500, 24550], spot=24500.0), ts=0 * day)
+    store.append(_chain("NIFTY", [24500, 24550], spot=24510.0), ts=40 * day)
+    assert store.prune(max_age_days=30, now=45 * day) == 1
+    assert [ts for _, ts, _, _ in store.snapshots("NIFTY")] == [40 * day]
+    assert [ts for ts, _ in store.series("NIFTY", 24500, "ce_oi")] == [40 * day]
+    # The fingerprint cache is rebuilt from what is left, so an identical chain is still skipped
+    assert store.append(_chain("NIFTY", [24500, 24550], spot=24510.0), ts=45 * day) is None
@@ -0,0 +1,34 @@
+import datetime
+
+from nifty_chain import OptionChain
+from nifty_engine import ATM_EXTENDED_POINTS
+from nifty_strike_window import select_window
+
+TODAY = datetime.date(2026, 10, 16)
+
+def _chain(active: int = 0) -> OptionChain:
+    """NIFTY 23900-25100 in 50s, spot 24510; only `active` strikes either side of ATM trade, no IV."""
+    strikes = list(range(23900, 25101, 50))
+    live = [1 if abs(s - 24500) <= active * 50 else 0 for s in strikes]
+    zeros, n = [0] * len(strikes), len(strikes)
+    return OptionChain("NIFTY", 24510.0, "23-Oct-2026", strikes,
+                       ce_change_oi=zeros, ce_volume=[v * 1000 for v in live], ce_ltp=[1.0] * n,
+                       ce_oi=[v * 5000 for v in live], ce_iv=[0.0] * n,
+                       pe_change_oi=zeros, pe_volume=[v * 1000 for v in live], pe_ltp=[1.0] * n,
+                       pe_oi=[v * 5000 for v in live], pe_iv=[0.0] * n)
+
+def test_default_window_keeps_min_strikes_per_side():
+    window = select_window(_chain(), min_strikes=5, today=TODAY)
+    assert (window.low, window.high) == (24250, 24750)
+
+def test_min_points_covers_atm_extended():
+    window = select_window(_chain(), min_strikes=5, today=TODAY, min_points=ATM_EXTENDED_POINTS)
+    assert (window.low, window.high) == (24000, 25000)
+    assert len(window.apply(_chain())) == 21
+
+def test_min_points_beats_max_strikes_and_dead_edge_trimming():
+    narrow = select_window(_chain(active=2), min_strikes=1, max_strikes=4, today=TODAY)
+    assert 24400 <= narrow.low and narrow.high <= 24600       # Dead strikes beyond the live ones dropped
+    window = select_window(_chain(active=2), min_strikes=1, max_strikes=4, today=TODAY,
+                           min_points=ATM_EXTENDED_POINTS)
+    assert (window.low, window.high) == (24000, 25000)